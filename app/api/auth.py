@@ -1,84 +1,80 @@
-from fastapi import APIRouter, Depends, HTTPException, Request
-from sqlalchemy.orm import Session
-from app.db.database import get_db
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.database import get_async_db
+from app.api.deps import get_current_user, user_id_cache
+from app.core.security import AuthError, SessionUser, init_data_validator, session_tokens
 from app.db.models import User
 from pydantic import BaseModel
 from typing import Optional
-import hashlib
-import hmac
-import time
 
 router = APIRouter()
 
 class TelegramAuth(BaseModel):
-    id: int
-    first_name: str
-    username: Optional[str] = None
-    photo_url: Optional[str] = None
-    auth_date: int
-    hash: str
+    # Raw Telegram.WebApp.initData query string
+    init_data: str
 
-def verify_telegram_auth(auth_data: TelegramAuth, bot_token: str) -> bool:
-    """Verify Telegram authentication data"""
-    data_check_string = "\n".join([
-        f"auth_date={auth_data.auth_date}",
-        f"first_name={auth_data.first_name}",
-        f"id={auth_data.id}",
-        f"photo_url={auth_data.photo_url}" if auth_data.photo_url else "",
-        f"username={auth_data.username}" if auth_data.username else ""
-    ])
-    
-    secret_key = hashlib.sha256(bot_token.encode()).digest()
-    hash = hmac.new(secret_key, data_check_string.encode(), hashlib.sha256).hexdigest()
-    
-    # Check if hash is valid and auth_date is not too old (within 24 hours)
-    return (hash == auth_data.hash and 
-            time.time() - auth_data.auth_date < 86400)
+class SessionResponse(BaseModel):
+    access_token: str
+    token_type: str = "bearer"
+    expires_in: int
+    user_id: int
+    telegram_id: int
+    username: Optional[str] = None
 
-@router.post("/telegram")
+@router.post("/telegram", response_model=SessionResponse)
 async def telegram_auth(
     auth_data: TelegramAuth,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Handle Telegram authentication"""
-    # In production, get this from environment variables
-    bot_token = "YOUR_BOT_TOKEN"
-    
-    if not verify_telegram_auth(auth_data, bot_token):
-        raise HTTPException(status_code=401, detail="Invalid authentication")
-    
-    # Check if user exists
-    user = db.query(User).filter(User.telegram_id == auth_data.id).first()
-    
-    if not user:
-        # Create new user
-        user = User(
-            telegram_id=auth_data.id,
-            username=auth_data.username
-        )
-        db.add(user)
-        db.commit()
-        db.refresh(user)
-    
-    return {
-        "user_id": user.id,
-        "telegram_id": user.telegram_id,
-        "username": user.username
-    }
+    """Validate Mini App initData and issue a session token for the API"""
+    try:
+        fields = init_data_validator.validate(auth_data.init_data)
+    except AuthError as e:
+        raise HTTPException(status_code=401, detail=str(e))
+
+    telegram_user = fields["user"]
+    telegram_id = int(telegram_user["id"])
+    username = telegram_user.get("username")
+
+    # Returning users are usually in the id cache, so login needs no query
+    user_id = user_id_cache.get(telegram_id)
+    if user_id is None:
+        user = await db.scalar(select(User).where(User.telegram_id == telegram_id))
+
+        if not user:
+            # Create new user
+            user = User(
+                telegram_id=telegram_id,
+                username=username
+            )
+            db.add(user)
+            await db.commit()
+            await db.refresh(user)
+
+        if user.is_active is False:
+            raise HTTPException(status_code=403, detail="User is deactivated")
+        user_id = user.id
+        user_id_cache.set(telegram_id, user_id)
+
+    return SessionResponse(
+        access_token=session_tokens.issue(user_id, telegram_id),
+        expires_in=int(session_tokens.ttl),
+        user_id=user_id,
+        telegram_id=telegram_id,
+        username=username
+    )
 
 @router.post("/phone")
 async def add_phone(
-    telegram_id: int,
     phone_number: str,
-    db: Session = Depends(get_db)
+    user: SessionUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Add phone number to user profile"""
-    user = db.query(User).filter(User.telegram_id == telegram_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    user.phone_number = phone_number
-    db.commit()
-    db.refresh(user)
+    await db.execute(
+        update(User).where(User.id == user.user_id).values(phone_number=phone_number)
+    )
+    await db.commit()
     
-    return {"message": "Phone number added successfully"} 
\ No newline at end of file
+    return {"message": "Phone number added successfully"}
@@ -0,0 +1,31 @@
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Sized
+from fastapi import HTTPException
+
+MAX_BATCH_ENTRIES = int(os.getenv("MAX_BATCH_ENTRIES", "500"))
+# Tolerated client clock skew for entries captured offline
+MAX_CLOCK_SKEW = timedelta(minutes=5)
+
+def check_batch_size(entries: Sized):
+    if not entries:
+        raise HTTPException(status_code=400, detail="No entries to import")
+    if len(entries) > MAX_BATCH_ENTRIES:
+        raise HTTPException(
+            status_code=413, detail=f"At most {MAX_BATCH_ENTRIES} entries per request"
+        )
+
+def naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Client datetimes as the naive UTC the TIMESTAMP WITHOUT TIME ZONE columns hold"""
+    if value is not None and value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+def entry_timestamp(created_at: Optional[datetime], now: datetime, index: int) -> datetime:
+    """Naive-UTC created_at for a batch entry (now if the client sent none)"""
+    if created_at is None:
+        return now
+    created_at = naive_utc(created_at)
+    if created_at > now + MAX_CLOCK_SKEW:
+        raise HTTPException(status_code=400, detail=f"Entry {index}: created_at is in the future")
+    return created_at
@@ -1,72 +1,228 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app.db.database import get_db
-from app.db.models import User, ChatHistory
-from app.services.ai import ai_service
+from fastapi import APIRouter, Depends, Header, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.database import get_async_db, AsyncSessionLocal
+from app.db.models import ChatHistory
+from app.api.conditional import conditional_json
+from app.api.deps import get_ai_service, get_current_user, get_user_id
+from app.api.responses import model_response
+from app.api.pagination import keyset_page, page_size, split_page
+from app.core.profiling import span
+from app.core.security import SessionUser
+from app.services.ai import CHAT_INTERRUPTED_MESSAGE, AIService, StreamInterrupted
+from app.services import idempotency, jobs, versions
+from app.services.context import build_chat_context
+from app.services.limits import RateLimiter, SingleFlight
+from app.services.tasks import chat_summary_key
 from pydantic import BaseModel
 from typing import Optional
 from datetime import datetime
+import json
+import os
 
 router = APIRouter()
 
 class ChatMessage(BaseModel):
-    telegram_id: int
     message: str
 
 class ChatResponse(BaseModel):
     response: str
     timestamp: datetime
 
+# Per-user token bucket in front of OpenRouter. Buckets live in each worker and
+# a user's requests spread across all of them, so every worker enforces its
+# share of the budget (WEB_CONCURRENCY workers; approximate, not exact)
+chat_rate_limiter = RateLimiter.per_worker(
+    per_minute=float(os.getenv("CHAT_RATE_PER_MINUTE", "12")),
+    burst=int(os.getenv("CHAT_RATE_BURST", "4")),
+    workers=int(os.getenv("WEB_CONCURRENCY", "1"))
+)
+# Coalesces duplicate sends (double taps, client retries) into one completion
+# within a worker; Idempotency-Key replies are also stored for all workers
+chat_single_flight = SingleFlight(ttl=idempotency.IDEMPOTENCY_TTL)
+
+async def _enqueue_summary(db: AsyncSession, user_id: int):
+    """Queue a summary fold; a no-op while one is already pending for the user"""
+    await jobs.enqueue(db, "chat_summary", {"user_id": user_id}, dedupe_key=chat_summary_key(user_id))
+
 @router.post("/send", response_model=ChatResponse)
 async def send_message(
     chat_message: ChatMessage,
-    db: Session = Depends(get_db)
+    idempotency_key: Optional[str] = Header(None),
+    user: SessionUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    ai_service: AIService = Depends(get_ai_service)
 ):
-    """Send a message to the AI and get a response"""
-    # Verify user exists
-    user = db.query(User).filter(User.telegram_id == chat_message.telegram_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-
-    # Get AI response
-    response = await ai_service.get_chat_response(chat_message.message)
-
-    # Save to chat history
-    chat_history = ChatHistory(
-        user_id=user.id,
-        message=chat_message.message,
-        response=response
+    """
+    Send a message to the AI and get a response.
+
+    Identical in-flight messages from a user share one completion. With an
+    Idempotency-Key header, retries within IDEMPOTENCY_TTL replay the stored
+    response instead of generating (and saving) a new one, whichever worker
+    they reach; reusing a key for a different message is a 409.
+    """
+    user_id = user.user_id
+    message_hash = idempotency.request_hash(chat_message.message)
+
+    async def replay() -> Optional[ChatResponse]:
+        stored = await idempotency.stored_reply(db, user_id, idempotency_key)
+        if stored is None:
+            return None
+        if not stored.matches(message_hash):
+            raise HTTPException(status_code=409, detail="Idempotency-Key was already used for a different message")
+        return ChatResponse(response=stored.response, timestamp=stored.responded_at)
+
+    async def complete() -> ChatResponse:
+        if idempotency_key:
+            stored = await replay()
+            if stored is not None:
+                return stored
+        chat_rate_limiter.check(user.telegram_id)
+
+        # Get AI response with recent turns, rolling summary and mood/sleep context
+        with span("context"):
+            context = await build_chat_context(db, user_id)
+        # End the read transaction so the connection isn't left idle in
+        # transaction for the whole OpenRouter round trip
+        await db.commit()
+        response = await ai_service.get_chat_response(chat_message.message, context)
+        timestamp = datetime.utcnow()
+
+        # Save to chat history
+        with span("save"):
+            if idempotency_key and not await idempotency.record_reply(
+                db, user_id, idempotency_key, message_hash, response, timestamp
+            ):
+                # A retry on another worker finished first: return its reply, save nothing
+                await db.rollback()
+                stored = await replay()
+                if stored is None:
+                    # Its row expired or was cleaned up in between; a retry starts afresh
+                    raise HTTPException(
+                        status_code=503, detail="Please retry the request", headers={"Retry-After": "1"}
+                    )
+                return stored
+            chat_history = ChatHistory(
+                user_id=user_id,
+                message=chat_message.message,
+                response=response
+            )
+            db.add(chat_history)
+            await versions.bump(db, user_id)
+            if context["needs_summary"]:
+                await _enqueue_summary(db, user_id)
+            await db.commit()
+
+        return ChatResponse(
+            response=response,
+            timestamp=timestamp
+        )
+
+    # The message is part of the key so a reused Idempotency-Key never shares another message's reply
+    if idempotency_key:
+        key = (user_id, "key", idempotency_key, message_hash)
+    else:
+        key = (user_id, "message", message_hash)
+    return model_response(await chat_single_flight.do(key, complete, remember=bool(idempotency_key)))
+
+async def _save_chat_history(user_id: int, message: str, response: str, needs_summary: bool):
+    async with AsyncSessionLocal() as db:
+        db.add(ChatHistory(user_id=user_id, message=message, response=response))
+        await versions.bump(db, user_id)
+        if needs_summary:
+            await _enqueue_summary(db, user_id)
+        await db.commit()
+
+def _sse(data: dict, event: Optional[str] = None) -> str:
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@router.post("/stream")
+async def stream_message(
+    chat_message: ChatMessage,
+    user: SessionUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    ai_service: AIService = Depends(get_ai_service)
+):
+    """Send a message to the AI and stream the response as Server-Sent Events"""
+    user_id = user.user_id
+    chat_rate_limiter.check(user.telegram_id)
+    context = await build_chat_context(db, user_id)
+    # Dependency cleanup only runs once the whole stream has been sent; hand
+    # the connection back now instead of holding it for the reply's duration
+    await db.close()
+
+    # Wait for the upstream slot and first token before committing to a 200,
+    # so a saturated upstream still surfaces as 429
+    stream = ai_service.stream_chat_response(chat_message.message, context)
+    try:
+        first_delta = await stream.__anext__()
+    except StopAsyncIteration:
+        first_delta = None
+
+    async def event_stream():
+        parts = []
+        if first_delta is not None:
+            parts.append(first_delta)
+            yield _sse({"delta": first_delta})
+        try:
+            async for delta in stream:
+                parts.append(delta)
+                yield _sse({"delta": delta})
+        except StreamInterrupted:
+            # Don't store a cut-off reply as if it were complete
+            yield _sse({"detail": CHAT_INTERRUPTED_MESSAGE}, event="error")
+            return
+
+        # Persist once the full response has been assembled
+        response = "".join(parts)
+        await _save_chat_history(user_id, chat_message.message, response, context["needs_summary"])
+        yield _sse(
+            {"response": response, "timestamp": datetime.utcnow().isoformat()},
+            event="done"
+        )
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
-    db.add(chat_history)
-    db.commit()
 
-    return ChatResponse(
-        response=response,
-        timestamp=datetime.utcnow()
+def chat_history_query(user_id: int, cursor: Optional[str], limit: int):
+    return keyset_page(
+        select(
+            ChatHistory.id, ChatHistory.created_at, ChatHistory.message, ChatHistory.response
+        ).where(ChatHistory.user_id == user_id),
+        ChatHistory, cursor, limit
     )
 
-@router.get("/history/{telegram_id}")
+@router.get("/history")
 async def get_chat_history(
-    telegram_id: int,
+    request: Request,
     limit: Optional[int] = 10,
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = None,
+    user_id: int = Depends(get_user_id),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get user's chat history"""
-    user = db.query(User).filter(User.telegram_id == telegram_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-
-    history = db.query(ChatHistory)\
-        .filter(ChatHistory.user_id == user.id)\
-        .order_by(ChatHistory.created_at.desc())\
-        .limit(limit)\
-        .all()
-
-    return [
-        {
-            "message": entry.message,
-            "response": entry.response,
-            "timestamp": entry.created_at
+    """Get a page of user's chat history; pass next_cursor back to load older messages"""
+    limit = page_size(limit)
+
+    async def build():
+        rows = (await db.execute(chat_history_query(user_id, cursor, limit))).all()
+        history, next_cursor = split_page(rows, limit)
+
+        # Oldest first within the page, as a chat transcript
+        return {
+            "items": [
+                {
+                    "message": entry.message,
+                    "response": entry.response,
+                    "timestamp": entry.created_at
+                }
+                for entry in reversed(history)
+            ],
+            "next_cursor": next_cursor
         }
-        for entry in reversed(history)
-    ] 
\ No newline at end of file
+
+    return await conditional_json(request, db, user_id, build) 
\ No newline at end of file
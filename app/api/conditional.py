@@ -0,0 +1,48 @@
+import hashlib
+import os
+from datetime import datetime
+from typing import Any, Awaitable, Callable
+from fastapi import Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.api.responses import render_json
+from app.core.cache import TTLCache
+from app.services import versions
+
+# (user_id, path, query, day) -> (data_version, rendered body); per worker
+response_cache = TTLCache(
+    max_entries=int(os.getenv("RESPONSE_CACHE_SIZE", "2000")),
+    ttl=float(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+)
+
+def _etag(key: tuple, version: int) -> str:
+    digest = hashlib.blake2b(repr(key).encode(), digest_size=8).hexdigest()
+    return f'W/"{version}-{digest}"'
+
+def _matches(if_none_match: str, etag: str) -> bool:
+    return if_none_match.strip() == "*" or etag in (tag.strip() for tag in if_none_match.split(","))
+
+async def conditional_json(
+    request: Request, db: AsyncSession, user_id: int, build: Callable[[], Awaitable[Any]]
+) -> Response:
+    """
+    Serve a per-user GET with an ETag derived from the user's data version.
+    A matching If-None-Match gets a 304; otherwise the body comes from the
+    response cache, or from build() when the user's data changed since it
+    was cached. Keys include the UTC day because date-windowed stats shift
+    at midnight without any write.
+    """
+    version = await versions.current(db, user_id)
+    key = (user_id, request.url.path, str(request.query_params), datetime.utcnow().date())
+    etag = _etag(key, version)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+    if _matches(request.headers.get("if-none-match", ""), etag):
+        return Response(status_code=304, headers=headers)
+
+    cached = response_cache.get(key)
+    if cached is not None and cached[0] == version:
+        body = cached[1]
+    else:
+        body = render_json(await build())
+        response_cache.set(key, (version, body))
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,52 @@
+import os
+from typing import Optional
+from fastapi import Depends, HTTPException, Request
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from sqlalchemy import event, inspect
+from app.core.cache import TTLCache
+from app.core.security import AuthError, SessionUser, session_tokens
+from app.db.models import User
+from app.services.ai import AIService
+
+# telegram_id -> users.id for active users, read by /api/auth/telegram so a
+# returning user's login needs no query. Per worker: writes made through the
+# ORM invalidate locally, other workers converge within USER_CACHE_TTL.
+user_id_cache = TTLCache(
+    max_entries=int(os.getenv("USER_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("USER_CACHE_TTL", "300"))
+)
+
+bearer_scheme = HTTPBearer(auto_error=False)
+
+async def get_current_user(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer_scheme)
+) -> SessionUser:
+    """
+    The user from the session token issued by /api/auth/telegram. No database
+    lookup: tokens are short-lived (SESSION_TTL), so a deactivated user keeps
+    access until theirs expires.
+    """
+    if credentials is None:
+        raise HTTPException(
+            status_code=401, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"}
+        )
+    try:
+        return session_tokens.verify(credentials.credentials)
+    except AuthError as e:
+        raise HTTPException(status_code=401, detail=str(e), headers={"WWW-Authenticate": "Bearer"})
+
+async def get_user_id(user: SessionUser = Depends(get_current_user)) -> int:
+    return user.user_id
+
+async def get_ai_service(request: Request) -> AIService:
+    """The worker's AIService, created in the app lifespan"""
+    return request.app.state.ai_service
+
+@event.listens_for(User, "after_insert")
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_user(mapper, connection, target):
+    # Covers user creation, deactivation (is_active) and telegram_id changes
+    user_id_cache.invalidate(target.telegram_id)
+    for old_telegram_id in inspect(target).attrs.telegram_id.history.deleted or ():
+        user_id_cache.invalidate(old_telegram_id)
@@ -0,0 +1,33 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from app.api.deps import get_user_id
+from app.services.export import FORMATS, SOURCES, export_chunks, export_filename
+from typing import List
+
+router = APIRouter()
+
+@router.get("")
+async def export_history(
+    format: str = Query("ndjson", description="ndjson or csv"),
+    types: List[str] = Query(list(SOURCES), description="mood, journal and/or chat"),
+    gzip: bool = False,
+    user_id: int = Depends(get_user_id)
+):
+    """
+    Download the user's full mood, journal and chat history, oldest first.
+    The file is streamed while the database is read, so it can be arbitrarily large.
+    """
+    if format not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of: {', '.join(FORMATS)}")
+    unknown = [kind for kind in types if kind not in SOURCES]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown export types: {', '.join(unknown)}")
+
+    return StreamingResponse(
+        export_chunks(user_id, list(dict.fromkeys(types)), format, gzip),
+        media_type="application/gzip" if gzip else FORMATS[format],
+        headers={
+            "Content-Disposition": f'attachment; filename="{export_filename(format, gzip)}"',
+            "Cache-Control": "no-store"
+        }
+    )
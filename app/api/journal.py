@@ -1,19 +1,34 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app.db.database import get_db
-from app.db.models import User, JournalEntry
-from pydantic import BaseModel
-from typing import Optional
-from datetime import datetime, date, timedelta
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.database import get_async_db
+from app.db.models import JournalEntry
+from app.api.batch import check_batch_size, entry_timestamp, naive_utc
+from app.api.conditional import conditional_json
+from app.api.deps import get_user_id
+from app.api.responses import model_response
+from app.api.pagination import keyset_page, page_size, split_page
+from app.core.profiling import span
+from app.services import stats, versions
+from pydantic import BaseModel, model_validator
+from typing import List, Optional
+from datetime import datetime, date
 
 router = APIRouter()
 
 class JournalEntryCreate(BaseModel):
-    telegram_id: int
     sleep_start: Optional[datetime] = None
     sleep_end: Optional[datetime] = None
     nutrition_notes: Optional[str] = None
 
+    @model_validator(mode="after")
+    def normalize_sleep_times(self):
+        # The Mini App sends ISO strings ending in Z; asyncpg rejects aware values for
+        # naive columns, and comparing aware with naive raises
+        self.sleep_start = naive_utc(self.sleep_start)
+        self.sleep_end = naive_utc(self.sleep_end)
+        return self
+
 class JournalEntryResponse(BaseModel):
     id: int
     sleep_start: Optional[datetime]
@@ -21,16 +36,23 @@ class JournalEntryResponse(BaseModel):
     nutrition_notes: Optional[str]
     created_at: datetime
 
+class JournalEntryImport(JournalEntryCreate):
+    # When the entry was captured (e.g. offline in the Mini App); defaults to now
+    created_at: Optional[datetime] = None
+
+class JournalEntryBatch(BaseModel):
+    entries: List[JournalEntryImport]
+
+class JournalEntryBatchResponse(BaseModel):
+    items: List[JournalEntryResponse]
+
 @router.post("/entry", response_model=JournalEntryResponse)
 async def create_journal_entry(
     entry: JournalEntryCreate,
-    db: Session = Depends(get_db)
+    user_id: int = Depends(get_user_id),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Create a new journal entry"""
-    user = db.query(User).filter(User.telegram_id == entry.telegram_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-
     # Validate sleep times if provided
     if entry.sleep_start and entry.sleep_end:
         if entry.sleep_start >= entry.sleep_end:
@@ -39,91 +61,133 @@ async def create_journal_entry(
                 detail="Sleep start time must be before sleep end time"
             )
 
-    # Create journal entry
+    # Create journal entry and update the daily rollup in the same transaction
     journal_entry = JournalEntry(
-        user_id=user.id,
+        user_id=user_id,
         sleep_start=entry.sleep_start,
         sleep_end=entry.sleep_end,
-        nutrition_notes=entry.nutrition_notes
+        nutrition_notes=entry.nutrition_notes,
+        created_at=datetime.utcnow()
     )
     db.add(journal_entry)
-    db.commit()
-    db.refresh(journal_entry)
+    if entry.sleep_start and entry.sleep_end:
+        sleep_seconds = (entry.sleep_end - entry.sleep_start).total_seconds()
+        await stats.record_sleep(db, user_id, entry.sleep_end, sleep_seconds)
+    await versions.bump(db, user_id)
+    await db.commit()
+    await db.refresh(journal_entry)
 
-    return JournalEntryResponse(
+    return model_response(JournalEntryResponse(
         id=journal_entry.id,
         sleep_start=journal_entry.sleep_start,
         sleep_end=journal_entry.sleep_end,
         nutrition_notes=journal_entry.nutrition_notes,
         created_at=journal_entry.created_at
-    )
+    ))
 
-@router.get("/entries/{telegram_id}")
-async def get_journal_entries(
-    telegram_id: int,
-    start_date: Optional[date] = None,
-    end_date: Optional[date] = None,
-    limit: Optional[int] = 10,
-    db: Session = Depends(get_db)
+@router.post("/batch", response_model=JournalEntryBatchResponse)
+async def import_journal_entries(
+    batch: JournalEntryBatch,
+    user_id: int = Depends(get_user_id),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get user's journal entries with optional date filtering"""
-    user = db.query(User).filter(User.telegram_id == telegram_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
+    """Create many journal entries with one multi-row INSERT in a single transaction"""
+    check_batch_size(batch.entries)
+    now = datetime.utcnow()
+    rows = []
+    for index, item in enumerate(batch.entries):
+        if item.sleep_start and item.sleep_end and item.sleep_start >= item.sleep_end:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Entry {index}: sleep start time must be before sleep end time"
+            )
+        rows.append({
+            "user_id": user_id,
+            "sleep_start": item.sleep_start,
+            "sleep_end": item.sleep_end,
+            "nutrition_notes": item.nutrition_notes,
+            "created_at": entry_timestamp(item.created_at, now, index)
+        })
+
+    with span("save"):
+        entries = sorted((await db.execute(
+            insert(JournalEntry).returning(
+                JournalEntry.id, JournalEntry.sleep_start, JournalEntry.sleep_end,
+                JournalEntry.nutrition_notes, JournalEntry.created_at
+            ),
+            rows
+        )).all())
+        await stats.record_sleeps(db, user_id, [
+            (row["sleep_end"], (row["sleep_end"] - row["sleep_start"]).total_seconds())
+            for row in rows if row["sleep_start"] and row["sleep_end"]
+        ])
+        await versions.bump(db, user_id)
+        await db.commit()
+
+    return model_response(JournalEntryBatchResponse(items=[
+        JournalEntryResponse(
+            id=entry.id,
+            sleep_start=entry.sleep_start,
+            sleep_end=entry.sleep_end,
+            nutrition_notes=entry.nutrition_notes,
+            created_at=entry.created_at
+        )
+        for entry in entries
+    ]))
 
-    query = db.query(JournalEntry).filter(JournalEntry.user_id == user.id)
+def journal_entries_query(
+    user_id: int, start_date: Optional[date], end_date: Optional[date], cursor: Optional[str], limit: int
+):
+    # Plain rows of the needed columns; no ORM objects to hydrate
+    query = select(
+        JournalEntry.id, JournalEntry.created_at, JournalEntry.sleep_start,
+        JournalEntry.sleep_end, JournalEntry.nutrition_notes
+    ).where(JournalEntry.user_id == user_id)
 
     if start_date:
-        query = query.filter(JournalEntry.created_at >= start_date)
+        query = query.where(JournalEntry.created_at >= start_date)
     if end_date:
-        query = query.filter(JournalEntry.created_at <= end_date)
+        query = query.where(JournalEntry.created_at <= end_date)
+    return keyset_page(query, JournalEntry, cursor, limit)
 
-    entries = query.order_by(JournalEntry.created_at.desc()).limit(limit).all()
+@router.get("/entries")
+async def get_journal_entries(
+    request: Request,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    limit: Optional[int] = 10,
+    cursor: Optional[str] = None,
+    user_id: int = Depends(get_user_id),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get a page of user's journal entries with optional date filtering, newest first"""
+    limit = page_size(limit)
 
-    return [
-        {
-            "sleep_start": entry.sleep_start,
-            "sleep_end": entry.sleep_end,
-            "nutrition_notes": entry.nutrition_notes,
-            "created_at": entry.created_at
-        }
-        for entry in entries
-    ]
+    async def build():
+        rows = (await db.execute(journal_entries_query(user_id, start_date, end_date, cursor, limit))).all()
+        entries, next_cursor = split_page(rows, limit)
 
-@router.get("/stats/{telegram_id}")
-async def get_journal_stats(
-    telegram_id: int,
-    db: Session = Depends(get_db)
-):
-    """Get user's journal statistics"""
-    user = db.query(User).filter(User.telegram_id == telegram_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-
-    # Get entries from the last 7 days
-    week_ago = datetime.utcnow() - timedelta(days=7)
-    entries = db.query(JournalEntry)\
-        .filter(
-            JournalEntry.user_id == user.id,
-            JournalEntry.created_at >= week_ago,
-            JournalEntry.sleep_start.isnot(None),
-            JournalEntry.sleep_end.isnot(None)
-        )\
-        .all()
-
-    if not entries:
         return {
-            "average_sleep_duration": None,
-            "total_entries": 0
+            "items": [
+                {
+                    "sleep_start": entry.sleep_start,
+                    "sleep_end": entry.sleep_end,
+                    "nutrition_notes": entry.nutrition_notes,
+                    "created_at": entry.created_at
+                }
+                for entry in entries
+            ],
+            "next_cursor": next_cursor
         }
 
-    # Calculate average sleep duration in hours
-    sleep_durations = [
-        (entry.sleep_end - entry.sleep_start).total_seconds() / 3600
-        for entry in entries
-    ]
+    return await conditional_json(request, db, user_id, build)
 
-    return {
-        "average_sleep_duration": sum(sleep_durations) / len(sleep_durations),
-        "total_entries": len(entries)
-    } 
\ No newline at end of file
+@router.get("/stats")
+async def get_journal_stats(
+    request: Request,
+    days: int = Query(7, ge=1, le=365),
+    user_id: int = Depends(get_user_id),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get user's journal statistics over the last `days` UTC days, today included (7 by default)"""
+    return await conditional_json(request, db, user_id, lambda: stats.sleep_summary(db, user_id, days))
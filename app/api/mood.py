@@ -1,18 +1,28 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app.db.database import get_db
-from app.db.models import User, MoodEntry
-from app.services.ai import ai_service
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.database import get_async_db
+from app.db.models import MoodEntry
+from app.api.batch import check_batch_size, entry_timestamp
+from app.api.conditional import conditional_json
+from app.api.deps import get_ai_service, get_user_id
+from app.api.responses import model_response
+from app.api.pagination import keyset_page, page_size, split_page
+from app.core.profiling import span
+from app.services.ai import AIService, interpret_sentiment_score
+from app.services import jobs, stats, versions
+from app.services.tasks import mood_sentiment_key
 from pydantic import BaseModel
-from typing import Optional
-from datetime import datetime, timedelta
+from typing import List, Optional
+from datetime import datetime
 
 router = APIRouter()
 
 class MoodEntryCreate(BaseModel):
-    telegram_id: int
     mood_level: int  # 1-5 scale
     comment: Optional[str] = None
+    # Return immediately and let the job queue fill sentiment_score
+    defer_sentiment: bool = False
 
 class MoodEntryResponse(BaseModel):
     id: int
@@ -21,17 +31,29 @@ class MoodEntryResponse(BaseModel):
     sentiment_score: Optional[float]
     sentiment_text: Optional[str]
     created_at: datetime
+    sentiment_pending: bool = False
+
+class MoodEntryImport(BaseModel):
+    mood_level: int  # 1-5 scale
+    comment: Optional[str] = None
+    # When the entry was captured (e.g. offline in the Mini App); defaults to now
+    created_at: Optional[datetime] = None
+
+class MoodEntryBatch(BaseModel):
+    entries: List[MoodEntryImport]
+    defer_sentiment: bool = False
+
+class MoodEntryBatchResponse(BaseModel):
+    items: List[MoodEntryResponse]
 
 @router.post("/track", response_model=MoodEntryResponse)
 async def track_mood(
     mood_entry: MoodEntryCreate,
-    db: Session = Depends(get_db)
+    user_id: int = Depends(get_user_id),
+    db: AsyncSession = Depends(get_async_db),
+    ai_service: AIService = Depends(get_ai_service)
 ):
     """Create a new mood entry with optional sentiment analysis"""
-    user = db.query(User).filter(User.telegram_id == mood_entry.telegram_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-
     # Validate mood level
     if not 1 <= mood_entry.mood_level <= 5:
         raise HTTPException(status_code=400, detail="Mood level must be between 1 and 5")
@@ -39,113 +61,153 @@ async def track_mood(
     # Analyze sentiment if comment is provided
     sentiment_score = None
     sentiment_text = None
-    if mood_entry.comment:
-        sentiment_score = await ai_service.analyze_sentiment(mood_entry.comment)
-        sentiment_text = ai_service.interpret_sentiment_score(sentiment_score)
+    sentiment_pending = bool(mood_entry.comment) and mood_entry.defer_sentiment
+    if mood_entry.comment and not sentiment_pending:
+        with span("sentiment"):
+            sentiment_score = await ai_service.analyze_sentiment(mood_entry.comment)
+        sentiment_text = interpret_sentiment_score(sentiment_score)
 
-    # Create mood entry
+    # Create mood entry, update the daily rollup and queue deferred scoring in one transaction
     entry = MoodEntry(
-        user_id=user.id,
+        user_id=user_id,
         mood_level=mood_entry.mood_level,
         comment=mood_entry.comment,
-        sentiment_score=sentiment_score
+        sentiment_score=sentiment_score,
+        created_at=datetime.utcnow()
     )
-    db.add(entry)
-    db.commit()
-    db.refresh(entry)
-
-    return MoodEntryResponse(
+    with span("save"):
+        db.add(entry)
+        await stats.record_mood(db, user_id, entry.created_at, entry.mood_level, sentiment_score)
+        await versions.bump(db, user_id)
+        if sentiment_pending:
+            await db.flush()
+            await jobs.enqueue(db, "mood_sentiment", {"entry_id": entry.id}, dedupe_key=mood_sentiment_key(entry.id))
+        await db.commit()
+        await db.refresh(entry)
+
+    return model_response(MoodEntryResponse(
         id=entry.id,
         mood_level=entry.mood_level,
         comment=entry.comment,
         sentiment_score=entry.sentiment_score,
         sentiment_text=sentiment_text,
-        created_at=entry.created_at
+        created_at=entry.created_at,
+        sentiment_pending=sentiment_pending
+    ))
+
+@router.post("/batch", response_model=MoodEntryBatchResponse)
+async def import_moods(
+    batch: MoodEntryBatch,
+    user_id: int = Depends(get_user_id),
+    db: AsyncSession = Depends(get_async_db),
+    ai_service: AIService = Depends(get_ai_service)
+):
+    """
+    Create many mood entries at once (offline sync, imports from other trackers).
+    Comments are scored in batched inference calls and all entries are written
+    with one multi-row INSERT in a single transaction.
+    """
+    check_batch_size(batch.entries)
+    now = datetime.utcnow()
+    rows = []
+    for index, item in enumerate(batch.entries):
+        if not 1 <= item.mood_level <= 5:
+            raise HTTPException(status_code=400, detail=f"Entry {index}: mood level must be between 1 and 5")
+        rows.append({
+            "user_id": user_id,
+            "mood_level": item.mood_level,
+            "comment": item.comment,
+            "sentiment_score": None,
+            "created_at": entry_timestamp(item.created_at, now, index)
+        })
+
+    commented = [row for row in rows if row["comment"]]
+    if commented and not batch.defer_sentiment:
+        with span("sentiment"):
+            scores = await ai_service.analyze_sentiment_batch([row["comment"] for row in commented])
+        for row, score in zip(commented, scores):
+            row["sentiment_score"] = score
+
+    with span("save"):
+        # Unordered RETURNING lets SQLite batch the rows too; everything the
+        # response needs comes back with the ids
+        entries = sorted((await db.execute(
+            insert(MoodEntry).returning(
+                MoodEntry.id, MoodEntry.mood_level, MoodEntry.comment,
+                MoodEntry.sentiment_score, MoodEntry.created_at
+            ),
+            rows
+        )).all())
+        await stats.record_moods(
+            db, user_id, [(row["created_at"], row["mood_level"], row["sentiment_score"]) for row in rows]
+        )
+        await versions.bump(db, user_id)
+        if batch.defer_sentiment:
+            await jobs.enqueue_many(db, "mood_sentiment", [
+                ({"entry_id": entry.id}, mood_sentiment_key(entry.id)) for entry in entries if entry.comment
+            ])
+        await db.commit()
+
+    return model_response(MoodEntryBatchResponse(items=[
+        MoodEntryResponse(
+            id=entry.id,
+            mood_level=entry.mood_level,
+            comment=entry.comment,
+            sentiment_score=entry.sentiment_score,
+            sentiment_text=interpret_sentiment_score(entry.sentiment_score) if entry.sentiment_score is not None else None,
+            created_at=entry.created_at,
+            sentiment_pending=bool(entry.comment) and batch.defer_sentiment
+        )
+        for entry in entries
+    ]))
+
+def mood_history_query(user_id: int, cursor: Optional[str], limit: int):
+    # Plain rows of the needed columns; no ORM objects to hydrate
+    return keyset_page(
+        select(
+            MoodEntry.id, MoodEntry.created_at, MoodEntry.mood_level,
+            MoodEntry.comment, MoodEntry.sentiment_score
+        ).where(MoodEntry.user_id == user_id),
+        MoodEntry, cursor, limit
     )
 
-@router.get("/history/{telegram_id}")
+@router.get("/history")
 async def get_mood_history(
-    telegram_id: int,
+    request: Request,
     limit: Optional[int] = 10,
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = None,
+    user_id: int = Depends(get_user_id),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get user's mood history"""
-    user = db.query(User).filter(User.telegram_id == telegram_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-
-    history = db.query(MoodEntry)\
-        .filter(MoodEntry.user_id == user.id)\
-        .order_by(MoodEntry.created_at.desc())\
-        .limit(limit)\
-        .all()
-
-    return [
-        {
-            "mood_level": entry.mood_level,
-            "comment": entry.comment,
-            "sentiment_score": entry.sentiment_score,
-            "sentiment_text": ai_service.interpret_sentiment_score(entry.sentiment_score) if entry.sentiment_score is not None else None,
-            "created_at": entry.created_at
-        }
-        for entry in history
-    ]
+    """Get a page of user's mood history, newest first"""
+    limit = page_size(limit)
+
+    async def build():
+        rows = (await db.execute(mood_history_query(user_id, cursor, limit))).all()
+        history, next_cursor = split_page(rows, limit)
 
-@router.get("/stats/{telegram_id}")
-async def get_mood_stats(
-    telegram_id: int,
-    db: Session = Depends(get_db)
-):
-    """Get user's mood statistics"""
-    user = db.query(User).filter(User.telegram_id == telegram_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-
-    # Get entries from the last 7 days
-    week_ago = datetime.utcnow() - timedelta(days=7)
-    entries = db.query(MoodEntry)\
-        .filter(
-            MoodEntry.user_id == user.id,
-            MoodEntry.created_at >= week_ago
-        )\
-        .all()
-
-    if not entries:
         return {
-            "average_mood": None,
-            "average_sentiment": None,
-            "sentiment_distribution": None,
-            "total_entries": 0
+            "items": [
+                {
+                    "mood_level": entry.mood_level,
+                    "comment": entry.comment,
+                    "sentiment_score": entry.sentiment_score,
+                    "sentiment_text": interpret_sentiment_score(entry.sentiment_score) if entry.sentiment_score is not None else None,
+                    "created_at": entry.created_at
+                }
+                for entry in history
+            ],
+            "next_cursor": next_cursor
         }
 
-    # Calculate statistics
-    mood_scores = [e.mood_level for e in entries]
-    sentiment_scores = [e.sentiment_score for e in entries if e.sentiment_score is not None]
-    
-    # Calculate sentiment distribution
-    sentiment_distribution = {
-        "very_positive": 0,
-        "positive": 0,
-        "neutral": 0,
-        "negative": 0,
-        "very_negative": 0
-    }
-    
-    for score in sentiment_scores:
-        if score > 0.5:
-            sentiment_distribution["very_positive"] += 1
-        elif score > 0.1:
-            sentiment_distribution["positive"] += 1
-        elif score > -0.1:
-            sentiment_distribution["neutral"] += 1
-        elif score > -0.5:
-            sentiment_distribution["negative"] += 1
-        else:
-            sentiment_distribution["very_negative"] += 1
-
-    return {
-        "average_mood": sum(mood_scores) / len(mood_scores),
-        "average_sentiment": sum(sentiment_scores) / len(sentiment_scores) if sentiment_scores else None,
-        "sentiment_distribution": sentiment_distribution,
-        "total_entries": len(entries)
-    } 
\ No newline at end of file
+    return await conditional_json(request, db, user_id, build)
+
+@router.get("/stats")
+async def get_mood_stats(
+    request: Request,
+    days: int = Query(7, ge=1, le=365),
+    user_id: int = Depends(get_user_id),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get user's mood statistics over the last `days` UTC days, today included (7 by default)"""
+    return await conditional_json(request, db, user_id, lambda: stats.mood_summary(db, user_id, days))
@@ -0,0 +1,43 @@
+import base64
+import json
+import os
+from datetime import datetime
+from typing import List, Optional, Tuple
+from fastapi import HTTPException
+from sqlalchemy import tuple_
+
+DEFAULT_PAGE_SIZE = 10
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "100"))
+
+def encode_cursor(created_at: datetime, id: int) -> str:
+    """Opaque cursor pointing just past (created_at, id)"""
+    raw = json.dumps([created_at.isoformat(), id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def page_size(limit: Optional[int]) -> int:
+    """Clamp a client-requested limit to the server maximum"""
+    if limit is None:
+        return DEFAULT_PAGE_SIZE
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+def keyset_page(statement, model, cursor: Optional[str], limit: int):
+    """Newest-first page of `model` rows older than the cursor; fetches one extra row"""
+    if cursor:
+        created_at, id = decode_cursor(cursor)
+        statement = statement.where(tuple_(model.created_at, model.id) < tuple_(created_at, id))
+    return statement.order_by(model.created_at.desc(), model.id.desc()).limit(limit + 1)
+
+def split_page(rows: List, limit: int) -> Tuple[List, Optional[str]]:
+    """Trim the look-ahead row and build next_cursor if there is more history"""
+    if len(rows) <= limit:
+        return list(rows), None
+    page = list(rows[:limit])
+    return page, encode_cursor(page[-1].created_at, page[-1].id)
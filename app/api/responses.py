@@ -0,0 +1,28 @@
+"""
+JSON rendering for API responses. ORJSONResponse is the app's default
+response class; these helpers cover handlers that build bodies themselves.
+"""
+from typing import Any
+import orjson
+from fastapi import Response
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel
+
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def render_json(content: Any) -> bytes:
+    """
+    Encode with orjson, as ORJSONResponse does. The few types orjson doesn't
+    know (Decimal from Postgres aggregates, ...) fall back to jsonable_encoder.
+    """
+    return orjson.dumps(content, default=jsonable_encoder, option=ORJSON_OPTIONS)
+
+
+def model_response(model: BaseModel) -> Response:
+    """
+    Serialize a response model with pydantic's own encoder. Returning a
+    Response skips FastAPI's dump-and-revalidate pass against response_model,
+    which still documents the schema.
+    """
+    return Response(model.model_dump_json(), media_type="application/json")
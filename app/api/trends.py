@@ -0,0 +1,22 @@
+from fastapi import APIRouter, Depends, Query, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.database import get_async_db
+from app.api.conditional import conditional_json
+from app.api.deps import get_user_id
+from app.services.trends import user_trends
+
+router = APIRouter()
+
+@router.get("")
+async def get_trends(
+    request: Request,
+    days: int = Query(90, ge=7, le=366),
+    user_id: int = Depends(get_user_id),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Mood, sentiment and sleep trends over the last `days` days: daily values,
+    7/30-day rolling averages, day-of-week patterns, how sleep relates to the
+    next day's mood and sentiment, and logging streaks.
+    """
+    return await conditional_json(request, db, user_id, lambda: user_trends(db, user_id, days))
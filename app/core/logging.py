@@ -0,0 +1,106 @@
+"""
+Structured logging for the app.* loggers: one JSON object per line, tagged with
+the current request id, sampled per request and written from a background
+thread so log I/O never blocks the event loop.
+
+    LOG_LEVEL=INFO
+    LOG_FORMAT=json          # or "text"
+    LOG_SAMPLE_RATE=1.0      # fraction of requests whose INFO/DEBUG logs are kept
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import time
+import zlib
+from contextvars import ContextVar
+from typing import Optional
+
+request_id: ContextVar[str] = ContextVar("request_id", default="-")
+
+# Attributes every LogRecord has; anything else came in through `extra=`
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class RequestIdFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps all WARNING+ records and INFO/DEBUG records for a `rate` fraction of
+    requests. The decision hashes the request id, so a request's logs are kept
+    or dropped together.
+    """
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.threshold = int(rate * 10000)
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or self.threshold >= 10000:
+            return True
+        rid = getattr(record, "request_id", "-")
+        if rid == "-":
+            return True
+        return zlib.crc32(rid.encode()) % 10000 < self.threshold
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "request_id": getattr(record, "request_id", "-"),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and key not in entry:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def configure_logging():
+    """Route app.* loggers through a queue to a single stderr writer thread"""
+    global _listener
+    if _listener is not None:
+        return
+
+    handler = logging.StreamHandler(sys.stderr)
+    if os.getenv("LOG_FORMAT", "json") == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s"))
+
+    records: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(records)
+    # Filters run on the calling thread, where the request id contextvar is set
+    queue_handler.addFilter(RequestIdFilter())
+    queue_handler.addFilter(SamplingFilter(float(os.getenv("LOG_SAMPLE_RATE", "1.0"))))
+
+    logger = logging.getLogger("app")
+    logger.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+    logger.handlers = [queue_handler]
+    logger.propagate = False
+
+    _listener = logging.handlers.QueueListener(records, handler)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    """Flush queued records (called on worker shutdown)"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
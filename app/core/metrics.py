@@ -0,0 +1,91 @@
+"""
+Prometheus metrics. Under gunicorn set PROMETHEUS_MULTIPROC_DIR (see
+gunicorn.conf.py) so every worker writes to a shared directory and /metrics
+aggregates all of them; without it each process reports only itself.
+"""
+import os
+from typing import Optional
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, generate_latest
+)
+from prometheus_client import multiprocess
+from starlette.responses import Response
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "HTTP requests by route and status", ["method", "route", "status"]
+)
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds", "Time until the response was fully sent",
+    ["method", "route"], buckets=LATENCY_BUCKETS
+)
+HTTP_IN_FLIGHT = Gauge(
+    "http_requests_in_flight", "Requests currently being handled", multiprocess_mode="livesum"
+)
+DB_QUERIES = Histogram(
+    "db_queries_per_request", "SQL statements run per request",
+    ["route"], buckets=(0, 1, 2, 3, 4, 5, 8, 13, 21, 50)
+)
+DB_TIME = Histogram(
+    "db_time_per_request_seconds", "Time spent executing SQL per request",
+    ["route"], buckets=LATENCY_BUCKETS
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out", "Connections checked out of the async pool", multiprocess_mode="livesum"
+)
+DB_POOL_SIZE = Gauge(
+    "db_pool_size", "Connections the async pool keeps open (pool_size, excluding overflow)",
+    multiprocess_mode="livesum"
+)
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds", "Time a request waited for a connection from the async pool",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+)
+UPSTREAM_LATENCY = Histogram(
+    "upstream_request_duration_seconds", "OpenRouter/HuggingFace call latency (time to first token for streams)",
+    ["provider", "model"], buckets=LATENCY_BUCKETS
+)
+UPSTREAM_REQUESTS = Counter(
+    "upstream_requests_total", "OpenRouter/HuggingFace calls by outcome (HTTP status, timeout or error)",
+    ["provider", "model", "status"]
+)
+SENTIMENT_CACHE = Counter(
+    "sentiment_cache_lookups_total", "Sentiment cache lookups by result (memory, persistent, miss)", ["result"]
+)
+TOKENS = Counter(
+    "openrouter_tokens_total", "Tokens reported by OpenRouter", ["model", "kind"]
+)
+JOBS = Counter(
+    "jobs_total", "Background jobs run, by kind and outcome (done, retry, failed)", ["kind", "status"]
+)
+JOB_DURATION = Histogram(
+    "job_duration_seconds", "Background job run time", ["kind"], buckets=LATENCY_BUCKETS
+)
+
+MULTIPROCESS = bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+
+
+def observe_upstream(provider: str, model: str, status, seconds: Optional[float] = None):
+    """Record one upstream call; status is the HTTP status code, "timeout" or "error" """
+    UPSTREAM_REQUESTS.labels(provider, model, str(status)).inc()
+    if seconds is not None:
+        UPSTREAM_LATENCY.labels(provider, model).observe(seconds)
+
+
+def observe_tokens(model: str, usage: Optional[dict]):
+    if not usage:
+        return
+    for kind in ("prompt", "completion"):
+        tokens = usage.get(f"{kind}_tokens")
+        if tokens:
+            TOKENS.labels(model, kind).inc(tokens)
+
+
+def metrics_response() -> Response:
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
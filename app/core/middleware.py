@@ -0,0 +1,165 @@
+import logging
+import random
+import time
+import uuid
+from typing import Dict
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.core.logging import request_id
+from app.core.metrics import (
+    DB_POOL_CHECKED_OUT, DB_QUERIES, DB_TIME, HTTP_IN_FLIGHT, HTTP_LATENCY, HTTP_REQUESTS
+)
+from app.core.profiling import (
+    PROFILE_SAMPLE_RATE, PROFILE_TOKEN, RequestProfiler, request_spans, server_timing
+)
+from app.db.database import QueryStats, async_engine, request_queries
+
+access_logger = logging.getLogger("app.access")
+profile_logger = logging.getLogger("app.profile")
+
+
+def route_label(scope: Scope) -> str:
+    """Route template rather than the raw path, to keep label cardinality bounded"""
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+class MetricsMiddleware:
+    """
+    Records latency, status, in-flight count and SQL statement count/time per
+    route. With query_count_header (DB_QUERY_COUNT=1) the statement count up to
+    the response headers is also returned as X-DB-Query-Count.
+    """
+
+    def __init__(self, app: ASGIApp, query_count_header: bool = False):
+        self.app = app
+        self.query_count_header = query_count_header
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        queries = QueryStats()
+        token = request_queries.set(queries)
+        status = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.query_count_header:
+                    MutableHeaders(scope=message).append("X-DB-Query-Count", str(queries.count))
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            request_queries.reset(token)
+            route = route_label(scope)
+            method = scope["method"]
+            HTTP_LATENCY.labels(method, route).observe(time.perf_counter() - started)
+            HTTP_REQUESTS.labels(method, route, str(status)).inc()
+            DB_QUERIES.labels(route).observe(queries.count)
+            DB_TIME.labels(route).observe(queries.seconds)
+            DB_POOL_CHECKED_OUT.set(async_engine.pool.checkedout())
+
+
+class RequestContextMiddleware:
+    """
+    Assigns each request an id (the incoming X-Request-ID or a new one), makes
+    it available to every log record and returns it in X-Request-ID. Writes one
+    access log record per request.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        incoming = Headers(scope=scope).get("x-request-id")
+        rid = incoming[:64] if incoming else uuid.uuid4().hex
+        token = request_id.set(rid)
+        status = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                MutableHeaders(scope=message).append("X-Request-ID", rid)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            access_logger.info(
+                "request",
+                extra={
+                    "method": scope["method"],
+                    "route": route_label(scope),
+                    "status": status,
+                    "duration_ms": round((time.perf_counter() - started) * 1000, 1)
+                }
+            )
+            request_id.reset(token)
+
+
+class ProfilingMiddleware:
+    """
+    Profiles requests that send X-Profile matching PROFILE_TOKEN, plus a
+    PROFILE_SAMPLE_RATE fraction of all requests (see app.core.profiling).
+    Must sit inside MetricsMiddleware so SQL time is available as a span.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    def wanted(self, scope: Scope) -> bool:
+        if PROFILE_TOKEN and Headers(scope=scope).get("x-profile") == PROFILE_TOKEN:
+            return True
+        return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not self.wanted(scope):
+            await self.app(scope, receive, send)
+            return
+
+        spans: Dict[str, float] = {}
+        token = request_spans.set(spans)
+        profiler = RequestProfiler()
+        profiling = profiler.start()
+        started = time.perf_counter()
+
+        async def send_wrapper(message: Message):
+            if message["type"] == "http.response.start":
+                queries = request_queries.get()
+                timings = dict(spans)
+                if queries is not None:
+                    timings["db"] = queries.seconds
+                timings["total"] = time.perf_counter() - started
+                MutableHeaders(scope=message).append("Server-Timing", server_timing(timings))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_spans.reset(token)
+            queries = request_queries.get()
+            profile_logger.info(
+                "profile",
+                extra={
+                    "route": route_label(scope),
+                    "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+                    "db_ms": round(queries.seconds * 1000, 1) if queries is not None else None,
+                    "db_queries": queries.count if queries is not None else None,
+                    "spans_ms": {name: round(seconds * 1000, 1) for name, seconds in spans.items()},
+                    "report": profiler.stop() if profiling else None
+                }
+            )
@@ -0,0 +1,88 @@
+"""
+Opt-in per-request profiling, switchable without a redeploy:
+
+    PROFILE_TOKEN=secret        # requests sending "X-Profile: secret" are profiled
+    PROFILE_SAMPLE_RATE=0.001   # fraction of all requests profiled automatically
+    PROFILE_TOP=25              # functions kept in the logged report
+
+A profiled request gets a Server-Timing header with its span breakdown (db,
+openrouter, huggingface and route-level spans) and a "profile" log record with
+a pyinstrument report when pyinstrument is installed, else the top cProfile
+entries. cProfile sees every task on the worker's event loop, so concurrent
+requests show up in its report; pyinstrument's async mode does not have that
+problem.
+"""
+import cProfile
+import io
+import os
+import pstats
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+try:
+    import pyinstrument
+    PYINSTRUMENT_AVAILABLE = True
+except ImportError:
+    PYINSTRUMENT_AVAILABLE = False
+
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN")
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_TOP = int(os.getenv("PROFILE_TOP", "25"))
+
+# Accumulated seconds per span name, only set while a request is profiled
+request_spans: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_spans", default=None)
+
+
+@contextmanager
+def span(name: str):
+    """Time a block of a profiled request; a no-op otherwise"""
+    spans = request_spans.get()
+    if spans is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        spans[name] = spans.get(name, 0.0) + time.perf_counter() - started
+
+
+def server_timing(spans: Dict[str, float]) -> str:
+    return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in spans.items())
+
+
+class RequestProfiler:
+    """
+    Only one profiler can hook the interpreter at a time, so while one request
+    is being profiled, others only get spans (start() returns False).
+    """
+    _active = False
+
+    def __init__(self):
+        if PYINSTRUMENT_AVAILABLE:
+            self._profiler = pyinstrument.Profiler(async_mode="enabled")
+        else:
+            self._profiler = cProfile.Profile()
+
+    def start(self) -> bool:
+        if RequestProfiler._active:
+            return False
+        RequestProfiler._active = True
+        if PYINSTRUMENT_AVAILABLE:
+            self._profiler.start()
+        else:
+            self._profiler.enable()
+        return True
+
+    def stop(self) -> str:
+        """Stop profiling and return a text report"""
+        RequestProfiler._active = False
+        if PYINSTRUMENT_AVAILABLE:
+            self._profiler.stop()
+            return self._profiler.output_text(unicode=True)
+        self._profiler.disable()
+        out = io.StringIO()
+        pstats.Stats(self._profiler, stream=out).sort_stats("cumulative").print_stats(PROFILE_TOP)
+        return out.getvalue()
@@ -0,0 +1,108 @@
+"""
+Telegram Mini App authentication and API session tokens.
+
+initData is validated as described in
+https://core.telegram.org/bots/webapps#validating-data-received-via-the-mini-app:
+the HMAC key is derived from the bot token once per process, hashes are
+compared in constant time and stale auth_date values are rejected. A
+successful login is exchanged for a short-lived signed session token that
+carries the user's ids, so API calls need neither telegram_id nor a user lookup.
+
+    TELEGRAM_BOT_TOKEN=...
+    TELEGRAM_AUTH_MAX_AGE=86400      # seconds an initData string stays valid
+    SESSION_SECRET=...               # defaults to a key derived from the bot token
+    SESSION_TTL=3600                 # seconds
+"""
+import hashlib
+import hmac
+import json
+import os
+import time
+from typing import Any, Dict, NamedTuple, Optional
+from urllib.parse import parse_qsl
+from dotenv import load_dotenv
+from jose import JWTError, jwt
+
+load_dotenv()
+
+SESSION_ALGORITHM = "HS256"
+
+
+class AuthError(Exception):
+    """initData or a session token failed validation"""
+
+
+class SessionUser(NamedTuple):
+    user_id: int
+    telegram_id: int
+
+
+class InitDataValidator:
+    def __init__(self, bot_token: Optional[str], max_age: float = 86400):
+        self.max_age = max_age
+        self._secret = (
+            hmac.new(b"WebAppData", bot_token.encode(), hashlib.sha256).digest() if bot_token else None
+        )
+
+    def validate(self, init_data: str, now: Optional[float] = None) -> Dict[str, Any]:
+        """Return the initData fields (with "user" decoded) or raise AuthError"""
+        if self._secret is None:
+            raise AuthError("Telegram login is not configured")
+        try:
+            fields = dict(parse_qsl(init_data, keep_blank_values=True, strict_parsing=True))
+        except ValueError:
+            raise AuthError("Malformed initData")
+
+        received_hash = fields.pop("hash", "")
+        data_check_string = "\n".join(f"{key}={fields[key]}" for key in sorted(fields))
+        expected_hash = hmac.new(self._secret, data_check_string.encode(), hashlib.sha256).hexdigest()
+        if not hmac.compare_digest(expected_hash, received_hash):
+            raise AuthError("Invalid initData signature")
+
+        try:
+            auth_date = int(fields["auth_date"])
+            user = json.loads(fields["user"])
+            int(user["id"])
+        except (KeyError, ValueError, TypeError):
+            raise AuthError("initData is missing auth_date or user")
+        if (now or time.time()) - auth_date > self.max_age:
+            raise AuthError("initData has expired")
+
+        fields["user"] = user
+        return fields
+
+
+def _session_secret(bot_token: Optional[str]) -> Optional[str]:
+    secret = os.getenv("SESSION_SECRET")
+    if secret:
+        return secret
+    if bot_token:
+        return hmac.new(b"DisareSession", bot_token.encode(), hashlib.sha256).hexdigest()
+    return None
+
+
+class SessionTokens:
+    def __init__(self, secret: Optional[str], ttl: float = 3600):
+        self.secret = secret
+        self.ttl = ttl
+
+    def issue(self, user_id: int, telegram_id: int) -> str:
+        if not self.secret:
+            raise AuthError("Session tokens are not configured")
+        now = int(time.time())
+        claims = {"sub": str(user_id), "tid": telegram_id, "iat": now, "exp": now + int(self.ttl)}
+        return jwt.encode(claims, self.secret, algorithm=SESSION_ALGORITHM)
+
+    def verify(self, token: str) -> SessionUser:
+        if not self.secret:
+            raise AuthError("Session tokens are not configured")
+        try:
+            claims = jwt.decode(token, self.secret, algorithms=[SESSION_ALGORITHM])
+            return SessionUser(int(claims["sub"]), int(claims["tid"]))
+        except (JWTError, KeyError, ValueError):
+            raise AuthError("Invalid or expired session token")
+
+
+_bot_token = os.getenv("TELEGRAM_BOT_TOKEN")
+init_data_validator = InitDataValidator(_bot_token, max_age=float(os.getenv("TELEGRAM_AUTH_MAX_AGE", "86400")))
+session_tokens = SessionTokens(_session_secret(_bot_token), ttl=float(os.getenv("SESSION_TTL", "3600")))
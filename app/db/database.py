@@ -1,24 +1,163 @@
-from sqlalchemy import create_engine
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 import os
+import time
+from contextvars import ContextVar
+from typing import Optional
 from dotenv import load_dotenv
+from app.core.metrics import DB_POOL_CHECKOUT_WAIT, DB_POOL_SIZE
 
 load_dotenv()
 
 SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./disare.db")
 
+def async_database_url(url: str) -> str:
+    """Map a sync DATABASE_URL to its async driver (aiosqlite / asyncpg)"""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend == "sqlite":
+        parsed = parsed.set(drivername="sqlite+aiosqlite")
+    elif backend in ("postgresql", "postgres"):
+        parsed = parsed.set(drivername="postgresql+asyncpg")
+    return parsed.render_as_string(hide_password=False)
+
+def sync_database_url(url: str) -> str:
+    # Supabase/Heroku style "postgres://" URLs are not accepted by SQLAlchemy
+    parsed = make_url(url)
+    if parsed.drivername == "postgres":
+        parsed = parsed.set(drivername="postgresql")
+    return parsed.render_as_string(hide_password=False)
+
+IS_SQLITE = make_url(SQLALCHEMY_DATABASE_URL).get_backend_name() == "sqlite"
+
+def pool_options() -> dict:
+    """Connection pool settings from env (per worker process)"""
+    options = {
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "5")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "10")),
+        "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", "30")),
+    }
+    if not IS_SQLITE:
+        options["pool_recycle"] = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+        options["pool_pre_ping"] = os.getenv("DB_POOL_PRE_PING", "1") == "1"
+    return options
+
+def sqlite_pragmas() -> dict:
+    return {
+        "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+        "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+        "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+        "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(64 * 1024 * 1024))),
+        "foreign_keys": "ON",
+    }
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in sqlite_pragmas().items():
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+class PoolStats:
+    """Checkout wait times for this worker's async pool, exposed through pool_metrics() (/health)"""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def observe(self, seconds: float):
+        self.checkouts += 1
+        self.wait_total += seconds
+        self.wait_max = max(self.wait_max, seconds)
+
+pool_stats = PoolStats()
+
+class TimedAsyncPool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long each checkout waited for a connection.
+
+    Sessions still check out lazily, on their first statement, so a request
+    waiting on an upstream call before touching the database holds no connection.
+    """
+
+    def _do_get(self):
+        started = time.perf_counter()
+        connection = super()._do_get()
+        waited = time.perf_counter() - started
+        pool_stats.observe(waited)
+        # Prometheus copies, aggregated across workers at /metrics
+        DB_POOL_CHECKOUT_WAIT.observe(waited)
+        DB_POOL_SIZE.set(self.size())
+        return connection
+
+# Sync engine: Alembic migrations (init_db.py) and check_indexes.py; the app itself uses async_engine
 engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+    sync_database_url(SQLALCHEMY_DATABASE_URL),
+    connect_args={"check_same_thread": False} if IS_SQLITE else {},
+    **pool_options()
+)
+
+# Async engine: used by the API routes so queries never block the event loop.
+# aiosqlite defaults to NullPool; keep connections (and their pragmas) pooled instead.
+async_engine = create_async_engine(
+    async_database_url(SQLALCHEMY_DATABASE_URL),
+    poolclass=TimedAsyncPool,
+    **pool_options()
 )
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-Base = declarative_base()
+if IS_SQLITE:
+    event.listen(engine, "connect", _apply_sqlite_pragmas)
+    event.listen(async_engine.sync_engine, "connect", _apply_sqlite_pragmas)
+
+class QueryStats:
+    """SQL statements run (and time spent in them) while handling one request"""
+    __slots__ = ("count", "seconds")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+# Set per request by MetricsMiddleware
+request_queries: ContextVar[Optional[QueryStats]] = ContextVar("request_queries", default=None)
+QUERY_COUNT_ENABLED = os.getenv("DB_QUERY_COUNT", "0") == "1"
+
+def _before_cursor_execute(connection, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._query_started = time.perf_counter()
+
+def _after_cursor_execute(connection, cursor, statement, parameters, context, executemany):
+    stats = request_queries.get()
+    if stats is not None:
+        stats.count += 1
+        started = getattr(context, "_query_started", None)
+        if started is not None:
+            stats.seconds += time.perf_counter() - started
+
+event.listen(async_engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+event.listen(async_engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
 
 # Dependency
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close() 
\ No newline at end of file
+
+def pool_metrics() -> dict:
+    pool = async_engine.pool
+    return {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+        "checkouts": pool_stats.checkouts,
+        "checkout_wait_avg_ms": (
+            pool_stats.wait_total / pool_stats.checkouts * 1000 if pool_stats.checkouts else 0.0
+        ),
+        "checkout_wait_max_ms": pool_stats.wait_max * 1000
+    }
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Float, Boolean
+from sqlalchemy import Column, Integer, String, Date, DateTime, Text, ForeignKey, Float, Boolean, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -14,6 +14,8 @@ class User(Base):
     phone_number = Column(String, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     is_active = Column(Boolean, default=True)
+    # Bumped with every mood/journal/chat write; drives ETags and the response cache
+    data_version = Column(Integer, nullable=False, default=0)
 
     # Relationships
     mood_entries = relationship("MoodEntry", back_populates="user")
@@ -22,6 +24,10 @@ class User(Base):
 
 class MoodEntry(Base):
     __tablename__ = "mood_entries"
+    __table_args__ = (
+        # Per-user history/stats queries filter by user_id and order/range by created_at
+        Index("ix_mood_entries_user_id_created_at", "user_id", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
@@ -35,6 +41,12 @@ class MoodEntry(Base):
 
 class JournalEntry(Base):
     __tablename__ = "journal_entries"
+    __table_args__ = (
+        # Per-user history/stats queries filter by user_id and order/range by created_at
+        Index("ix_journal_entries_user_id_created_at", "user_id", "created_at"),
+        # Raw sleep stats range over the wake-up time
+        Index("ix_journal_entries_user_id_sleep_end", "user_id", "sleep_end"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
@@ -48,6 +60,10 @@ class JournalEntry(Base):
 
 class ChatHistory(Base):
     __tablename__ = "chat_history"
+    __table_args__ = (
+        # Per-user history/stats queries filter by user_id and order/range by created_at
+        Index("ix_chat_history_user_id_created_at", "user_id", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
@@ -58,6 +74,76 @@ class ChatHistory(Base):
     # Relationships
     user = relationship("User", back_populates="chat_history")
 
+class ChatSummary(Base):
+    """Rolling summary of a user's older chat turns, folded in incrementally"""
+    __tablename__ = "chat_summaries"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), unique=True, index=True, nullable=False)
+    summary = Column(Text, nullable=False, default="")
+    summarized_through_id = Column(Integer, nullable=False, default=0)  # last ChatHistory.id folded in
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class ChatIdempotencyKey(Base):
+    """Stored reply for an Idempotency-Key on /api/chat/send, shared by all workers"""
+    __tablename__ = "chat_idempotency_keys"
+    __table_args__ = (
+        Index("ix_chat_idempotency_keys_user_id_key", "user_id", "key", unique=True),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    key = Column(String(255), nullable=False)
+    request_hash = Column(String(64), nullable=True)  # sha256 of the message the reply answers
+    response = Column(Text, nullable=False)
+    responded_at = Column(DateTime, nullable=False)  # the timestamp sent with the reply
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+class UserDailyStats(Base):
+    """Per-user daily rollup maintained on each mood/journal write"""
+    __tablename__ = "user_daily_stats"
+    __table_args__ = (
+        Index("ix_user_daily_stats_user_id_day", "user_id", "day", unique=True),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    day = Column(Date, nullable=False)
+    mood_count = Column(Integer, nullable=False, default=0)
+    mood_sum = Column(Integer, nullable=False, default=0)
+    sentiment_count = Column(Integer, nullable=False, default=0)
+    sentiment_sum = Column(Float, nullable=False, default=0)
+    very_positive = Column(Integer, nullable=False, default=0)
+    positive = Column(Integer, nullable=False, default=0)
+    neutral = Column(Integer, nullable=False, default=0)
+    negative = Column(Integer, nullable=False, default=0)
+    very_negative = Column(Integer, nullable=False, default=0)
+    sleep_count = Column(Integer, nullable=False, default=0)
+    sleep_seconds = Column(Float, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class Job(Base):
+    """Background job, claimed and run by app.services.jobs.JobWorker"""
+    __tablename__ = "jobs"
+    __table_args__ = (
+        # Workers poll for due jobs by status and run_at
+        Index("ix_jobs_status_run_at", "status", "run_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String, nullable=False)
+    payload = Column(Text, nullable=False, default="{}")  # JSON
+    status = Column(String, nullable=False, default="pending")  # pending, running, done, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=5)
+    # Unique while the job is pending or running, cleared once it finishes
+    dedupe_key = Column(String, nullable=True, unique=True, index=True)
+    run_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    locked_until = Column(DateTime, nullable=True)  # lease of the worker running it
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
 class CBTExercise(Base):
     __tablename__ = "cbt_exercises"
 
@@ -1,11 +1,44 @@
-from fastapi import FastAPI
+import math
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, ORJSONResponse
 from fastapi.staticfiles import StaticFiles
+from app.core.logging import configure_logging, shutdown_logging
+from app.core.metrics import metrics_response
+from app.core.middleware import MetricsMiddleware, ProfilingMiddleware, RequestContextMiddleware
+from app.db.database import QUERY_COUNT_ENABLED, async_engine, pool_metrics
+from app.services import tasks  # noqa: F401  (registers the job handlers)
+from app.services.ai import AIService
+from app.services.jobs import JOB_WORKER_ENABLED, JobWorker
+from app.services.limits import RateLimited
+
+configure_logging()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    configure_logging()
+    # One AIService (and pooled upstream client) per worker, built on boot
+    # rather than at import time, closed on shutdown
+    app.state.ai_service = AIService()
+    await app.state.ai_service.startup()
+    # Background jobs run in each web process unless a dedicated app.worker does it
+    app.state.job_worker = JobWorker.from_env(app.state.ai_service) if JOB_WORKER_ENABLED else None
+    if app.state.job_worker is not None:
+        await app.state.job_worker.start()
+    yield
+    if app.state.job_worker is not None:
+        await app.state.job_worker.stop()
+    await app.state.ai_service.shutdown()
+    await async_engine.dispose()
+    shutdown_logging()
 
 app = FastAPI(
     title="Disare API",
     description="AI-Powered Mental Health Mini App API",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # Configure CORS
@@ -17,6 +50,21 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Innermost first: profiling reads the SQL time collected by the metrics middleware,
+# and the request id is set outermost so every log record carries it
+app.add_middleware(ProfilingMiddleware)
+# Prometheus request/DB metrics; X-DB-Query-Count for the load benchmark (bench/load.py)
+app.add_middleware(MetricsMiddleware, query_count_header=QUERY_COUNT_ENABLED)
+app.add_middleware(RequestContextMiddleware)
+
+@app.exception_handler(RateLimited)
+async def rate_limited_handler(request: Request, exc: RateLimited):
+    return JSONResponse(
+        status_code=429,
+        content={"detail": exc.detail},
+        headers={"Retry-After": str(max(1, math.ceil(exc.retry_after)))}
+    )
+
 # Mount static files for the frontend
 app.mount("/static", StaticFiles(directory="frontend"), name="static")
 
@@ -24,13 +72,35 @@ app.mount("/static", StaticFiles(directory="frontend"), name="static")
 async def root():
     return {"message": "Welcome to Disare API"}
 
+@app.get("/health")
+async def health(request: Request):
+    ai_service = request.app.state.ai_service
+    return {
+        "status": "ok",
+        "db_pool": pool_metrics(),
+        "ai_upstream": {
+            "limit": ai_service.upstream.limit,
+            "in_use": ai_service.upstream.in_use,
+            "waiting": ai_service.upstream.waiting
+        },
+        "chat_models": ai_service.router.snapshot(),
+        "sentiment_model_available": ai_service.model_available,
+        "jobs": request.app.state.job_worker.snapshot() if request.app.state.job_worker else None
+    }
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return metrics_response()
+
 # Import and include routers
-from app.api import auth, chat, mood, journal
+from app.api import auth, chat, mood, journal, export, trends
 
 app.include_router(auth.router, prefix="/api/auth", tags=["Authentication"])
 app.include_router(chat.router, prefix="/api/chat", tags=["AI Chat"])
 app.include_router(mood.router, prefix="/api/mood", tags=["Mood Tracking"])
 app.include_router(journal.router, prefix="/api/journal", tags=["Journal"])
+app.include_router(export.router, prefix="/api/export", tags=["Export"])
+app.include_router(trends.router, prefix="/api/trends", tags=["Trends"])
 
 if __name__ == "__main__":
     import uvicorn
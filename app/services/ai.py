@@ -1,112 +1,490 @@
 import os
 import httpx
-from typing import Dict, Any
+import asyncio
+import json
+import logging
+import time
+from typing import Dict, Any, AsyncIterator, List, Optional, Tuple
 from dotenv import load_dotenv
-from huggingface_hub import model_info
-import requests
+from app.services.sentiment import LocalSentimentEngine, sentiment_score_from_prediction
+from app.services.sentiment_cache import SentimentCache, WARMUP_TEXTS
+from app.services.limits import ConcurrencyLimiter, UpstreamBusy
+from app.services.routing import ModelConfig, ModelRouter, RETRYABLE_STATUS
+from app.core.metrics import observe_tokens, observe_upstream
+from app.core.profiling import span
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+try:
+    import h2  # noqa: F401  (installed via httpx[http2])
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+SYSTEM_PROMPT = """You are Disare, an AI mental health assistant focused on helping busy professionals 
+reduce stress and improve their well-being. Provide personalized, empathetic responses 
+that combine CBT techniques with practical advice for stress management, sleep improvement, 
+and nutrition. Keep responses concise and actionable."""
+
+CHAT_UNAVAILABLE_MESSAGE = "I apologize, but I'm having trouble processing your request right now. Please try again later."
+CHAT_ERROR_MESSAGE = "I apologize, but I'm experiencing technical difficulties. Please try again later."
+CHAT_INTERRUPTED_MESSAGE = "The response was interrupted. Please try again."
+
+
+class StreamInterrupted(Exception):
+    """The upstream stream broke after part of the reply had already been sent"""
+
+
+def failure_status(error: Exception) -> str:
+    """Metrics label for an upstream call that raised instead of returning a response"""
+    return "timeout" if isinstance(error, (asyncio.TimeoutError, httpx.TimeoutException)) else "error"
+
+def create_http_client() -> httpx.AsyncClient:
+    """Build the shared upstream client with pool limits and per-phase timeouts from env"""
+    limits = httpx.Limits(
+        max_connections=int(os.getenv("AI_HTTP_MAX_CONNECTIONS", "20")),
+        max_keepalive_connections=int(os.getenv("AI_HTTP_MAX_KEEPALIVE", "10")),
+        keepalive_expiry=float(os.getenv("AI_HTTP_KEEPALIVE_EXPIRY", "30")),
+    )
+    timeout = httpx.Timeout(
+        connect=float(os.getenv("AI_HTTP_CONNECT_TIMEOUT", "5")),
+        read=float(os.getenv("AI_HTTP_READ_TIMEOUT", "60")),
+        write=float(os.getenv("AI_HTTP_WRITE_TIMEOUT", "10")),
+        pool=float(os.getenv("AI_HTTP_POOL_TIMEOUT", "5")),
+    )
+    http2 = HTTP2_AVAILABLE and os.getenv("AI_HTTP2", "1") == "1"
+    return httpx.AsyncClient(http2=http2, limits=limits, timeout=timeout)
+
 class AIService:
     def __init__(self):
         self.api_key = os.getenv("OPENROUTER_API_KEY")
         self.huggingface_api_key = os.getenv("HUGGINGFACE_API_KEY")
-        self.base_url = "https://openrouter.ai/api/v1"
+        self.base_url = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
+        self.huggingface_inference_url = os.getenv(
+            "HUGGINGFACE_INFERENCE_URL", "https://api-inference.huggingface.co/models"
+        )
+        self.huggingface_hub_url = os.getenv("HUGGINGFACE_HUB_URL", "https://huggingface.co")
         self.sentiment_model = "seara/rubert-tiny2-russian-sentiment"
+        self.summary_model = os.getenv("OPENROUTER_SUMMARY_MODEL", "anthropic/claude-3-haiku")
         self.headers = {
             "Authorization": f"Bearer {self.api_key}",
             "HTTP-Referer": "https://disare.app",  # Your app's domain
             "X-Title": "Disare"  # Your app's name
         }
-        self._check_model_availability()
+        self.sentiment_timeout = httpx.Timeout(
+            float(os.getenv("SENTIMENT_TIMEOUT", "10")),
+            connect=float(os.getenv("AI_HTTP_CONNECT_TIMEOUT", "5"))
+        )
+        # "remote" = HuggingFace Inference API, "local" = in-process CPU inference
+        self.sentiment_backend = os.getenv("SENTIMENT_BACKEND", "remote")
+        self.local_sentiment: Optional[LocalSentimentEngine] = None
+        if self.sentiment_backend == "local":
+            self.local_sentiment = LocalSentimentEngine.from_env(self.sentiment_model)
+        self.sentiment_cache = SentimentCache.from_env()
+        # Texts per Inference API request when scoring a batch
+        self.sentiment_remote_batch = int(os.getenv("SENTIMENT_REMOTE_BATCH", "32"))
+        # Global cap on concurrent upstream calls from this worker
+        self.upstream = ConcurrencyLimiter(
+            limit=int(os.getenv("AI_MAX_CONCURRENCY", "16")),
+            queue_timeout=float(os.getenv("AI_QUEUE_TIMEOUT", "10"))
+        )
+        # Chat model fallback chain with per-model latency/error tracking
+        self.router = ModelRouter.from_env()
+        self._client: Optional[httpx.AsyncClient] = None
+        # Result of the background HuggingFace availability probe (None = unknown)
+        self.model_available: Optional[bool] = None
+        self._background: List[asyncio.Task] = []
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Long-lived keep-alive client shared by every upstream call in this worker"""
+        if self._client is None or self._client.is_closed:
+            self._client = create_http_client()
+        return self._client
+
+    async def startup(self):
+        """Open the connection pool (and local sentiment engine) when the worker starts"""
+        self.client
+        if self.local_sentiment is not None:
+            await self.local_sentiment.start()
+        # Network probes run in the background so they never delay worker boot
+        if self.local_sentiment is None and os.getenv("SENTIMENT_MODEL_CHECK", "1") == "1":
+            self._background.append(asyncio.create_task(self.check_model_availability()))
+        if os.getenv("SENTIMENT_CACHE_WARMUP", "0") == "1":
+            self._background.append(asyncio.create_task(self.warmup_sentiment()))
 
-    def _check_model_availability(self):
-        """Проверка доступности модели"""
+    async def shutdown(self):
+        """Close pooled connections when the worker stops"""
+        for task in self._background:
+            task.cancel()
+        await asyncio.gather(*self._background, return_exceptions=True)
+        self._background.clear()
+        if self.local_sentiment is not None:
+            await self.local_sentiment.stop()
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        self.sentiment_cache.close()
+
+    async def check_model_availability(self) -> Optional[bool]:
+        """Проверка доступности модели (через общий пул соединений, результат кэшируется)"""
         try:
-            info = model_info(self.sentiment_model, expand="inference")
-            if info.inference is None:
-                print(f"Внимание: Модель {self.sentiment_model} может быть недоступна")
+            response = await self.client.get(
+                f"{self.huggingface_hub_url}/api/models/{self.sentiment_model}",
+                params={"expand[]": "inference"},
+                timeout=self.sentiment_timeout
+            )
+            response.raise_for_status()
+            self.model_available = response.json().get("inference") is not None
+            if self.model_available:
+                logger.info("Модель доступна", extra={"model": self.sentiment_model})
             else:
-                print(f"Модель {self.sentiment_model} доступна")
+                logger.warning("Модель может быть недоступна", extra={"model": self.sentiment_model})
         except Exception as e:
-            print(f"Ошибка при проверке модели: {str(e)}")
+            logger.warning("Ошибка при проверке модели", extra={"model": self.sentiment_model, "error": repr(e)})
+        return self.model_available
+
+    def _chat_messages(self, message: str, user_context: Dict[str, Any] = None) -> List[Dict[str, str]]:
+        messages = [
+            {
+                "role": "system",
+                "content": SYSTEM_PROMPT
+            }
+        ]
+        if user_context:
+            notes = []
+            if user_context.get("summary"):
+                notes.append(f"Summary of earlier conversation: {user_context['summary']}")
+            if user_context.get("wellbeing"):
+                notes.append(user_context["wellbeing"])
+            if notes:
+                messages.append({"role": "system", "content": "\n".join(notes)})
+            for past_message, past_response in user_context.get("history", []):
+                messages.append({"role": "user", "content": past_message})
+                messages.append({"role": "assistant", "content": past_response})
+        messages.append(
+            {
+                "role": "user",
+                "content": message
+            }
+        )
+        return messages
+
+    def _chat_payload(self, model: str, message: str, user_context: Dict[str, Any] = None, stream: bool = False) -> Dict[str, Any]:
+        payload = {
+            "model": model,
+            "messages": self._chat_messages(message, user_context),
+            "temperature": 0.7,
+            "max_tokens": 500
+        }
+        if stream:
+            payload["stream"] = True
+            # Ask for token usage in the final chunk
+            payload["usage"] = {"include": True}
+        return payload
+
+    def _model_timeout(self, model: ModelConfig) -> httpx.Timeout:
+        return httpx.Timeout(model.timeout, connect=float(os.getenv("AI_HTTP_CONNECT_TIMEOUT", "5")))
+
+    async def _backoff(self, attempt: int):
+        if attempt:
+            await asyncio.sleep(self.router.backoff(attempt))
 
     async def get_chat_response(self, message: str, user_context: Dict[str, Any] = None) -> str:
-        """Get AI response using OpenRouter API"""
-        try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
+        """
+        Get AI response using OpenRouter API, failing over along the model chain
+        on 429/5xx/timeouts. Raises UpstreamBusy when no slot frees up.
+        """
+        for attempt, model in enumerate(self.router.candidates(message)):
+            await self._backoff(attempt)
+            started = time.perf_counter()
+            try:
+                async with self.upstream.slot():
+                    with span("openrouter"):
+                        response = await asyncio.wait_for(
+                            self.client.post(
+                                f"{self.base_url}/chat/completions",
+                                headers=self.headers,
+                                json=self._chat_payload(model.name, message, user_context),
+                                timeout=self._model_timeout(model)
+                            ),
+                            model.timeout
+                        )
+            except UpstreamBusy:
+                raise
+            except (asyncio.TimeoutError, httpx.TransportError) as e:
+                self.router.record(model.name, time.perf_counter() - started, ok=False)
+                observe_upstream("openrouter", model.name, failure_status(e))
+                logger.warning(
+                    "chat model failed", extra={"model": model.name, "attempt": attempt + 1, "error": repr(e)}
+                )
+                continue
+            except Exception:
+                logger.exception("chat completion error", extra={"model": model.name})
+                return CHAT_ERROR_MESSAGE
+
+            elapsed = time.perf_counter() - started
+            observe_upstream("openrouter", model.name, response.status_code, elapsed)
+            if response.status_code == 200:
+                self.router.record(model.name, elapsed, ok=True)
+                logger.info(
+                    "chat model answered",
+                    extra={"model": model.name, "attempt": attempt + 1, "latency_ms": round(elapsed * 1000, 1)}
+                )
+                body = response.json()
+                observe_tokens(model.name, body.get("usage"))
+                return body["choices"][0]["message"]["content"]
+            self.router.record(model.name, elapsed, ok=False, status=response.status_code)
+            logger.warning(
+                "chat model failed",
+                extra={"model": model.name, "attempt": attempt + 1, "status": response.status_code}
+            )
+            if response.status_code not in RETRYABLE_STATUS:
+                break
+        return CHAT_UNAVAILABLE_MESSAGE
+
+    async def stream_chat_response(self, message: str, user_context: Dict[str, Any] = None) -> AsyncIterator[str]:
+        """
+        Yield response text deltas from OpenRouter's server-sent event stream.
+        Fails over to the next model only until the first token has been sent;
+        a failure after that raises StreamInterrupted. Raises UpstreamBusy on
+        the first iteration when no slot frees up.
+        """
+        received = False
+        for attempt, model in enumerate(self.router.candidates(message, streaming=True)):
+            await self._backoff(attempt)
+            started = time.perf_counter()
+            try:
+                async with self.upstream.slot(), self.client.stream(
+                    "POST",
                     f"{self.base_url}/chat/completions",
                     headers=self.headers,
-                    json={
-                        "model": "anthropic/claude-3-opus-20240229",  # or another model of your choice
-                        "messages": [
-                            {
-                                "role": "system",
-                                "content": """You are Disare, an AI mental health assistant focused on helping busy professionals 
-                                reduce stress and improve their well-being. Provide personalized, empathetic responses 
-                                that combine CBT techniques with practical advice for stress management, sleep improvement, 
-                                and nutrition. Keep responses concise and actionable."""
-                            },
-                            {
-                                "role": "user",
-                                "content": message
-                            }
-                        ],
-                        "temperature": 0.7,
-                        "max_tokens": 500
-                    }
+                    json=self._chat_payload(model.name, message, user_context, stream=True),
+                    timeout=self._model_timeout(model)
+                ) as response:
+                    if response.status_code != 200:
+                        elapsed = time.perf_counter() - started
+                        self.router.record(model.name, elapsed, ok=False, status=response.status_code)
+                        observe_upstream("openrouter", model.name, response.status_code, elapsed)
+                        logger.warning(
+                            "chat model failed",
+                            extra={"model": model.name, "attempt": attempt + 1, "status": response.status_code}
+                        )
+                        if response.status_code in RETRYABLE_STATUS:
+                            continue
+                        break
+                    async for delta in self._stream_deltas(response, model.name):
+                        if not received:
+                            # Time to first token is what the user feels
+                            elapsed = time.perf_counter() - started
+                            self.router.record(model.name, elapsed, ok=True, streaming=True)
+                            observe_upstream("openrouter", model.name, response.status_code, elapsed)
+                            logger.info(
+                                "chat model first token",
+                                extra={"model": model.name, "attempt": attempt + 1, "latency_ms": round(elapsed * 1000, 1)}
+                            )
+                            received = True
+                        yield delta
+                    if received:
+                        return
+            except UpstreamBusy:
+                raise
+            except Exception as e:
+                logger.warning(
+                    "chat stream failed",
+                    extra={"model": model.name, "attempt": attempt + 1, "after_first_token": received, "error": repr(e)}
                 )
-                
-                if response.status_code == 200:
-                    return response.json()["choices"][0]["message"]["content"]
-                else:
-                    return "I apologize, but I'm having trouble processing your request right now. Please try again later."
-                    
+                if received:
+                    raise StreamInterrupted(model.name) from e
+                self.router.record(model.name, time.perf_counter() - started, ok=False)
+                observe_upstream("openrouter", model.name, failure_status(e))
+                continue
+            # Stream finished without content: try the next model
+            self.router.record(model.name, time.perf_counter() - started, ok=False)
+            observe_upstream("openrouter", model.name, "empty")
+        if not received:
+            yield CHAT_UNAVAILABLE_MESSAGE
+
+    async def _stream_deltas(self, response: httpx.Response, model: str) -> AsyncIterator[str]:
+        async for line in response.aiter_lines():
+            # Skip keep-alive comments such as ": OPENROUTER PROCESSING"
+            if not line.startswith("data:"):
+                continue
+            data = line[len("data:"):].strip()
+            if data == "[DONE]":
+                break
+            try:
+                chunk = json.loads(data)
+            except ValueError:
+                continue
+            observe_tokens(model, chunk.get("usage"))
+            choices = chunk.get("choices") or [{}]
+            delta = (choices[0].get("delta") or {}).get("content")
+            if delta:
+                yield delta
+
+    async def summarize_conversation(self, previous_summary: str, turns: List[Tuple[str, str]]) -> Optional[str]:
+        """Fold new chat turns into a running summary with a small, cheap model"""
+        transcript = "\n".join(f"User: {message}\nAssistant: {response}" for message, response in turns)
+        prompt = (
+            "Update the running summary of a conversation between a user and a mental health assistant. "
+            "Keep facts about the user's situation, goals, stressors and advice already given. "
+            "Answer with the updated summary only, under 150 words.\n\n"
+            f"Current summary:\n{previous_summary or '(none)'}\n\nNew turns:\n{transcript}"
+        )
+        try:
+            async with self.upstream.slot():
+                started = time.perf_counter()
+                try:
+                    response = await self.client.post(
+                        f"{self.base_url}/chat/completions",
+                        headers=self.headers,
+                        json={
+                            "model": self.summary_model,
+                            "messages": [{"role": "user", "content": prompt}],
+                            "temperature": 0.2,
+                            "max_tokens": 300
+                        }
+                    )
+                except Exception as e:
+                    observe_upstream("openrouter", self.summary_model, failure_status(e))
+                    raise
+            observe_upstream("openrouter", self.summary_model, response.status_code, time.perf_counter() - started)
+            if response.status_code == 200:
+                body = response.json()
+                observe_tokens(self.summary_model, body.get("usage"))
+                return body["choices"][0]["message"]["content"].strip()
         except Exception as e:
-            print(f"Error in AI service: {str(e)}")
-            return "I apologize, but I'm experiencing technical difficulties. Please try again later."
+            logger.warning("conversation summary failed", extra={"model": self.summary_model, "error": repr(e)})
+        return None
 
-    def analyze_sentiment(self, text: str) -> float:
+    async def analyze_sentiment(self, text: str) -> float:
         """
-        Analyze sentiment using Hugging Face Inference API (Russian model).
+        Analyze sentiment with the Russian model, locally or via Hugging Face Inference API.
         Returns a score: positive=1, neutral=0, negative=-1 (weighted by confidence).
         """
-        headers = {
-            "Authorization": f"Bearer {self.huggingface_api_key}",
-            "Content-Type": "application/json"
-        }
-        api_url = f"https://api-inference.huggingface.co/models/{self.sentiment_model}"
         try:
-            response = requests.post(api_url, headers=headers, json={"inputs": text})
-            response.raise_for_status()
-            result = response.json()
-            if isinstance(result, list) and len(result) > 0 and isinstance(result[0], list):
-                result = result[0]
-            # Find the label with the highest score
-            best = max(result, key=lambda x: x["score"])
-            label = best["label"].lower()
-            score = best["score"]
-            if label == "positive":
-                return 1 * score
-            elif label == "negative":
-                return -1 * score
-            else:
-                return 0
+            return await self.score_sentiment(text)
         except Exception as e:
-            print(f"Sentiment analysis error: {e}")
+            # Failures score as neutral and are not cached
+            logger.warning("sentiment analysis failed", extra={"backend": self.sentiment_backend, "error": repr(e)})
             return 0
 
-    def interpret_sentiment_score(self, score: float) -> str:
-        if score >= 0.7:
-            return "Очень позитивное"
-        elif score >= 0.2:
-            return "Позитивное"
-        elif score <= -0.7:
-            return "Очень негативное"
-        elif score <= -0.2:
-            return "Негативное"
+    async def score_sentiment(self, text: str) -> float:
+        """Like analyze_sentiment, but raises on failure so background jobs can retry"""
+        cached = await self.sentiment_cache.get(self.sentiment_model, text)
+        if cached is not None:
+            return cached
+        if self.local_sentiment is not None:
+            with span("sentiment_local"):
+                score = await self.local_sentiment.analyze(text)
         else:
-            return "Нейтральное"
+            score = await self._analyze_sentiment_remote(text)
+        await self.sentiment_cache.set(self.sentiment_model, text, score)
+        return score
+
+    async def analyze_sentiment_batch(self, texts: List[str]) -> List[float]:
+        """
+        analyze_sentiment for many texts: cache hits are skipped, duplicates are
+        scored once and the rest go to the model in batched calls. A failed
+        batch scores as neutral and is not cached.
+        """
+        scores: Dict[str, float] = {}
+        misses: List[str] = []
+        for text in dict.fromkeys(texts):
+            cached = await self.sentiment_cache.get(self.sentiment_model, text)
+            if cached is not None:
+                scores[text] = cached
+            else:
+                misses.append(text)
+
+        step = len(misses) if self.local_sentiment is not None else self.sentiment_remote_batch
+        for start in range(0, len(misses), max(step, 1)):
+            chunk = misses[start:start + step]
+            try:
+                if self.local_sentiment is not None:
+                    with span("sentiment_local"):
+                        chunk_scores = await self.local_sentiment.analyze_many(chunk)
+                else:
+                    chunk_scores = await self._analyze_sentiment_remote_batch(chunk)
+            except Exception as e:
+                logger.warning(
+                    "batch sentiment analysis failed",
+                    extra={"backend": self.sentiment_backend, "texts": len(chunk), "error": repr(e)}
+                )
+                scores.update((text, 0) for text in chunk)
+                continue
+            for text, score in zip(chunk, chunk_scores):
+                scores[text] = score
+                await self.sentiment_cache.set(self.sentiment_model, text, score)
+        return [scores[text] for text in texts]
+
+    async def warmup_sentiment(self, texts: List[str] = WARMUP_TEXTS):
+        """Pre-populate the sentiment cache with common comments"""
+        for text in texts:
+            await self.analyze_sentiment(text)
+
+    async def _analyze_sentiment_remote(self, text: str) -> float:
+        headers = {
+            "Authorization": f"Bearer {self.huggingface_api_key}",
+            "Content-Type": "application/json"
+        }
+        api_url = f"{self.huggingface_inference_url}/{self.sentiment_model}"
+        async with self.upstream.slot():
+            started = time.perf_counter()
+            try:
+                with span("huggingface"):
+                    response = await self.client.post(
+                        api_url,
+                        headers=headers,
+                        json={"inputs": text},
+                        timeout=self.sentiment_timeout
+                    )
+            except Exception as e:
+                observe_upstream("huggingface", self.sentiment_model, failure_status(e))
+                raise
+        observe_upstream("huggingface", self.sentiment_model, response.status_code, time.perf_counter() - started)
+        response.raise_for_status()
+        return sentiment_score_from_prediction(response.json())
+
+    async def _analyze_sentiment_remote_batch(self, texts: List[str]) -> List[float]:
+        """One Inference API call for several texts (a list "inputs" returns one prediction per text)"""
+        headers = {
+            "Authorization": f"Bearer {self.huggingface_api_key}",
+            "Content-Type": "application/json"
+        }
+        api_url = f"{self.huggingface_inference_url}/{self.sentiment_model}"
+        async with self.upstream.slot():
+            started = time.perf_counter()
+            try:
+                with span("huggingface"):
+                    response = await self.client.post(
+                        api_url,
+                        headers=headers,
+                        json={"inputs": texts},
+                        timeout=self.sentiment_timeout
+                    )
+            except Exception as e:
+                observe_upstream("huggingface", self.sentiment_model, failure_status(e))
+                raise
+        observe_upstream("huggingface", self.sentiment_model, response.status_code, time.perf_counter() - started)
+        response.raise_for_status()
+        predictions = response.json()
+        if not isinstance(predictions, list) or len(predictions) != len(texts):
+            raise ValueError(f"expected a list of {len(texts)} predictions")
+        return [sentiment_score_from_prediction(prediction) for prediction in predictions]
+
 
-ai_service = AIService() 
\ No newline at end of file
+def interpret_sentiment_score(score: float) -> str:
+    if score >= 0.7:
+        return "Очень позитивное"
+    elif score >= 0.2:
+        return "Позитивное"
+    elif score <= -0.7:
+        return "Очень негативное"
+    elif score <= -0.2:
+        return "Негативное"
+    else:
+        return "Нейтральное"
@@ -0,0 +1,130 @@
+import os
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.models import ChatHistory, ChatSummary
+from app.services import stats
+
+# Prompt budget for everything except the system prompt and the new message
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CHAT_CONTEXT_TOKENS", "1500"))
+# Newest turns considered for verbatim inclusion
+MAX_HISTORY_TURNS = int(os.getenv("CHAT_HISTORY_TURNS", "20"))
+# Fold older turns into the summary once this many have fallen out of the window
+SUMMARY_MIN_TURNS = int(os.getenv("CHAT_SUMMARY_MIN_TURNS", "4"))
+# Newest turns always left verbatim when folding
+SUMMARY_KEEP_TURNS = int(os.getenv("CHAT_SUMMARY_KEEP_TURNS", "6"))
+SUMMARY_BATCH_TURNS = 50
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token), good enough for budgeting"""
+    return len(text) // 4 + 1
+
+
+def describe_wellbeing(mood: Dict[str, Any], sleep: Dict[str, Any]) -> str:
+    """Compact mood/sleep summary for the prompt; empty when there is no data"""
+    parts = []
+    if mood["total_entries"]:
+        part = f"Mood over the last 7 days: average {mood['average_mood']:.1f}/5 across {mood['total_entries']} entries"
+        if mood["average_sentiment"] is not None:
+            distribution = mood["sentiment_distribution"]
+            dominant = max(distribution, key=distribution.get).replace("_", " ")
+            part += f", comments mostly {dominant}"
+        parts.append(part + ".")
+    if sleep["total_entries"]:
+        parts.append(
+            f"Average sleep over the last 7 days: {sleep['average_sleep_duration']:.1f} hours "
+            f"across {sleep['total_entries']} nights."
+        )
+    return " ".join(parts)
+
+
+async def build_chat_context(db: AsyncSession, user_id: int) -> Dict[str, Any]:
+    """
+    Assemble the rolling summary, a mood/sleep summary and as many recent turns
+    as fit into CONTEXT_TOKEN_BUDGET. needs_summary is set when enough
+    unsummarized turns have fallen out of the window that fold_chat_summary,
+    which always keeps the newest SUMMARY_KEEP_TURNS, has something to fold.
+    """
+    chat_summary = await db.scalar(select(ChatSummary).where(ChatSummary.user_id == user_id))
+    summary = chat_summary.summary if chat_summary else ""
+    summarized_through_id = chat_summary.summarized_through_id if chat_summary else 0
+
+    wellbeing = describe_wellbeing(
+        await stats.mood_summary(db, user_id, 7),
+        await stats.sleep_summary(db, user_id, 7)
+    )
+
+    # One row past the window tells us whether older unsummarized turns exist
+    recent = (await db.execute(
+        select(ChatHistory.message, ChatHistory.response)
+        .where(ChatHistory.user_id == user_id, ChatHistory.id > summarized_through_id)
+        .order_by(ChatHistory.created_at.desc(), ChatHistory.id.desc())
+        .limit(MAX_HISTORY_TURNS + 1)
+    )).all()
+
+    budget = CONTEXT_TOKEN_BUDGET - estimate_tokens(summary) - estimate_tokens(wellbeing)
+    history: List[Tuple[str, str]] = []
+    for message, response in recent[:MAX_HISTORY_TURNS]:
+        cost = estimate_tokens(message or "") + estimate_tokens(response or "")
+        if cost > budget:
+            break
+        history.append((message or "", response or ""))
+        budget -= cost
+    history.reverse()
+
+    # Dropped turns are the oldest ones; only those past the kept tail can be folded
+    dropped = len(recent) - len(history)
+    foldable = min(dropped, max(len(recent) - SUMMARY_KEEP_TURNS, 0))
+    return {
+        "summary": summary,
+        "wellbeing": wellbeing,
+        "history": history,
+        "needs_summary": foldable >= SUMMARY_MIN_TURNS or (foldable > 0 and len(recent) > MAX_HISTORY_TURNS)
+    }
+
+
+async def fold_chat_summary(db: AsyncSession, user_id: int, summarize) -> Optional[str]:
+    """
+    Fold unsummarized turns (all but the newest SUMMARY_KEEP_TURNS) into the
+    stored summary. `summarize(previous_summary, turns)` returns the new text.
+    Only the previous summary and the new turns are sent, never the full history.
+    """
+    chat_summary = await db.scalar(select(ChatSummary).where(ChatSummary.user_id == user_id))
+    if chat_summary is None:
+        chat_summary = ChatSummary(user_id=user_id, summary="", summarized_through_id=0)
+        db.add(chat_summary)
+
+    keep_after = (await db.execute(
+        select(ChatHistory.id)
+        .where(ChatHistory.user_id == user_id)
+        .order_by(ChatHistory.created_at.desc(), ChatHistory.id.desc())
+        .offset(max(SUMMARY_KEEP_TURNS - 1, 0))
+        .limit(1)
+    )).scalar()
+    if keep_after is None:
+        return None
+
+    turns = (await db.execute(
+        select(ChatHistory.id, ChatHistory.message, ChatHistory.response)
+        .where(
+            ChatHistory.user_id == user_id,
+            ChatHistory.id > chat_summary.summarized_through_id,
+            ChatHistory.id < keep_after
+        )
+        .order_by(ChatHistory.id)
+        .limit(SUMMARY_BATCH_TURNS)
+    )).all()
+    if not turns:
+        return None
+
+    summary = await summarize(
+        chat_summary.summary, [(message or "", response or "") for _, message, response in turns]
+    )
+    if not summary:
+        return None
+
+    chat_summary.summary = summary
+    chat_summary.summarized_through_id = turns[-1].id
+    await db.commit()
+    return summary
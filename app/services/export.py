@@ -0,0 +1,150 @@
+"""
+Streaming export of a user's full history (mood, journal, chat) as NDJSON or
+CSV, optionally gzipped. Rows are read through server-side cursors in
+EXPORT_BATCH_SIZE chunks and written out as they arrive, so memory stays flat
+however long the history is.
+
+Support staff can export any user from a shell:
+
+    python -m app.services.export --telegram-id 123456789 --format csv --gzip > export.csv.gz
+"""
+import argparse
+import asyncio
+import csv
+import io
+import os
+import sys
+import zlib
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Sequence
+import orjson
+from sqlalchemy import select
+from app.db.database import AsyncSessionLocal, async_engine
+from app.db.models import ChatHistory, JournalEntry, MoodEntry, User
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "500"))
+# Output is flushed to the client in chunks of roughly this many bytes
+EXPORT_CHUNK_BYTES = 64 * 1024
+
+FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+# type -> (model, exported columns); rows are written oldest first
+SOURCES = {
+    "mood": (MoodEntry, ("id", "created_at", "mood_level", "comment", "sentiment_score")),
+    "journal": (JournalEntry, ("id", "created_at", "sleep_start", "sleep_end", "nutrition_notes")),
+    "chat": (ChatHistory, ("id", "created_at", "message", "response")),
+}
+
+# One CSV header covering every type; cells a type doesn't have stay empty
+CSV_COLUMNS = ["type"] + list(dict.fromkeys(column for _, columns in SOURCES.values() for column in columns))
+
+
+def _plain(value: Any) -> Any:
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+async def export_rows(user_id: int, types: Sequence[str]) -> AsyncIterator[Dict[str, Any]]:
+    """Every row of the requested types, read with a fresh session and server-side cursors"""
+    async with AsyncSessionLocal() as db:
+        for kind in types:
+            model, columns = SOURCES[kind]
+            result = await db.stream(
+                select(*(getattr(model, column) for column in columns))
+                .where(model.user_id == user_id)
+                .order_by(model.created_at, model.id)
+                .execution_options(yield_per=EXPORT_BATCH_SIZE)
+            )
+            async for row in result:
+                yield {"type": kind, **{column: _plain(value) for column, value in zip(columns, row)}}
+
+
+def _ndjson(record: Dict[str, Any]) -> str:
+    return orjson.dumps(record).decode() + "\n"
+
+
+class _CsvLines:
+    """csv.writer into a reusable buffer, one formatted line at a time"""
+
+    def __init__(self):
+        self.buffer = io.StringIO()
+        self.writer = csv.DictWriter(self.buffer, fieldnames=CSV_COLUMNS, extrasaction="ignore")
+
+    def header(self) -> str:
+        self.writer.writeheader()
+        return self._take()
+
+    def __call__(self, record: Dict[str, Any]) -> str:
+        self.writer.writerow(record)
+        return self._take()
+
+    def _take(self) -> str:
+        line = self.buffer.getvalue()
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        return line
+
+
+async def export_chunks(
+    user_id: int, types: Sequence[str], fmt: str = "ndjson", compress: bool = False
+) -> AsyncIterator[bytes]:
+    """Encoded (and optionally gzipped) export, in chunks of about EXPORT_CHUNK_BYTES"""
+    # wbits=31 writes a gzip header and trailer around the deflate stream
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    pending: List[str] = []
+    size = 0
+
+    def flush() -> bytes:
+        nonlocal size
+        data = "".join(pending).encode()
+        pending.clear()
+        size = 0
+        return compressor.compress(data) if compressor else data
+
+    encode = _ndjson
+    if fmt == "csv":
+        encode = _CsvLines()
+        pending.append(encode.header())
+
+    async for record in export_rows(user_id, types):
+        line = encode(record)
+        pending.append(line)
+        size += len(line)
+        if size >= EXPORT_CHUNK_BYTES:
+            chunk = flush()
+            if chunk:
+                yield chunk
+
+    tail = flush()
+    if compressor:
+        tail += compressor.flush()
+    if tail:
+        yield tail
+
+
+def export_filename(fmt: str, compress: bool) -> str:
+    name = f"disare-export-{datetime.utcnow():%Y%m%d}.{fmt}"
+    return name + ".gz" if compress else name
+
+
+async def _main(args) -> int:
+    try:
+        async with AsyncSessionLocal() as db:
+            user_id = await db.scalar(select(User.id).where(User.telegram_id == args.telegram_id))
+        if user_id is None:
+            print(f"No user with telegram_id {args.telegram_id}", file=sys.stderr)
+            return 1
+        async for chunk in export_chunks(user_id, args.types, args.format, args.gzip):
+            sys.stdout.buffer.write(chunk)
+        sys.stdout.buffer.flush()
+        return 0
+    finally:
+        await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export a user's history to stdout")
+    parser.add_argument("--telegram-id", type=int, required=True)
+    parser.add_argument("--format", choices=list(FORMATS), default="ndjson")
+    parser.add_argument("--types", nargs="+", choices=list(SOURCES), default=list(SOURCES))
+    parser.add_argument("--gzip", action="store_true")
+    sys.exit(asyncio.run(_main(parser.parse_args())))
@@ -0,0 +1,77 @@
+"""
+Idempotency-Key replay for /api/chat/send, kept in the database so a client
+retry that lands on another worker gets the first reply instead of a second
+completion and a second chat history row.
+
+    IDEMPOTENCY_TTL=600     # seconds a key's reply is replayed
+"""
+import hashlib
+import os
+from datetime import datetime, timedelta
+from typing import NamedTuple, Optional
+from sqlalchemy import delete, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.models import ChatIdempotencyKey
+
+IDEMPOTENCY_TTL = float(os.getenv("IDEMPOTENCY_TTL", "600"))
+
+
+class StoredReply(NamedTuple):
+    response: str
+    responded_at: datetime
+    request_hash: Optional[str]
+
+    def matches(self, request_hash: str) -> bool:
+        """Whether the reply answers this request (rows without a hash predate the check)"""
+        return self.request_hash is None or self.request_hash == request_hash
+
+
+def request_hash(message: str) -> str:
+    return hashlib.sha256(message.encode()).hexdigest()
+
+
+def _cutoff() -> datetime:
+    return datetime.utcnow() - timedelta(seconds=IDEMPOTENCY_TTL)
+
+
+async def stored_reply(db: AsyncSession, user_id: int, key: str) -> Optional[StoredReply]:
+    row = (await db.execute(
+        select(ChatIdempotencyKey.response, ChatIdempotencyKey.responded_at, ChatIdempotencyKey.request_hash)
+        .where(
+            ChatIdempotencyKey.user_id == user_id,
+            ChatIdempotencyKey.key == key,
+            ChatIdempotencyKey.created_at >= _cutoff()
+        )
+    )).first()
+    return StoredReply(*row) if row else None
+
+
+async def record_reply(
+    db: AsyncSession, user_id: int, key: str, request_hash: str, response: str, responded_at: datetime
+) -> bool:
+    """
+    Store the reply for key in the caller's transaction. Returns False when a
+    live reply for the key already exists (another request got there first);
+    an expired one is replaced.
+    """
+    insert = postgresql.insert if db.bind.dialect.name == "postgresql" else sqlite.insert
+    statement = insert(ChatIdempotencyKey).values(
+        user_id=user_id, key=key, request_hash=request_hash, response=response,
+        responded_at=responded_at, created_at=datetime.utcnow()
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=["user_id", "key"],
+        set_={
+            "request_hash": statement.excluded.request_hash,
+            "response": statement.excluded.response,
+            "responded_at": statement.excluded.responded_at,
+            "created_at": statement.excluded.created_at
+        },
+        where=ChatIdempotencyKey.created_at < _cutoff()
+    ).returning(ChatIdempotencyKey.id)
+    return (await db.execute(statement)).first() is not None
+
+
+async def delete_expired(db: AsyncSession):
+    await db.execute(delete(ChatIdempotencyKey).where(ChatIdempotencyKey.created_at < _cutoff()))
@@ -0,0 +1,312 @@
+"""
+Background jobs stored in the application database, so no broker is needed.
+
+Request handlers enqueue() a job in their own transaction and return; a
+JobWorker in each web process (or a dedicated `python -m app.worker`) claims
+due jobs with a conditional UPDATE, which is safe across workers on both
+SQLite and Postgres. Failed jobs are retried with exponential backoff; a job
+whose worker died is picked up again once its lease expires.
+
+    JOB_WORKER=1            # run a worker in each web process (0 with app.worker)
+    JOB_CONCURRENCY=4       # jobs run at once per worker
+    JOB_POLL_INTERVAL=1     # seconds between polls when idle
+    JOB_LEASE=300           # seconds before a running job is considered abandoned
+    JOB_RETRY_BASE=5        # seconds, doubled on every attempt
+"""
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional, Tuple
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.metrics import JOB_DURATION, JOBS
+from app.db.database import AsyncSessionLocal
+from app.db.models import Job
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKER_ENABLED = os.getenv("JOB_WORKER", "1") == "1"
+
+# handler(context, payload); context is whatever the worker was built with (the AIService)
+Handler = Callable[[Any, Dict[str, Any]], Awaitable[None]]
+
+
+class JobKind(NamedTuple):
+    handler: Handler
+    concurrency: Optional[int]  # per worker; None means only JOB_CONCURRENCY applies
+    max_attempts: int
+
+
+class Schedule(NamedTuple):
+    """Run a job every `interval` seconds, `offset` seconds past the interval boundary (UTC)"""
+    interval: float
+    offset: float = 0
+
+    def next_run(self, now: datetime) -> datetime:
+        epoch = (now - datetime(1970, 1, 1)).total_seconds()
+        slots = (epoch - self.offset) // self.interval + 1
+        return datetime(1970, 1, 1) + timedelta(seconds=slots * self.interval + self.offset)
+
+
+kinds: Dict[str, JobKind] = {}
+schedules: Dict[str, Schedule] = {}
+
+
+def job(kind: str, concurrency: Optional[int] = None, max_attempts: int = 5, schedule: Optional[Schedule] = None):
+    """Register a handler for a job kind, optionally run on a schedule"""
+    def register(handler: Handler) -> Handler:
+        kinds[kind] = JobKind(handler, concurrency, max_attempts)
+        if schedule is not None:
+            schedules[kind] = schedule
+        return handler
+    return register
+
+
+async def enqueue(
+    db: AsyncSession,
+    kind: str,
+    payload: Optional[Dict[str, Any]] = None,
+    run_at: Optional[datetime] = None,
+    dedupe_key: Optional[str] = None,
+    max_attempts: Optional[int] = None
+):
+    """
+    Add a job in the caller's transaction; it becomes visible to workers when
+    the caller commits. While a job with the same dedupe_key is pending or
+    running, this is a no-op.
+    """
+    await enqueue_many(db, kind, [(payload, dedupe_key)], run_at=run_at, max_attempts=max_attempts)
+
+
+async def enqueue_many(
+    db: AsyncSession,
+    kind: str,
+    items: List[Tuple[Optional[Dict[str, Any]], Optional[str]]],
+    run_at: Optional[datetime] = None,
+    max_attempts: Optional[int] = None
+):
+    """enqueue() for several (payload, dedupe_key) pairs of one kind, in a single INSERT"""
+    if not items:
+        return
+    now = datetime.utcnow()
+    spec = kinds.get(kind)
+    insert = postgresql.insert if db.bind.dialect.name == "postgresql" else sqlite.insert
+    statement = insert(Job).values([
+        {
+            "kind": kind,
+            "payload": json.dumps(payload or {}),
+            "status": "pending",
+            "attempts": 0,
+            "max_attempts": max_attempts or (spec.max_attempts if spec else 5),
+            "dedupe_key": dedupe_key,
+            "run_at": run_at or now,
+            "created_at": now,
+            "updated_at": now
+        }
+        for payload, dedupe_key in items
+    ])
+    await db.execute(statement.on_conflict_do_nothing(index_elements=["dedupe_key"]))
+
+
+def retry_delay(attempts: int, base: float) -> float:
+    """Exponential backoff with jitter, capped at an hour"""
+    return min(3600.0, base * 2 ** (attempts - 1) * random.uniform(1, 2))
+
+
+class ClaimedJob(NamedTuple):
+    id: int
+    kind: str
+    payload: str
+    attempts: int
+    max_attempts: int
+
+
+class JobWorker:
+    def __init__(self, context: Any, concurrency: int = 4, poll_interval: float = 1.0,
+                 lease: float = 300, retry_base: float = 5):
+        self.context = context
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.lease = lease
+        self.retry_base = retry_base
+        self.running: Counter = Counter()
+        self._tasks: set = set()
+        self._loop_task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+    @classmethod
+    def from_env(cls, context: Any) -> "JobWorker":
+        return cls(
+            context,
+            concurrency=int(os.getenv("JOB_CONCURRENCY", "4")),
+            poll_interval=float(os.getenv("JOB_POLL_INTERVAL", "1")),
+            lease=float(os.getenv("JOB_LEASE", "300")),
+            retry_base=float(os.getenv("JOB_RETRY_BASE", "5"))
+        )
+
+    async def start(self):
+        """Start polling in the background; never touches the database itself, so boot can't fail here"""
+        self._wakeup = asyncio.Event()
+        self._loop_task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop polling and cancel running jobs; their leases expire and another worker retries them"""
+        tasks = [task for task in (self._loop_task, *self._tasks) if task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def ensure_scheduled(self):
+        """Make sure every scheduled kind has its next run queued (once across all workers)"""
+        if not schedules:
+            return
+        now = datetime.utcnow()
+        async with AsyncSessionLocal() as db:
+            for kind, schedule in schedules.items():
+                await enqueue(db, kind, run_at=schedule.next_run(now), dedupe_key=f"schedule:{kind}")
+            await db.commit()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"concurrency": self.concurrency, "running": {kind: n for kind, n in self.running.items() if n}}
+
+    async def _run(self):
+        scheduled = False
+        failures = 0
+        while True:
+            claimed = 0
+            try:
+                # Retried until it succeeds, so a worker that came up before the
+                # migrations ran (no jobs table yet) still queues the schedules
+                if not scheduled:
+                    await self.ensure_scheduled()
+                    scheduled = True
+                claimed = await self._claim()
+                failures = 0
+            except Exception:
+                failures += 1
+                logger.exception("job poll failed", extra={"failures": failures})
+            if claimed:
+                continue
+            self._wakeup.clear()
+            try:
+                # Back off while the database keeps failing instead of logging every poll
+                await asyncio.wait_for(self._wakeup.wait(), min(60.0, self.poll_interval * 2 ** failures))
+            except asyncio.TimeoutError:
+                pass
+
+    def _free_kinds(self) -> List[str]:
+        return [
+            kind for kind, spec in kinds.items()
+            if spec.concurrency is None or self.running[kind] < spec.concurrency
+        ]
+
+    async def _claim(self) -> int:
+        free = self.concurrency - sum(self.running.values())
+        free_kinds = self._free_kinds()
+        if free <= 0 or not free_kinds:
+            return 0
+
+        now = datetime.utcnow()
+        claimable = and_(
+            Job.kind.in_(free_kinds),
+            or_(
+                and_(Job.status == "pending", Job.run_at <= now),
+                # Abandoned by a worker that died mid-job
+                and_(Job.status == "running", Job.locked_until < now)
+            )
+        )
+        claimed = []
+        async with AsyncSessionLocal() as db:
+            candidates = (await db.execute(
+                select(Job.id, Job.kind).where(claimable).order_by(Job.run_at, Job.id).limit(free)
+            )).all()
+            pending_kinds = Counter()
+            for job_id, kind in candidates:
+                spec = kinds[kind]
+                if spec.concurrency is not None and self.running[kind] + pending_kinds[kind] >= spec.concurrency:
+                    continue
+                # Only one worker's UPDATE matches while the job is still claimable
+                result = await db.execute(
+                    update(Job)
+                    .where(Job.id == job_id, claimable)
+                    .values(
+                        status="running",
+                        attempts=Job.attempts + 1,
+                        locked_until=now + timedelta(seconds=self.lease),
+                        updated_at=now
+                    )
+                )
+                if result.rowcount == 1:
+                    pending_kinds[kind] += 1
+                    claimed.append(job_id)
+            if not claimed:
+                await db.rollback()
+                return 0
+            await db.commit()
+            rows = (await db.execute(
+                select(Job.id, Job.kind, Job.payload, Job.attempts, Job.max_attempts).where(Job.id.in_(claimed))
+            )).all()
+
+        for row in rows:
+            claimed_job = ClaimedJob(*row)
+            self.running[claimed_job.kind] += 1
+            task = asyncio.create_task(self._execute(claimed_job))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        return len(rows)
+
+    async def _execute(self, claimed: ClaimedJob):
+        started = time.perf_counter()
+        error: Optional[BaseException] = None
+        try:
+            await kinds[claimed.kind].handler(self.context, json.loads(claimed.payload))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            error = e
+        finally:
+            self.running[claimed.kind] -= 1
+            if self._wakeup is not None:
+                self._wakeup.set()
+        JOB_DURATION.labels(claimed.kind).observe(time.perf_counter() - started)
+        try:
+            await self._finish(claimed, error)
+        except Exception:
+            logger.exception("job bookkeeping failed", extra={"job_id": claimed.id, "kind": claimed.kind})
+
+    async def _finish(self, claimed: ClaimedJob, error: Optional[BaseException]):
+        now = datetime.utcnow()
+        values: Dict[str, Any] = {"locked_until": None, "updated_at": now}
+        if error is None:
+            outcome = "done"
+            values.update(status="done", dedupe_key=None, last_error=None)
+        elif claimed.attempts < claimed.max_attempts:
+            outcome = "retry"
+            values.update(
+                status="pending",
+                run_at=now + timedelta(seconds=retry_delay(claimed.attempts, self.retry_base)),
+                last_error=repr(error)
+            )
+        else:
+            outcome = "failed"
+            values.update(status="failed", dedupe_key=None, last_error=repr(error))
+
+        JOBS.labels(claimed.kind, outcome).inc()
+        log_extra = {"job_id": claimed.id, "kind": claimed.kind, "attempt": claimed.attempts}
+        if outcome == "retry":
+            logger.warning("job failed, will retry", extra={**log_extra, "error": repr(error)})
+        elif outcome == "failed":
+            logger.error("job failed permanently", extra={**log_extra, "error": repr(error)})
+
+        async with AsyncSessionLocal() as db:
+            await db.execute(update(Job).where(Job.id == claimed.id).values(**values))
+            schedule = schedules.get(claimed.kind)
+            if schedule is not None and outcome != "retry":
+                await enqueue(db, claimed.kind, run_at=schedule.next_run(now), dedupe_key=f"schedule:{claimed.kind}")
+            await db.commit()
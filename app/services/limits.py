@@ -0,0 +1,144 @@
+import asyncio
+import math
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+from app.core.cache import TTLCache
+
+
+class RateLimited(Exception):
+    """Caller exceeded its request budget; retry_after is in seconds"""
+
+    def __init__(self, retry_after: float, detail: str = "Too many requests"):
+        super().__init__(detail)
+        self.retry_after = retry_after
+        self.detail = detail
+
+
+class UpstreamBusy(RateLimited):
+    """All upstream AI slots stayed busy for longer than the queue timeout"""
+
+    def __init__(self, retry_after: float = 1.0):
+        super().__init__(retry_after, "AI service is busy, please retry shortly")
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """Consume one token; returns 0 on success or seconds until one is available"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """Per-key token buckets (per worker), LRU-bounded so idle keys are dropped"""
+
+    def __init__(self, per_minute: float, burst: int, max_keys: int = 10000):
+        self.rate = per_minute / 60
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[Hashable, TokenBucket]" = OrderedDict()
+
+    @classmethod
+    def per_worker(cls, per_minute: float, burst: int, workers: int) -> "RateLimiter":
+        """A limiter enforcing one worker's share of a budget spread over `workers` processes"""
+        workers = max(1, workers)
+        return cls(per_minute=per_minute / workers, burst=max(1, math.ceil(burst / workers)))
+
+    def check(self, key: Hashable):
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(self.rate, self.burst)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        self._buckets.move_to_end(key)
+        retry_after = bucket.take()
+        if retry_after:
+            raise RateLimited(retry_after)
+
+
+class ConcurrencyLimiter:
+    """Caps concurrent upstream calls; waiters queue up to queue_timeout seconds"""
+
+    def __init__(self, limit: int, queue_timeout: float):
+        self.limit = limit
+        self.queue_timeout = queue_timeout
+        self.in_use = 0
+        self.waiting = 0
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    @asynccontextmanager
+    async def slot(self):
+        if self._semaphore is None:
+            # Created lazily so it binds to the worker's running loop
+            self._semaphore = asyncio.Semaphore(self.limit)
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise UpstreamBusy()
+        finally:
+            self.waiting -= 1
+        self.in_use += 1
+        try:
+            yield
+        finally:
+            self.in_use -= 1
+            self._semaphore.release()
+
+
+class SingleFlight:
+    """
+    Coalesces identical in-flight calls so only one reaches the upstream; callers
+    with the same key share its result. With remember=True the result is also
+    replayed for ttl seconds (idempotency keys).
+    """
+
+    def __init__(self, ttl: float = 600, max_entries: int = 10000):
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self._results = TTLCache(max_entries=max_entries, ttl=ttl)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]], remember: bool = False) -> Any:
+        if remember:
+            result = self._results.get(key)
+            if result is not None:
+                return result
+
+        future = self._inflight.get(key)
+        while future is not None:
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise  # this caller was cancelled
+                # The running call's caller went away: run it for ourselves
+                future = self._inflight.get(key)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await fn()
+        except BaseException as e:
+            if isinstance(e, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(e)
+                future.exception()  # mark retrieved when nobody else was waiting
+            raise
+        finally:
+            self._inflight.pop(key, None)
+        future.set_result(result)
+        if remember:
+            self._results.set(key, result)
+        return result
@@ -0,0 +1,97 @@
+"""
+Smart notifications: a daily mood check-in reminder for active users who have
+not logged their mood yet, sent through the Telegram Bot API in batches by the
+job queue (see app/services/tasks.py).
+
+    REMINDER_HOUR_UTC=18        # when the daily reminder run starts
+    REMINDER_BATCH_SIZE=200     # recipients per send job
+    TELEGRAM_SEND_RATE=25       # messages per second (Telegram allows about 30)
+"""
+import asyncio
+import logging
+import os
+from datetime import date
+from typing import List, Optional, Tuple
+from dotenv import load_dotenv
+from sqlalchemy import and_, exists, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.models import User, UserDailyStats
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+REMINDER_HOUR_UTC = int(os.getenv("REMINDER_HOUR_UTC", "18"))
+REMINDER_BATCH_SIZE = int(os.getenv("REMINDER_BATCH_SIZE", "200"))
+REMINDER_TEXT = "Как прошёл ваш день? Отметьте настроение в Disare — это займёт минуту."
+
+
+async def users_to_remind(db: AsyncSession, day: date, after_id: int, limit: int) -> List[Tuple[int, int]]:
+    """(user id, telegram_id) of active users with no mood entry on `day`, by id after after_id"""
+    logged_mood = exists().where(and_(
+        UserDailyStats.user_id == User.id,
+        UserDailyStats.day == day,
+        UserDailyStats.mood_count > 0
+    ))
+    rows = await db.execute(
+        select(User.id, User.telegram_id)
+        .where(
+            User.id > after_id,
+            User.is_active.is_(True),
+            User.telegram_id.isnot(None),
+            ~logged_mood
+        )
+        .order_by(User.id)
+        .limit(limit)
+    )
+    return [tuple(row) for row in rows]
+
+
+class Notifier:
+    """Sends one text to many chats, paced to stay under Telegram's broadcast limit"""
+
+    def __init__(self, bot_token: Optional[str], rate: float = 25):
+        self.bot_token = bot_token
+        self.interval = 1 / rate
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.bot_token)
+
+    async def send_many(self, chat_ids: List[int], text: str) -> int:
+        """
+        Returns the number of messages delivered. Users who blocked the bot are
+        skipped; raises only if nothing could be delivered, so a retried batch
+        does not message the same users twice.
+        """
+        if not self.enabled:
+            raise RuntimeError("TELEGRAM_BOT_TOKEN is not set")
+        # Imported here: python-telegram-bot is slow to import and only the reminder jobs need it
+        from telegram import Bot
+        from telegram.error import Forbidden, RetryAfter, TelegramError
+
+        sent = 0
+        last_error: Optional[Exception] = None
+        async with Bot(self.bot_token) as bot:
+            for chat_id in chat_ids:
+                for _ in range(2):
+                    try:
+                        await bot.send_message(chat_id=chat_id, text=text)
+                        sent += 1
+                    except RetryAfter as e:
+                        # Flood control: wait as told and try this chat once more
+                        await asyncio.sleep(e.retry_after)
+                        continue
+                    except Forbidden:
+                        logger.info("reminder skipped, bot blocked", extra={"chat_id": chat_id})
+                    except TelegramError as e:
+                        last_error = e
+                        logger.warning("reminder failed", extra={"chat_id": chat_id, "error": repr(e)})
+                    break
+                await asyncio.sleep(self.interval)
+        if sent == 0 and last_error is not None:
+            raise last_error
+        return sent
+
+
+notifier = Notifier(os.getenv("TELEGRAM_BOT_TOKEN"), rate=float(os.getenv("TELEGRAM_SEND_RATE", "25")))
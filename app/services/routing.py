@@ -0,0 +1,154 @@
+import math
+import os
+import random
+import time
+from collections import deque
+from typing import Dict, List, NamedTuple, Optional
+
+# Upstream statuses worth retrying on another model
+RETRYABLE_STATUS = {408, 409, 425, 429, 500, 502, 503, 504}
+
+
+class ModelConfig(NamedTuple):
+    name: str
+    timeout: float
+
+
+def parse_models(spec: str, default_timeout: float = 60) -> List[ModelConfig]:
+    """Parse "model[=timeout_seconds],..." (model ids may contain ':' such as ':free')"""
+    models = []
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        name, _, timeout = item.partition("=")
+        models.append(ModelConfig(name.strip(), float(timeout) if timeout else default_timeout))
+    return models
+
+
+class ModelStats:
+    """
+    Rolling latency and error rate for one model. Full completion times and
+    streaming time-to-first-token are kept in separate windows: they measure
+    different things and would skew each other's median.
+    """
+
+    def __init__(self, window: int):
+        self.completion_latencies = deque(maxlen=window)
+        self.first_token_latencies = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)
+        self.requests = 0
+        self.cooldown_until = 0.0
+
+    def record(self, latency: float, ok: bool, streaming: bool = False):
+        self.requests += 1
+        self.outcomes.append(ok)
+        if ok:
+            (self.first_token_latencies if streaming else self.completion_latencies).append(latency)
+
+    @property
+    def error_rate(self) -> float:
+        return self.outcomes.count(False) / len(self.outcomes) if self.outcomes else 0.0
+
+    def latency(self, streaming: bool = False) -> Optional[float]:
+        """Median of recent successful completion (or, streaming, first-token) latencies"""
+        latencies = self.first_token_latencies if streaming else self.completion_latencies
+        if not latencies:
+            return None
+        ordered = sorted(latencies)
+        return ordered[len(ordered) // 2]
+
+
+class ModelRouter:
+    """
+    Ordered fallback chain of chat models. Unhealthy models (high recent error
+    rate, or cooling down after a 429) move to the back of the chain; short
+    messages go to the fastest healthy model first.
+    """
+
+    def __init__(
+        self,
+        models: List[ModelConfig],
+        short_message_chars: int = 160,
+        max_attempts: int = 3,
+        backoff_base: float = 0.25,
+        window: int = 50,
+        error_threshold: float = 0.5,
+        min_samples: int = 5,
+        cooldown: float = 30
+    ):
+        if not models:
+            raise ValueError("At least one chat model must be configured")
+        self.models = models
+        self.short_message_chars = short_message_chars
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.error_threshold = error_threshold
+        self.min_samples = min_samples
+        self.cooldown = cooldown
+        self.stats: Dict[str, ModelStats] = {model.name: ModelStats(window) for model in models}
+
+    @classmethod
+    def from_env(cls) -> "ModelRouter":
+        return cls(
+            parse_models(os.getenv(
+                "OPENROUTER_MODELS",
+                "anthropic/claude-3-opus-20240229=60,anthropic/claude-3-haiku=20"
+            )),
+            short_message_chars=int(os.getenv("CHAT_ROUTING_SHORT_CHARS", "160")),
+            max_attempts=int(os.getenv("CHAT_MAX_ATTEMPTS", "3")),
+            backoff_base=float(os.getenv("CHAT_BACKOFF_BASE", "0.25")),
+            window=int(os.getenv("CHAT_ROUTING_WINDOW", "50")),
+            error_threshold=float(os.getenv("CHAT_ROUTING_ERROR_THRESHOLD", "0.5"))
+        )
+
+    def healthy(self, name: str) -> bool:
+        stats = self.stats[name]
+        if stats.cooldown_until > time.monotonic():
+            return False
+        return len(stats.outcomes) < self.min_samples or stats.error_rate < self.error_threshold
+
+    def candidates(self, message: str, streaming: bool = False) -> List[ModelConfig]:
+        """
+        Models to try, in order, for this message (at most max_attempts). Short
+        messages are ranked by the latency that matters for the endpoint: time
+        to first token when streaming, full completion time otherwise.
+        """
+        healthy = [model for model in self.models if self.healthy(model.name)]
+        unhealthy = [model for model in self.models if not self.healthy(model.name)]
+        if len(message) <= self.short_message_chars:
+            def ranked_latency(model: ModelConfig) -> float:
+                latency = self.stats[model.name].latency(streaming)
+                return math.inf if latency is None else latency
+
+            # Stable sort: models without latency data keep their configured order
+            healthy.sort(key=ranked_latency)
+        ordered = healthy + unhealthy
+        # Retry the last model if the chain is shorter than max_attempts
+        while len(ordered) < self.max_attempts:
+            ordered.append(ordered[-1])
+        return ordered[:self.max_attempts]
+
+    def record(self, name: str, latency: float, ok: bool, status: Optional[int] = None, streaming: bool = False):
+        self.stats[name].record(latency, ok, streaming)
+        if status == 429:
+            self.stats[name].cooldown_until = time.monotonic() + self.cooldown
+
+    def backoff(self, attempt: int) -> float:
+        """Exponential backoff with full jitter before retry number `attempt` (1-based)"""
+        return random.uniform(0, self.backoff_base * 2 ** (attempt - 1))
+
+    def snapshot(self) -> Dict[str, Dict]:
+        def ms(seconds: Optional[float]) -> Optional[float]:
+            return seconds * 1000 if seconds is not None else None
+
+        return {
+            name: {
+                "requests": stats.requests,
+                "latency_ms": ms(stats.latency()),
+                "first_token_ms": ms(stats.latency(streaming=True)),
+                "error_rate": stats.error_rate,
+                "healthy": self.healthy(name)
+            }
+            for name, stats in self.stats.items()
+        }
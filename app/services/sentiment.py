@@ -0,0 +1,189 @@
+import asyncio
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+LOCAL_VARIANTS = ("torch", "quantized", "onnx")
+
+
+def sentiment_score_from_prediction(result) -> float:
+    """Map a text-classification prediction to positive=+score, negative=-score, neutral=0"""
+    if isinstance(result, list) and len(result) > 0 and isinstance(result[0], list):
+        result = result[0]
+    # Find the label with the highest score
+    best = max(result, key=lambda x: x["score"])
+    label = best["label"].lower()
+    score = best["score"]
+    if label == "positive":
+        return 1 * score
+    elif label == "negative":
+        return -1 * score
+    else:
+        return 0
+
+
+class LocalSentimentEngine:
+    """
+    In-process CPU inference for the sentiment model.
+
+    Requests arriving within a short window are tokenized and scored as one
+    batch on a dedicated thread, so the event loop never runs the model.
+    Variants: "torch" (fp32), "quantized" (dynamic int8 Linear layers),
+    "onnx" (ONNX Runtime via optimum).
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        variant: str = "torch",
+        batch_window_ms: float = 10,
+        max_batch_size: int = 32,
+        max_length: int = 512,
+        num_threads: int = 1
+    ):
+        if variant not in LOCAL_VARIANTS:
+            raise ValueError(f"Unknown local sentiment variant: {variant}")
+        self.model_name = model_name
+        self.variant = variant
+        self.batch_window = batch_window_ms / 1000
+        self.max_batch_size = max_batch_size
+        self.max_length = max_length
+        self.num_threads = num_threads
+        self._tokenizer = None
+        self._model = None
+        self._labels: List[str] = []
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_env(cls, model_name: str) -> "LocalSentimentEngine":
+        return cls(
+            model_name,
+            variant=os.getenv("SENTIMENT_LOCAL_VARIANT", "torch"),
+            batch_window_ms=float(os.getenv("SENTIMENT_BATCH_WINDOW_MS", "10")),
+            max_batch_size=int(os.getenv("SENTIMENT_MAX_BATCH", "32")),
+            num_threads=int(os.getenv("SENTIMENT_TORCH_THREADS", "1"))
+        )
+
+    def load(self):
+        """Load tokenizer and model (blocking; runs on the inference thread)"""
+        try:
+            import torch
+            from transformers import AutoTokenizer, AutoModelForSequenceClassification
+        except ImportError as e:
+            raise RuntimeError(
+                "Local sentiment backend requires the packages in requirements-sentiment.txt"
+            ) from e
+
+        torch.set_num_threads(self.num_threads)
+        self._tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+        if self.variant == "onnx":
+            from optimum.onnxruntime import ORTModelForSequenceClassification
+            model = ORTModelForSequenceClassification.from_pretrained(self.model_name, export=True)
+        else:
+            model = AutoModelForSequenceClassification.from_pretrained(self.model_name)
+            model.eval()
+            if self.variant == "quantized":
+                model = torch.quantization.quantize_dynamic(
+                    model, {torch.nn.Linear}, dtype=torch.qint8
+                )
+        id2label = model.config.id2label
+        self._labels = [id2label[i] for i in range(len(id2label))]
+        self._model = model
+
+    def predict(self, texts: List[str]) -> List[List[dict]]:
+        """Score a batch of texts (blocking); same shape as the Inference API output"""
+        import torch
+
+        inputs = self._tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=self.max_length,
+            return_tensors="pt"
+        )
+        with torch.inference_mode():
+            logits = self._model(**inputs).logits
+        probabilities = torch.softmax(logits, dim=-1).tolist()
+        return [
+            [{"label": label, "score": score} for label, score in zip(self._labels, row)]
+            for row in probabilities
+        ]
+
+    async def start(self):
+        """Start the batching loop; the model loads in the background (once, kept across restarts)"""
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sentiment")
+        self._queue = asyncio.Queue()
+        self._worker = asyncio.create_task(self._batch_loop(self._executor))
+
+    async def stop(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+        self._queue = None
+
+    async def analyze(self, text: str) -> float:
+        if self._queue is None:
+            raise RuntimeError("Local sentiment engine is not started")
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, future))
+        return await future
+
+    async def analyze_many(self, texts: List[str]) -> List[float]:
+        return list(await asyncio.gather(*(self.analyze(text) for text in texts)))
+
+    async def _next_batch(self) -> List[Tuple[str, asyncio.Future]]:
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.batch_window
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _batch_loop(self, executor: ThreadPoolExecutor):
+        loop = asyncio.get_running_loop()
+        load_error = None
+        try:
+            if self._model is None:
+                await loop.run_in_executor(executor, self.load)
+        except Exception as e:
+            logger.exception("Не удалось загрузить локальную модель", extra={"model": self.model_name})
+            load_error = e
+
+        while True:
+            batch = await self._next_batch()
+            if load_error is not None:
+                predictions, error = None, load_error
+            else:
+                try:
+                    predictions = await loop.run_in_executor(
+                        executor, self.predict, [text for text, _ in batch]
+                    )
+                    error = None
+                except Exception as e:
+                    predictions, error = None, e
+
+            for i, (_, future) in enumerate(batch):
+                if future.done():
+                    continue
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(sentiment_score_from_prediction(predictions[i]))
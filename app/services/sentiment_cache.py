@@ -0,0 +1,138 @@
+import asyncio
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from typing import Dict, Optional, Tuple
+from app.core.cache import TTLCache
+from app.core.metrics import SENTIMENT_CACHE
+
+logger = logging.getLogger(__name__)
+
+# Typical comments, also used by test_huggingface.py
+WARMUP_TEXTS = [
+    "Сегодня отличный день!",  # Позитивный на русском
+    "Я в восторге!",          # Очень позитивный на русском
+    "Мне грустно и плохо",    # Негативный на русском
+    "Обычный день",           # Нейтральный на русском
+]
+
+
+def normalize_text(text: str) -> str:
+    """Fold case, Unicode forms and whitespace so trivially different comments share a key"""
+    return " ".join(unicodedata.normalize("NFKC", text).casefold().split())
+
+
+def cache_key(model: str, text: str) -> str:
+    return hashlib.sha256(f"{model}\0{normalize_text(text)}".encode()).hexdigest()
+
+
+class SentimentCache:
+    """
+    Content-addressed sentiment scores: a bounded in-memory TTLCache tier per worker
+    and an optional SQLite tier shared by all workers on the host.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl: float = 7 * 86400, db_path: Optional[str] = None):
+        self.ttl = ttl
+        self.db_path = db_path
+        self.hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+        self._memory = TTLCache(max_entries=max_entries, ttl=ttl)
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "SentimentCache":
+        return cls(
+            max_entries=int(os.getenv("SENTIMENT_CACHE_SIZE", "10000")),
+            ttl=float(os.getenv("SENTIMENT_CACHE_TTL", str(7 * 86400))),
+            db_path=os.getenv("SENTIMENT_CACHE_DB") or None
+        )
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "persistent_hits": self.persistent_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "size": len(self._memory)
+        }
+
+    async def get(self, model: str, text: str) -> Optional[float]:
+        key = cache_key(model, text)
+        score = self._memory.get(key)
+        tier = "memory"
+        if score is None and self.db_path:
+            row = await asyncio.to_thread(self._get_persistent, key)
+            if row is not None:
+                score, expires_at = row
+                # Only for what is left of the shared entry's lifetime
+                self._memory.set(key, score, ttl=expires_at - time.time())
+                self.persistent_hits += 1
+                tier = "persistent"
+        if score is None:
+            self.misses += 1
+            tier = "miss"
+        else:
+            self.hits += 1
+        SENTIMENT_CACHE.labels(tier).inc()
+        return score
+
+    async def set(self, model: str, text: str, score: float):
+        key = cache_key(model, text)
+        self._memory.set(key, score)
+        if self.db_path:
+            await asyncio.to_thread(self._set_persistent, key, model, score, time.time() + self.ttl)
+
+    def clear(self):
+        self._memory.clear()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._db is None:
+            db = sqlite3.connect(self.db_path, timeout=5, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS sentiment_cache ("
+                "key TEXT PRIMARY KEY, model TEXT NOT NULL, "
+                "score REAL NOT NULL, expires_at REAL NOT NULL)"
+            )
+            db.execute("DELETE FROM sentiment_cache WHERE expires_at <= ?", (time.time(),))
+            db.commit()
+            self._db = db
+        return self._db
+
+    def _get_persistent(self, key: str) -> Optional[Tuple[float, float]]:
+        with self._db_lock:
+            try:
+                return self._connection().execute(
+                    "SELECT score, expires_at FROM sentiment_cache WHERE key = ? AND expires_at > ?",
+                    (key, time.time())
+                ).fetchone()
+            except sqlite3.Error as e:
+                logger.warning("sentiment cache error", extra={"error": repr(e)})
+                return None
+
+    def _set_persistent(self, key: str, model: str, score: float, expires_at: float):
+        with self._db_lock:
+            try:
+                db = self._connection()
+                db.execute(
+                    "INSERT OR REPLACE INTO sentiment_cache (key, model, score, expires_at) VALUES (?, ?, ?, ?)",
+                    (key, model, score, expires_at)
+                )
+                db.commit()
+            except sqlite3.Error as e:
+                logger.warning("sentiment cache error", extra={"error": repr(e)})
+
+    def close(self):
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
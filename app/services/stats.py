@@ -0,0 +1,234 @@
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Dict, Iterable, Optional, Tuple
+from sqlalchemy import case, func, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.profiling import span
+from app.db.models import JournalEntry, MoodEntry, UserDailyStats
+
+SENTIMENT_BUCKETS = ("very_positive", "positive", "neutral", "negative", "very_negative")
+
+
+def sentiment_bucket(score: float) -> str:
+    """Distribution bucket used by the mood stats endpoint"""
+    if score > 0.5:
+        return "very_positive"
+    elif score > 0.1:
+        return "positive"
+    elif score > -0.1:
+        return "neutral"
+    elif score > -0.5:
+        return "negative"
+    else:
+        return "very_negative"
+
+
+def sentiment_bucket_case(score_column, bucket: str):
+    """SQL counterpart of sentiment_bucket: 1 when score falls into bucket, else 0"""
+    bounds = {
+        "very_positive": score_column > 0.5,
+        "positive": (score_column > 0.1) & (score_column <= 0.5),
+        "neutral": (score_column > -0.1) & (score_column <= 0.1),
+        "negative": (score_column > -0.5) & (score_column <= -0.1),
+        "very_negative": score_column <= -0.5,
+    }
+    return func.coalesce(func.sum(case((bounds[bucket], 1), else_=0)), 0)
+
+
+def sleep_seconds_expr(dialect_name: str, start_column, end_column):
+    """SQL expression for end - start in seconds"""
+    if dialect_name == "sqlite":
+        return (func.julianday(end_column) - func.julianday(start_column)) * 86400
+    return func.extract("epoch", end_column - start_column)
+
+
+async def _increment(db: AsyncSession, user_id: int, day: date, increments: Dict[str, float]):
+    """Upsert the (user_id, day) rollup row, adding increments to its counters"""
+    await _increment_days(db, user_id, {day: increments})
+
+
+async def _increment_days(db: AsyncSession, user_id: int, per_day: Dict[date, Dict[str, float]]):
+    """Upsert several of the user's rollup rows in one statement"""
+    dialect = db.bind.dialect.name
+    insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+    now = datetime.utcnow()
+    # A multi-row VALUES needs the same columns in every row
+    columns = sorted({column for increments in per_day.values() for column in increments})
+    statement = insert(UserDailyStats).values([
+        {"user_id": user_id, "day": day, "updated_at": now, **{c: increments.get(c, 0) for c in columns}}
+        for day, increments in per_day.items()
+    ])
+    set_ = {
+        column: getattr(UserDailyStats, column) + statement.excluded[column]
+        for column in columns
+    }
+    set_["updated_at"] = now
+    await db.execute(
+        statement.on_conflict_do_update(index_elements=["user_id", "day"], set_=set_)
+    )
+
+
+async def record_mood(
+    db: AsyncSession,
+    user_id: int,
+    created_at: datetime,
+    mood_level: int,
+    sentiment_score: Optional[float] = None
+):
+    increments = {"mood_count": 1, "mood_sum": mood_level}
+    if sentiment_score is not None:
+        increments.update(_sentiment_increments(sentiment_score))
+    await _increment(db, user_id, created_at.date(), increments)
+
+
+async def record_moods(
+    db: AsyncSession, user_id: int, entries: Iterable[Tuple[datetime, int, Optional[float]]]
+):
+    """record_mood for many (created_at, mood_level, sentiment_score) entries, one upsert in total"""
+    per_day: Dict[date, Dict[str, float]] = defaultdict(lambda: defaultdict(int))
+    for created_at, mood_level, sentiment_score in entries:
+        increments = {"mood_count": 1, "mood_sum": mood_level}
+        if sentiment_score is not None:
+            increments.update(_sentiment_increments(sentiment_score))
+        for column, value in increments.items():
+            per_day[created_at.date()][column] += value
+    if per_day:
+        await _increment_days(db, user_id, per_day)
+
+
+async def record_sentiment(db: AsyncSession, user_id: int, created_at: datetime, sentiment_score: float):
+    """Add a sentiment score that was computed after the mood entry was recorded"""
+    await _increment(db, user_id, created_at.date(), _sentiment_increments(sentiment_score))
+
+
+def utc_date(value: datetime) -> date:
+    """UTC calendar day of a naive-UTC or timezone-aware datetime"""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return value.date()
+
+
+async def record_sleep(db: AsyncSession, user_id: int, sleep_end: datetime, sleep_seconds: float):
+    """Sleep counts toward the day it ended (the wake-up day), whenever the entry was written"""
+    await _increment(
+        db, user_id, utc_date(sleep_end), {"sleep_count": 1, "sleep_seconds": sleep_seconds}
+    )
+
+
+async def record_sleeps(db: AsyncSession, user_id: int, entries: Iterable[Tuple[datetime, float]]):
+    """record_sleep for many (sleep_end, sleep_seconds) entries, one upsert in total"""
+    per_day: Dict[date, Dict[str, float]] = defaultdict(lambda: defaultdict(int))
+    for sleep_end, sleep_seconds in entries:
+        day = utc_date(sleep_end)
+        per_day[day]["sleep_count"] += 1
+        per_day[day]["sleep_seconds"] += sleep_seconds
+    if per_day:
+        await _increment_days(db, user_id, per_day)
+
+
+def _sentiment_increments(sentiment_score: float) -> Dict[str, float]:
+    return {
+        "sentiment_count": 1,
+        "sentiment_sum": sentiment_score,
+        sentiment_bucket(sentiment_score): 1,
+    }
+
+
+def window_start(days: int) -> date:
+    """First day of a window of `days` whole UTC days ending today"""
+    return datetime.utcnow().date() - timedelta(days=days - 1)
+
+
+# The summary queries are built separately so check_indexes.py can EXPLAIN exactly these
+
+def mood_rollup_query(user_id: int, start: date):
+    return select(
+        func.sum(UserDailyStats.mood_count),
+        func.sum(UserDailyStats.mood_sum),
+        func.sum(UserDailyStats.sentiment_count),
+        func.sum(UserDailyStats.sentiment_sum),
+        *(func.sum(getattr(UserDailyStats, bucket)) for bucket in SENTIMENT_BUCKETS)
+    ).where(UserDailyStats.user_id == user_id, UserDailyStats.day >= start)
+
+
+def mood_raw_query(user_id: int, start: date):
+    return select(
+        func.count(MoodEntry.id),
+        func.sum(MoodEntry.mood_level),
+        func.count(MoodEntry.sentiment_score),
+        func.sum(MoodEntry.sentiment_score),
+        *(sentiment_bucket_case(MoodEntry.sentiment_score, bucket) for bucket in SENTIMENT_BUCKETS)
+    ).where(MoodEntry.user_id == user_id, MoodEntry.created_at >= datetime.combine(start, time.min))
+
+
+def sleep_rollup_query(user_id: int, start: date):
+    return select(
+        func.sum(UserDailyStats.sleep_count),
+        func.sum(UserDailyStats.sleep_seconds)
+    ).where(UserDailyStats.user_id == user_id, UserDailyStats.day >= start)
+
+
+def sleep_raw_query(dialect_name: str, user_id: int, start: date):
+    duration = sleep_seconds_expr(dialect_name, JournalEntry.sleep_start, JournalEntry.sleep_end)
+    return select(func.count(JournalEntry.id), func.sum(duration)).where(
+        JournalEntry.user_id == user_id,
+        JournalEntry.sleep_end >= datetime.combine(start, time.min),
+        JournalEntry.sleep_start.isnot(None),
+        JournalEntry.sleep_end.isnot(None)
+    )
+
+
+async def mood_summary(db: AsyncSession, user_id: int, days: int) -> Dict:
+    """Mood averages and sentiment distribution over the last `days` UTC days, today included"""
+    start = window_start(days)
+    with span("mood_rollup"):
+        totals = (await db.execute(mood_rollup_query(user_id, start))).one()
+
+    if totals[0] is None:
+        # No rollup rows for this window: aggregate the raw entries in SQL
+        with span("mood_raw"):
+            totals = (await db.execute(mood_raw_query(user_id, start))).one()
+
+    mood_count, mood_sum, sentiment_count, sentiment_sum = totals[:4]
+    if not mood_count:
+        return {
+            "average_mood": None,
+            "average_sentiment": None,
+            "sentiment_distribution": None,
+            "total_entries": 0
+        }
+
+    return {
+        "average_mood": mood_sum / mood_count,
+        "average_sentiment": sentiment_sum / sentiment_count if sentiment_count else None,
+        "sentiment_distribution": {
+            bucket: int(count or 0) for bucket, count in zip(SENTIMENT_BUCKETS, totals[4:])
+        },
+        "total_entries": int(mood_count)
+    }
+
+
+async def sleep_summary(db: AsyncSession, user_id: int, days: int) -> Dict:
+    """Average sleep duration (hours) of nights that ended in the last `days` UTC days, today included"""
+    start = window_start(days)
+    with span("sleep_rollup"):
+        sleep_count, sleep_seconds = (await db.execute(sleep_rollup_query(user_id, start))).one()
+
+    if sleep_count is None:
+        # No rollup rows for this window: aggregate the raw entries in SQL
+        with span("sleep_raw"):
+            sleep_count, sleep_seconds = (await db.execute(
+                sleep_raw_query(db.bind.dialect.name, user_id, start)
+            )).one()
+
+    if not sleep_count:
+        return {
+            "average_sleep_duration": None,
+            "total_entries": 0
+        }
+
+    return {
+        "average_sleep_duration": float(sleep_seconds) / sleep_count / 3600,
+        "total_entries": int(sleep_count)
+    }
@@ -0,0 +1,122 @@
+"""
+Job handlers run by the job queue (app/services/jobs.py). Importing this
+module registers them.
+
+    SENTIMENT_BACKFILL_INTERVAL=3600   # seconds between NULL sentiment_score sweeps
+    SENTIMENT_BACKFILL_BATCH=500       # entries queued per sweep
+    JOB_RETENTION_DAYS=7               # finished jobs kept for inspection
+"""
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict
+from sqlalchemy import delete, select, update
+from app.db.database import AsyncSessionLocal
+from app.db.models import Job, MoodEntry
+from app.services import idempotency, jobs, stats, versions
+from app.services.context import fold_chat_summary
+from app.services.jobs import Schedule, job
+from app.services.notifications import (
+    REMINDER_BATCH_SIZE, REMINDER_HOUR_UTC, REMINDER_TEXT, notifier, users_to_remind
+)
+
+SENTIMENT_BACKFILL_INTERVAL = float(os.getenv("SENTIMENT_BACKFILL_INTERVAL", "3600"))
+SENTIMENT_BACKFILL_BATCH = int(os.getenv("SENTIMENT_BACKFILL_BATCH", "500"))
+JOB_RETENTION_DAYS = float(os.getenv("JOB_RETENTION_DAYS", "7"))
+
+
+def mood_sentiment_key(entry_id: int) -> str:
+    return f"mood_sentiment:{entry_id}"
+
+
+def chat_summary_key(user_id: int) -> str:
+    return f"chat_summary:{user_id}"
+
+
+@job("mood_sentiment")
+async def score_mood_entry(ai_service, payload: Dict[str, Any]):
+    """Analyze a saved entry's comment and store the score"""
+    async with AsyncSessionLocal() as db:
+        entry = (await db.execute(
+            select(MoodEntry.user_id, MoodEntry.created_at, MoodEntry.comment, MoodEntry.sentiment_score)
+            .where(MoodEntry.id == payload["entry_id"])
+        )).first()
+    if entry is None or not entry.comment or entry.sentiment_score is not None:
+        return
+
+    sentiment_score = await ai_service.score_sentiment(entry.comment)
+    async with AsyncSessionLocal() as db:
+        # Guarded so a re-run after a lost lease doesn't count the score twice
+        result = await db.execute(
+            update(MoodEntry)
+            .where(MoodEntry.id == payload["entry_id"], MoodEntry.sentiment_score.is_(None))
+            .values(sentiment_score=sentiment_score)
+        )
+        if result.rowcount == 1:
+            await stats.record_sentiment(db, entry.user_id, entry.created_at, sentiment_score)
+            await versions.bump(db, entry.user_id)
+        await db.commit()
+
+
+@job("sentiment_backfill", max_attempts=1, schedule=Schedule(SENTIMENT_BACKFILL_INTERVAL))
+async def backfill_sentiment(ai_service, payload: Dict[str, Any]):
+    """Queue scoring for commented entries still missing a sentiment_score"""
+    async with AsyncSessionLocal() as db:
+        entry_ids = (await db.scalars(
+            select(MoodEntry.id)
+            .where(
+                MoodEntry.comment.isnot(None),
+                MoodEntry.comment != "",
+                MoodEntry.sentiment_score.is_(None)
+            )
+            .order_by(MoodEntry.id)
+            .limit(SENTIMENT_BACKFILL_BATCH)
+        )).all()
+        await jobs.enqueue_many(
+            db, "mood_sentiment", [({"entry_id": entry_id}, mood_sentiment_key(entry_id)) for entry_id in entry_ids]
+        )
+        await db.commit()
+
+
+@job("chat_summary", concurrency=2, max_attempts=3)
+async def update_chat_summary(ai_service, payload: Dict[str, Any]):
+    """Fold older turns into the user's rolling summary"""
+    async with AsyncSessionLocal() as db:
+        await fold_chat_summary(db, payload["user_id"], ai_service.summarize_conversation)
+
+
+@job("mood_reminders", max_attempts=3, schedule=Schedule(86400, offset=REMINDER_HOUR_UTC * 3600))
+async def queue_mood_reminders(ai_service, payload: Dict[str, Any]):
+    """Split today's reminder recipients into send_reminders batches"""
+    if not notifier.enabled:
+        return
+    today = datetime.utcnow().date()
+    after_id = 0
+    async with AsyncSessionLocal() as db:
+        while True:
+            recipients = await users_to_remind(db, today, after_id, REMINDER_BATCH_SIZE)
+            if not recipients:
+                break
+            # Keyed by day and first user so a retried run doesn't queue a batch twice
+            await jobs.enqueue(
+                db, "send_reminders",
+                {"telegram_ids": [telegram_id for _, telegram_id in recipients]},
+                dedupe_key=f"send_reminders:{today.isoformat()}:{recipients[0][0]}"
+            )
+            after_id = recipients[-1][0]
+        await db.commit()
+
+
+# One batch at a time per worker keeps the send rate under Telegram's limit
+@job("send_reminders", concurrency=1, max_attempts=3)
+async def send_reminders(ai_service, payload: Dict[str, Any]):
+    await notifier.send_many(payload["telegram_ids"], REMINDER_TEXT)
+
+
+@job("jobs_cleanup", max_attempts=1, schedule=Schedule(86400))
+async def cleanup_jobs(ai_service, payload: Dict[str, Any]):
+    """Delete finished jobs older than JOB_RETENTION_DAYS and expired chat idempotency keys"""
+    cutoff = datetime.utcnow() - timedelta(days=JOB_RETENTION_DAYS)
+    async with AsyncSessionLocal() as db:
+        await db.execute(delete(Job).where(Job.status.in_(("done", "failed")), Job.updated_at < cutoff))
+        await idempotency.delete_expired(db)
+        await db.commit()
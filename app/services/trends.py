@@ -0,0 +1,130 @@
+"""
+Long-horizon mood and sleep trends from the per-user daily rollup: one
+columnar fetch of up to a year of user_daily_stats rows, then vectorized
+NumPy over a dense day axis (days without data are NaN). Sleep is keyed by
+the day it ended, so sleep[d] is the night leading into day d.
+
+Rendered results are cached per user and window by the API's response cache
+until the user's data version changes (app/api/conditional.py).
+
+    TRENDS_MIN_PAIRS=5          # days needed before a correlation is reported
+"""
+import os
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.profiling import span
+from app.db.models import UserDailyStats
+
+ROLLING_WINDOWS = (7, 30)
+WEEKDAYS = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+TRENDS_MIN_PAIRS = int(os.getenv("TRENDS_MIN_PAIRS", "5"))
+
+
+def _ratio(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    """Elementwise numerator / denominator, NaN where the denominator is 0"""
+    out = np.full(numerator.shape, np.nan)
+    np.divide(numerator, denominator, out=out, where=denominator > 0)
+    return out
+
+
+def _series(values: np.ndarray, digits: int = 3) -> List[Optional[float]]:
+    return [None if np.isnan(value) else round(float(value), digits) for value in values]
+
+
+def _scalar(value: float, digits: int = 3) -> Optional[float]:
+    return None if np.isnan(value) else round(float(value), digits)
+
+
+def rolling_mean(sums: np.ndarray, counts: np.ndarray, window: int) -> np.ndarray:
+    """Trailing `window`-day mean of per-day sums/counts via cumulative sums"""
+    sum_cs = np.concatenate(([0.0], np.cumsum(sums)))
+    count_cs = np.concatenate(([0.0], np.cumsum(counts)))
+    lower = np.maximum(np.arange(1, len(sums) + 1) - window, 0)
+    upper = np.arange(1, len(sums) + 1)
+    return _ratio(sum_cs[upper] - sum_cs[lower], count_cs[upper] - count_cs[lower])
+
+
+def weekday_means(weekdays: np.ndarray, sums: np.ndarray, counts: np.ndarray) -> Dict[str, Optional[float]]:
+    totals = np.bincount(weekdays, weights=sums, minlength=7)
+    entries = np.bincount(weekdays, weights=counts, minlength=7)
+    return dict(zip(WEEKDAYS, _series(_ratio(totals, entries))))
+
+
+def paired_correlation(x: np.ndarray, y: np.ndarray) -> Dict[str, Any]:
+    """Pearson correlation of x[d] with y[d], over days where both exist"""
+    both = ~np.isnan(x) & ~np.isnan(y)
+    pairs = int(both.sum())
+    if pairs < TRENDS_MIN_PAIRS or np.std(x[both]) == 0 or np.std(y[both]) == 0:
+        return {"r": None, "days": pairs}
+    return {"r": _scalar(np.corrcoef(x[both], y[both])[0, 1]), "days": pairs}
+
+
+def streaks(logged: np.ndarray) -> Dict[str, int]:
+    """Longest run of logged days, and the current one (ending today or yesterday)"""
+    edges = np.diff(np.concatenate(([0], logged.astype(np.int8), [0])))
+    starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+    lengths = ends - starts
+    current = 0
+    if len(lengths) and ends[-1] >= len(logged) - 1:
+        current = int(lengths[-1])
+    return {"current": current, "longest": int(lengths.max()) if len(lengths) else 0}
+
+
+def compute_trends(rows: List[tuple], start: date, days: int) -> Dict[str, Any]:
+    """rows: (day, mood_count, mood_sum, sentiment_count, sentiment_sum, sleep_count, sleep_seconds)"""
+    columns = np.zeros((6, days))
+    if rows:
+        index = np.fromiter(((row[0] - start).days for row in rows), dtype=np.int64, count=len(rows))
+        columns[:, index] = np.array([row[1:] for row in rows], dtype=float).T
+    mood_count, mood_sum, sentiment_count, sentiment_sum, sleep_count, sleep_seconds = columns
+    sleep_hours = sleep_seconds / 3600
+
+    mood = _ratio(mood_sum, mood_count)
+    sentiment = _ratio(sentiment_sum, sentiment_count)
+    sleep = _ratio(sleep_hours, sleep_count)
+    weekdays = (np.arange(days) + start.weekday()) % 7
+
+    return {
+        "start": start.isoformat(),
+        "days": days,
+        "daily": {"mood": _series(mood), "sentiment": _series(sentiment), "sleep_hours": _series(sleep)},
+        "rolling": {
+            f"{window}d": {
+                "mood": _series(rolling_mean(mood_sum, mood_count, window)),
+                "sentiment": _series(rolling_mean(sentiment_sum, sentiment_count, window)),
+                "sleep_hours": _series(rolling_mean(sleep_hours, sleep_count, window)),
+            }
+            for window in ROLLING_WINDOWS
+        },
+        "weekday": {
+            "mood": weekday_means(weekdays, mood_sum, mood_count),
+            "sleep_hours": weekday_means(weekdays, sleep_hours, sleep_count),
+        },
+        # A night's sleep against the day that follows it: both keyed by the wake-up day
+        "sleep_vs_next_day": {
+            "mood": paired_correlation(sleep, mood),
+            "sentiment": paired_correlation(sleep, sentiment),
+        },
+        "streaks": streaks(mood_count > 0),
+    }
+
+
+async def user_trends(db: AsyncSession, user_id: int, days: int) -> Dict[str, Any]:
+    today = datetime.utcnow().date()
+    start = today - timedelta(days=days - 1)
+    window = (UserDailyStats.user_id == user_id, UserDailyStats.day >= start, UserDailyStats.day <= today)
+
+    with span("trends_fetch"):
+        rows = (await db.execute(
+            select(
+                UserDailyStats.day,
+                UserDailyStats.mood_count, UserDailyStats.mood_sum,
+                UserDailyStats.sentiment_count, UserDailyStats.sentiment_sum,
+                UserDailyStats.sleep_count, UserDailyStats.sleep_seconds
+            ).where(*window)
+        )).all()
+    with span("trends_compute"):
+        return compute_trends(rows, start, days)
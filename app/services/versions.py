@@ -0,0 +1,18 @@
+"""
+Per-user data version (users.data_version). Every write to a user's mood,
+journal or chat data bumps it in the same transaction, so a read can tell
+whether anything changed with one primary-key lookup.
+"""
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.models import User
+
+
+async def bump(db: AsyncSession, user_id: int):
+    await db.execute(
+        update(User).where(User.id == user_id).values(data_version=User.data_version + 1)
+    )
+
+
+async def current(db: AsyncSession, user_id: int) -> int:
+    return await db.scalar(select(User.data_version).where(User.id == user_id)) or 0
@@ -0,0 +1,42 @@
+"""
+Dedicated job worker, for running background jobs outside the web processes:
+
+    JOB_WORKER=0 gunicorn app.main:app -c gunicorn.conf.py   # web, enqueue only
+    python -m app.worker                                     # runs the jobs
+"""
+import asyncio
+import logging
+import signal
+from app.core.logging import configure_logging, shutdown_logging
+from app.db.database import async_engine
+from app.services import tasks  # noqa: F401  (registers the job handlers)
+from app.services.ai import AIService
+from app.services.jobs import JobWorker
+
+logger = logging.getLogger(__name__)
+
+
+async def run():
+    ai_service = AIService()
+    await ai_service.startup()
+    worker = JobWorker.from_env(ai_service)
+    await worker.start()
+    logger.info("job worker started", extra={"concurrency": worker.concurrency})
+
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stopping.set)
+    await stopping.wait()
+
+    await worker.stop()
+    await ai_service.shutdown()
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    configure_logging()
+    try:
+        asyncio.run(run())
+    finally:
+        shutdown_logging()
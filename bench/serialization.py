@@ -0,0 +1,130 @@
+"""
+Time the read path of a history response per 1k rows: fetching ORM objects vs
+column-only rows, and encoding with the stdlib JSONResponse vs orjson, plus
+the batch write response through FastAPI's response_model pass vs
+model_dump_json. Uses an in-memory SQLite database.
+
+Usage: python bench/serialization.py [--rows 1000] [--runs 20]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+from sqlalchemy import create_engine, insert, select  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+from app.api.mood import MoodEntryBatchResponse, MoodEntryResponse  # noqa: E402
+from app.api.responses import render_json  # noqa: E402
+from app.db.models import Base, MoodEntry, User  # noqa: E402
+from app.services.ai import interpret_sentiment_score  # noqa: E402
+
+COLUMNS = (MoodEntry.id, MoodEntry.created_at, MoodEntry.mood_level, MoodEntry.comment, MoodEntry.sentiment_score)
+
+
+def seed(engine, rows: int):
+    Base.metadata.create_all(engine)
+    now = datetime.utcnow()
+    with Session(engine) as db:
+        db.add(User(id=1, telegram_id=1))
+        db.execute(insert(MoodEntry), [
+            {
+                "user_id": 1,
+                "mood_level": i % 5 + 1,
+                "comment": f"Запись {i}: спокойный день, немного устал" if i % 3 else None,
+                "sentiment_score": (i % 21 - 10) / 10 if i % 3 else None,
+                "created_at": now - timedelta(minutes=i)
+            }
+            for i in range(rows)
+        ])
+        db.commit()
+
+
+def history_items(rows):
+    return [
+        {
+            "mood_level": row.mood_level,
+            "comment": row.comment,
+            "sentiment_score": row.sentiment_score,
+            "sentiment_text": interpret_sentiment_score(row.sentiment_score) if row.sentiment_score is not None else None,
+            "created_at": row.created_at
+        }
+        for row in rows
+    ]
+
+
+def batch_model(rows) -> MoodEntryBatchResponse:
+    return MoodEntryBatchResponse(items=[
+        MoodEntryResponse(
+            id=row.id,
+            mood_level=row.mood_level,
+            comment=row.comment,
+            sentiment_score=row.sentiment_score,
+            sentiment_text=interpret_sentiment_score(row.sentiment_score) if row.sentiment_score is not None else None,
+            created_at=row.created_at
+        )
+        for row in rows
+    ])
+
+
+def fastapi_response_model(model: MoodEntryBatchResponse) -> bytes:
+    """What FastAPI 0.104 does with a returned model: dump, re-validate, encode"""
+    validated = MoodEntryBatchResponse.model_validate(model.model_dump())
+    return JSONResponse(jsonable_encoder(validated)).body
+
+
+def measure(fn, runs: int) -> float:
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    engine = create_engine("sqlite://")
+    seed(engine, args.rows)
+    with Session(engine) as db:
+        orm_query = select(MoodEntry).where(MoodEntry.user_id == 1).order_by(MoodEntry.created_at.desc())
+        column_query = select(*COLUMNS).where(MoodEntry.user_id == 1).order_by(MoodEntry.created_at.desc())
+
+        def fetch_orm():
+            rows = db.scalars(orm_query).all()
+            db.expunge_all()
+            return rows
+
+        rows = db.execute(column_query).all()
+        items = history_items(rows)
+        model = batch_model(rows)
+        cases = [
+            ("fetch", "ORM objects", fetch_orm),
+            ("fetch", "column rows", lambda: db.execute(column_query).all()),
+            ("encode history", "jsonable_encoder + json", lambda: JSONResponse(jsonable_encoder(items)).body),
+            ("encode history", "orjson", lambda: render_json(items)),
+            ("batch response", "response_model pass", lambda: fastapi_response_model(model)),
+            ("batch response", "model_dump_json", lambda: model.model_dump_json()),
+        ]
+        # Same bytes either way; only the time differs
+        assert render_json(items) == JSONResponse(jsonable_encoder(items)).body
+
+        scale = 1000 / args.rows
+        print(f"{args.rows} rows, median of {args.runs} runs, ms per 1k rows")
+        for stage, name, fn in cases:
+            print(f"    {stage:<16} {name:<26} {measure(fn, args.runs) * scale * 1000:8.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+"""
+Measure per-worker startup cost: importing app.main in a fresh interpreter,
+and booting a uvicorn worker until /health answers. Workers run against a
+freshly migrated SQLite database in a temporary directory.
+
+Usage: python bench/startup.py [--runs 5] [--top 10]
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_time() -> float:
+    started = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "import app.main"], cwd=ROOT, check=True)
+    return time.perf_counter() - started
+
+
+def slowest_imports(top: int):
+    """Largest cumulative import time per third-party/stdlib package, from -X importtime"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=ROOT, check=True, capture_output=True, text=True
+    )
+    packages = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        package = name.split(".")[0]
+        if package != "app":
+            packages[package] = max(packages.get(package, 0), int(cumulative))
+    return sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def boot_time(timeout: float = 30) -> float:
+    port = free_port()
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except OSError:
+                time.sleep(0.02)
+        raise RuntimeError(f"worker did not answer /health within {timeout}s")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def migrate(database_url: str):
+    subprocess.run(
+        [sys.executable, "init_db.py"],
+        cwd=ROOT, check=True, capture_output=True, env={**os.environ, "DATABASE_URL": database_url}
+    )
+
+
+def summarize(name: str, samples):
+    print(
+        f"{name:<8} median {statistics.median(samples) * 1000:7.0f} ms   "
+        f"min {min(samples) * 1000:7.0f} ms   max {max(samples) * 1000:7.0f} ms"
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        # Inherited by every subprocess below
+        os.environ["DATABASE_URL"] = f"sqlite:///{directory}/startup.db"
+        migrate(os.environ["DATABASE_URL"])
+        imports = [import_time() for _ in range(args.runs)]
+        boots = [boot_time() for _ in range(args.runs)]
+    summarize("import", imports)
+    summarize("boot", boots)
+
+    print("\nSlowest top-level imports (cumulative):")
+    for name, microseconds in slowest_imports(args.top):
+        print(f"    {name:<24} {microseconds / 1000:7.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,142 @@
+"""
+Local stand-ins for the OpenRouter and HuggingFace APIs with configurable
+latency and error injection, for benchmarks that must not hit the real services.
+
+Usage: python bench/stubs.py [--port 8900] [--latency-ms 300] [--error-rate 0.05]
+
+Point the app at it with:
+    OPENROUTER_BASE_URL=http://127.0.0.1:8900/api/v1
+    HUGGINGFACE_INFERENCE_URL=http://127.0.0.1:8900/models
+    HUGGINGFACE_HUB_URL=http://127.0.0.1:8900
+"""
+import argparse
+import asyncio
+import json
+import random
+import zlib
+from dataclasses import dataclass
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+REPLY = (
+    "It sounds like a demanding week. Try a two-minute breathing break between meetings, "
+    "write down the one task that matters most tomorrow, and protect a fixed bedtime tonight."
+)
+
+
+@dataclass
+class StubConfig:
+    latency_ms: float = 300          # time to first byte of a chat completion
+    jitter_ms: float = 100
+    chunk_ms: float = 15             # delay between streamed chunks
+    chunks: int = 20
+    sentiment_latency_ms: float = 80
+    error_rate: float = 0.0          # fraction of upstream calls that fail
+    error_status: int = 503
+
+
+def create_app(config: StubConfig) -> FastAPI:
+    app = FastAPI(title="Upstream stubs")
+    app.state.calls = {"chat": 0, "stream": 0, "sentiment": 0, "errors": 0}
+
+    async def delay(ms: float):
+        await asyncio.sleep(max(0.0, ms + random.uniform(-config.jitter_ms, config.jitter_ms)) / 1000)
+
+    def failed() -> bool:
+        if random.random() < config.error_rate:
+            app.state.calls["errors"] += 1
+            return True
+        return False
+
+    @app.post("/api/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        await delay(config.latency_ms)
+        if failed():
+            return JSONResponse({"error": {"message": "stubbed failure"}}, status_code=config.error_status)
+
+        if not body.get("stream"):
+            app.state.calls["chat"] += 1
+            return {
+                "model": body.get("model"),
+                "choices": [{"message": {"role": "assistant", "content": REPLY}}],
+                "usage": {"prompt_tokens": 250, "completion_tokens": 45}
+            }
+
+        app.state.calls["stream"] += 1
+        words = REPLY.split(" ")
+        size = max(1, len(words) // config.chunks)
+
+        async def events():
+            yield ": OPENROUTER PROCESSING\n\n"
+            for start in range(0, len(words), size):
+                text = " ".join(words[start:start + size]) + " "
+                yield f"data: {json.dumps({'choices': [{'delta': {'content': text}}]})}\n\n"
+                await asyncio.sleep(config.chunk_ms / 1000)
+            usage = {"prompt_tokens": 250, "completion_tokens": len(words)}
+            yield f"data: {json.dumps({'choices': [{'delta': {}}], 'usage': usage})}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.post("/models/{model:path}")
+    async def sentiment(model: str, request: Request):
+        body = await request.json()
+        await delay(config.sentiment_latency_ms)
+        if failed():
+            return JSONResponse({"error": "stubbed failure"}, status_code=config.error_status)
+        app.state.calls["sentiment"] += 1
+        inputs = body["inputs"]
+
+        def predict(text: str):
+            positive = (zlib.crc32(text.encode()) % 100) / 100
+            return [
+                {"label": "positive", "score": positive},
+                {"label": "neutral", "score": (1 - positive) / 2},
+                {"label": "negative", "score": (1 - positive) / 2}
+            ]
+
+        if isinstance(inputs, list):
+            return [predict(text) for text in inputs]
+        return [predict(inputs)]
+
+    @app.get("/api/models/{model:path}")
+    async def model_info(model: str):
+        return {"id": model, "inference": "warm"}
+
+    @app.get("/stats")
+    async def stats():
+        return app.state.calls
+
+    return app
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="OpenRouter/HuggingFace stub server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency-ms", type=float, default=StubConfig.latency_ms)
+    parser.add_argument("--jitter-ms", type=float, default=StubConfig.jitter_ms)
+    parser.add_argument("--chunk-ms", type=float, default=StubConfig.chunk_ms)
+    parser.add_argument("--chunks", type=int, default=StubConfig.chunks)
+    parser.add_argument("--sentiment-latency-ms", type=float, default=StubConfig.sentiment_latency_ms)
+    parser.add_argument("--error-rate", type=float, default=StubConfig.error_rate)
+    parser.add_argument("--error-status", type=int, default=StubConfig.error_status)
+    args = parser.parse_args()
+
+    config = StubConfig(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        chunk_ms=args.chunk_ms,
+        chunks=args.chunks,
+        sentiment_latency_ms=args.sentiment_latency_ms,
+        error_rate=args.error_rate,
+        error_status=args.error_status
+    )
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
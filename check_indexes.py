@@ -0,0 +1,97 @@
+"""
+EXPLAIN the per-user history/stats queries and check they use the
+(user_id, created_at) / (user_id, day) / (user_id, sleep_end) indexes instead
+of scanning the whole table. Date-windowed queries must also bound the index
+lookup by their range, not just by user. The statements come from the same
+builders the API uses: keyset history pages (first page and a page past a
+cursor), the daily-rollup stats and their raw-entry fallbacks.
+
+Usage: python check_indexes.py   (against DATABASE_URL, after init_db.py)
+"""
+import sys
+from datetime import date, datetime
+from app.api.chat import chat_history_query
+from app.api.journal import journal_entries_query
+from app.api.mood import mood_history_query
+from app.api.pagination import encode_cursor
+from app.db.database import engine
+from app.services import stats
+
+def expected_queries(dialect_name: str):
+    user_id = 1
+    limit = 10
+    cursor = encode_cursor(datetime.utcnow(), 1000)
+    start = stats.window_start(7)
+    # (name, expected index, column the index lookup must be range-bounded by, statement)
+    queries = []
+    for suffix, page_cursor in (("", None), (" (after cursor)", cursor)):
+        queries += [
+            (
+                "get_chat_history" + suffix,
+                "ix_chat_history_user_id_created_at", None,
+                chat_history_query(user_id, page_cursor, limit)
+            ),
+            (
+                "get_mood_history" + suffix,
+                "ix_mood_entries_user_id_created_at", None,
+                mood_history_query(user_id, page_cursor, limit)
+            ),
+            (
+                "get_journal_entries" + suffix,
+                "ix_journal_entries_user_id_created_at", None,
+                journal_entries_query(user_id, date.today(), None, page_cursor, limit)
+            ),
+        ]
+    return queries + [
+        ("get_mood_stats", "ix_user_daily_stats_user_id_day", "day", stats.mood_rollup_query(user_id, start)),
+        (
+            "get_mood_stats (raw)",
+            "ix_mood_entries_user_id_created_at", "created_at",
+            stats.mood_raw_query(user_id, start)
+        ),
+        ("get_journal_stats", "ix_user_daily_stats_user_id_day", "day", stats.sleep_rollup_query(user_id, start)),
+        (
+            "get_journal_stats (raw)",
+            "ix_journal_entries_user_id_sleep_end", "sleep_end",
+            stats.sleep_raw_query(dialect_name, user_id, start)
+        ),
+    ]
+
+def bounded_by(plan: str, column: str) -> bool:
+    """Whether the index lookup itself carries a lower bound on column (not a filter afterwards)"""
+    for line in plan.splitlines():
+        compact = line.replace(" ", "")
+        # SQLite: "SEARCH t USING INDEX ix (user_id=? AND day>?)"; Postgres: "Index Cond: (... (day >= ...))"
+        if ("INDEX" in compact or "IndexCond" in compact) and f"{column}>" in compact:
+            return True
+    return False
+
+def explain(connection, statement) -> str:
+    compiled = statement.compile(dialect=connection.dialect)
+    params = compiled.params
+    if compiled.positional:
+        params = tuple(params[name] for name in compiled.positiontup)
+    prefix = "EXPLAIN QUERY PLAN " if connection.dialect.name == "sqlite" else "EXPLAIN "
+    rows = connection.exec_driver_sql(prefix + compiled.string, params).fetchall()
+    return "\n".join(" ".join(str(column) for column in row) for row in rows)
+
+def main() -> int:
+    failures = 0
+    with engine.connect() as connection:
+        if connection.dialect.name == "postgresql":
+            # Small dev tables would otherwise always be seq-scanned
+            connection.exec_driver_sql("SET enable_seqscan = off")
+        for name, index, range_column, statement in expected_queries(connection.dialect.name):
+            plan = explain(connection, statement)
+            # On SQLite, also catch pages that need a separate sort instead of walking the index
+            ok = index in plan and "TEMP B-TREE" not in plan
+            if range_column:
+                ok = ok and bounded_by(plan, range_column)
+            failures += not ok
+            expected = f"{index} bounded by {range_column}" if range_column else index
+            print(f"[{'OK' if ok else 'FAIL'}] {name}: expected {expected}")
+            print("    " + plan.replace("\n", "\n    "))
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
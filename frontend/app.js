@@ -19,24 +19,53 @@ async function initApp() {
 
     try {
         // Authenticate user
-        const response = await fetch(`${API_BASE_URL}/auth/telegram`, {
+        await login();
+        console.log('User authenticated:', userData);
+    } catch (error) {
+        console.error('Authentication error:', error);
+        tg.showAlert('Failed to authenticate. Please try again.');
+    }
+}
+
+// Exchange Telegram's initData for a session token; concurrent callers share one request
+let loginRequest = null;
+
+function login() {
+    if (!loginRequest) {
+        loginRequest = fetch(`${API_BASE_URL}/auth/telegram`, {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
             },
-            body: JSON.stringify(initData),
+            body: JSON.stringify({ init_data: tg.initData }),
+        }).then(async response => {
+            if (!response.ok) {
+                throw new Error('Authentication failed');
+            }
+            userData = await response.json();
+            return userData;
+        }).finally(() => {
+            loginRequest = null;
         });
+    }
+    return loginRequest;
+}
 
-        if (!response.ok) {
-            throw new Error('Authentication failed');
-        }
+// API calls identify the user by the session token issued at login
+function authHeaders(headers = {}) {
+    return { ...headers, 'Authorization': `Bearer ${userData.access_token}` };
+}
 
-        userData = await response.json();
-        console.log('User authenticated:', userData);
-    } catch (error) {
-        console.error('Authentication error:', error);
-        tg.showAlert('Failed to authenticate. Please try again.');
+// Authenticated API call. Session tokens expire (SESSION_TTL), so on a 401
+// log in again with the same initData and retry once.
+async function apiFetch(path, options = {}) {
+    const send = () => fetch(`${API_BASE_URL}${path}`, { ...options, headers: authHeaders(options.headers) });
+    const response = await send();
+    if (response.status !== 401 || !tg.initData) {
+        return response;
     }
+    await login();
+    return send();
 }
 
 // Screen navigation
@@ -45,6 +74,10 @@ function showScreen(screenId) {
         screen.classList.remove('active');
     });
     document.getElementById(screenId).classList.add('active');
+
+    if (screenId === 'chat-screen' && !chatHistory.loaded) {
+        loadChatHistory();
+    }
 }
 
 // Start app
@@ -63,15 +96,16 @@ async function submitMood() {
     }
 
     try {
-        const response = await fetch(`${API_BASE_URL}/mood/track`, {
+        const response = await apiFetch('/mood/track', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
             },
             body: JSON.stringify({
-                telegram_id: userData.telegram_id,
                 mood_level: parseInt(moodLevel),
-                comment: comment
+                comment: comment,
+                // Sentiment isn't shown here, so let the server score it in the background
+                defer_sentiment: true
             }),
         });
 
@@ -92,47 +126,152 @@ async function submitMood() {
 }
 
 // Chat functionality
+let chatSending = false;
+
 async function sendMessage() {
     const input = document.getElementById('message-input');
     const message = input.value.trim();
 
-    if (!message) return;
+    // Ignore double taps while a reply is still streaming
+    if (!message || chatSending) return;
+    chatSending = true;
 
     // Add user message to chat
     addMessageToChat(message, 'user');
     input.value = '';
 
+    // Render the AI reply token by token as it streams in
+    const aiMessage = addMessageToChat('', 'ai');
+
     try {
-        const response = await fetch(`${API_BASE_URL}/chat/send`, {
+        const response = await apiFetch('/chat/stream', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
             },
             body: JSON.stringify({
-                telegram_id: userData.telegram_id,
                 message: message
             }),
         });
 
-        if (!response.ok) {
+        if (response.status === 429) {
+            const retryAfter = response.headers.get('Retry-After') || 'a few';
+            aiMessage.remove();
+            tg.showAlert(`You're sending messages too quickly. Please wait ${retryAfter} seconds.`);
+            return;
+        }
+        if (!response.ok || !response.body) {
             throw new Error('Failed to send message');
         }
 
-        const result = await response.json();
-        addMessageToChat(result.response, 'ai');
+        await readEventStream(response, (event, data) => {
+            if (event === 'done') {
+                aiMessage.textContent = data.response;
+            } else if (event === 'error') {
+                // The reply was cut off and not saved; keep what arrived and say so
+                tg.showAlert(data.detail);
+            } else if (data.delta) {
+                aiMessage.textContent += data.delta;
+            }
+            scrollChatToBottom();
+        });
     } catch (error) {
         console.error('Error sending message:', error);
+        aiMessage.remove();
         tg.showAlert('Failed to send message. Please try again.');
+    } finally {
+        chatSending = false;
     }
 }
 
-function addMessageToChat(message, type) {
+// Parse a text/event-stream response body, calling onEvent(event, data) per message
+async function readEventStream(response, onEvent) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const rawEvent = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+
+            let event = 'message';
+            let data = '';
+            rawEvent.split('\n').forEach(line => {
+                if (line.startsWith('event:')) event = line.slice(6).trim();
+                else if (line.startsWith('data:')) data += line.slice(5).trim();
+            });
+            if (data) onEvent(event, JSON.parse(data));
+        }
+    }
+}
+
+function scrollChatToBottom() {
     const chatMessages = document.getElementById('chat-messages');
+    chatMessages.scrollTop = chatMessages.scrollHeight;
+}
+
+// Chat history: keyset-paginated, older pages load when scrolled to the top
+const CHAT_PAGE_SIZE = 20;
+const chatHistory = { loaded: false, loading: false, nextCursor: null };
+
+async function loadChatHistory() {
+    if (!userData || chatHistory.loading) return;
+    if (chatHistory.loaded && !chatHistory.nextCursor) return;
+    chatHistory.loading = true;
+
+    const params = new URLSearchParams({ limit: CHAT_PAGE_SIZE });
+    if (chatHistory.nextCursor) params.set('cursor', chatHistory.nextCursor);
+
+    try {
+        const response = await apiFetch(`/chat/history?${params}`);
+        if (!response.ok) {
+            throw new Error('Failed to load chat history');
+        }
+        const page = await response.json();
+
+        // Prepend the older page while keeping the visible messages in place
+        const chatMessages = document.getElementById('chat-messages');
+        const previousHeight = chatMessages.scrollHeight;
+        const fragment = document.createDocumentFragment();
+        page.items.forEach(entry => {
+            fragment.appendChild(createMessageElement(entry.message, 'user'));
+            fragment.appendChild(createMessageElement(entry.response, 'ai'));
+        });
+        chatMessages.insertBefore(fragment, chatMessages.firstChild);
+
+        if (chatHistory.loaded) {
+            chatMessages.scrollTop += chatMessages.scrollHeight - previousHeight;
+        } else {
+            chatMessages.scrollTop = chatMessages.scrollHeight;
+        }
+        chatHistory.nextCursor = page.next_cursor;
+        chatHistory.loaded = true;
+    } catch (error) {
+        console.error('Error loading chat history:', error);
+    } finally {
+        chatHistory.loading = false;
+    }
+}
+
+function createMessageElement(message, type) {
     const messageElement = document.createElement('div');
     messageElement.className = `message ${type}-message`;
     messageElement.textContent = message;
+    return messageElement;
+}
+
+function addMessageToChat(message, type) {
+    const chatMessages = document.getElementById('chat-messages');
+    const messageElement = createMessageElement(message, type);
     chatMessages.appendChild(messageElement);
     chatMessages.scrollTop = chatMessages.scrollHeight;
+    return messageElement;
 }
 
 // Journal functionality
@@ -142,13 +281,12 @@ async function saveJournal() {
     const nutritionNotes = document.getElementById('nutrition-notes').value;
 
     try {
-        const response = await fetch(`${API_BASE_URL}/journal/entry`, {
+        const response = await apiFetch('/journal/entry', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
             },
             body: JSON.stringify({
-                telegram_id: userData.telegram_id,
                 sleep_start: sleepStart ? new Date(sleepStart).toISOString() : null,
                 sleep_end: sleepEnd ? new Date(sleepEnd).toISOString() : null,
                 nutrition_notes: nutritionNotes
@@ -185,6 +323,13 @@ document.addEventListener('DOMContentLoaded', () => {
         });
     });
 
+    // Load older chat messages when scrolled to the top
+    document.getElementById('chat-messages').addEventListener('scroll', (e) => {
+        if (e.target.scrollTop < 50 && chatHistory.nextCursor) {
+            loadChatHistory();
+        }
+    });
+
     // Chat input enter key
     document.getElementById('message-input').addEventListener('keypress', (e) => {
         if (e.key === 'Enter') {
@@ -0,0 +1,22 @@
+# Gunicorn settings shared by render.yaml. Prometheus multiprocess mode needs
+# PROMETHEUS_MULTIPROC_DIR set for the master and every worker, an empty
+# directory on boot, and dead workers' live gauges removed.
+import os
+import shutil
+
+worker_class = "uvicorn.workers.UvicornWorker"
+workers = int(os.getenv("WEB_CONCURRENCY", "4"))
+# Workers read it to split per-user limits kept in process memory (app/api/chat.py)
+os.environ["WEB_CONCURRENCY"] = str(workers)
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+
+def on_starting(server):
+    directory = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+    if directory:
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory, exist_ok=True)
+
+def child_exit(server, worker):
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
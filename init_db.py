@@ -1,9 +1,20 @@
+import os
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import inspect
 from app.db.database import engine
-from app.db.models import Base
+
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.abspath(__file__)), "alembic.ini")
 
 def init_database():
-    Base.metadata.create_all(bind=engine)
+    """Bring the database schema up to date through Alembic migrations"""
+    config = Config(ALEMBIC_INI)
+    tables = inspect(engine).get_table_names()
+    if "users" in tables and "alembic_version" not in tables:
+        # Created by the old Base.metadata.create_all(): adopt it at the initial revision
+        command.stamp(config, "0001")
+    command.upgrade(config, "head")
     print("Database initialized successfully!")
 
 if __name__ == "__main__":
-    init_database() 
\ No newline at end of file
+    init_database()
@@ -0,0 +1,25 @@
+"""composite (user_id, created_at) indexes on entry tables
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17
+"""
+from alembic import op
+
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+TABLES = ("mood_entries", "journal_entries", "chat_history")
+
+
+def upgrade():
+    for table in TABLES:
+        op.create_index(f"ix_{table}_user_id_created_at", table, ["user_id", "created_at"])
+
+
+def downgrade():
+    for table in TABLES:
+        op.drop_index(f"ix_{table}_user_id_created_at", table_name=table)
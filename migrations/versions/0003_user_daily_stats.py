@@ -0,0 +1,105 @@
+"""per-user daily mood/sleep rollup, backfilled from existing entries
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17
+"""
+from collections import defaultdict
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+COUNTERS = (
+    "mood_count", "mood_sum", "sentiment_count", "sentiment_sum",
+    "very_positive", "positive", "neutral", "negative", "very_negative",
+    "sleep_count", "sleep_seconds",
+)
+
+
+def upgrade():
+    user_daily_stats = op.create_table(
+        "user_daily_stats",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("mood_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("mood_sum", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("sentiment_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("sentiment_sum", sa.Float(), nullable=False, server_default="0"),
+        sa.Column("very_positive", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("positive", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("neutral", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("negative", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("very_negative", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("sleep_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("sleep_seconds", sa.Float(), nullable=False, server_default="0"),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+    )
+    op.create_index("ix_user_daily_stats_id", "user_daily_stats", ["id"])
+    op.create_index(
+        "ix_user_daily_stats_user_id_day", "user_daily_stats", ["user_id", "day"], unique=True
+    )
+
+    # Backfill so rollup-based stats cover entries written before this revision
+    bind = op.get_bind()
+    rollup = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+    moods = bind.execute(sa.text(
+        "SELECT user_id, created_at, mood_level, sentiment_score FROM mood_entries "
+        "WHERE user_id IS NOT NULL AND created_at IS NOT NULL AND mood_level IS NOT NULL"
+    ))
+    for user_id, created_at, mood_level, sentiment_score in moods:
+        row = rollup[(user_id, _as_datetime(created_at).date())]
+        row["mood_count"] += 1
+        row["mood_sum"] += mood_level
+        if sentiment_score is not None:
+            row["sentiment_count"] += 1
+            row["sentiment_sum"] += sentiment_score
+            row[_sentiment_bucket(sentiment_score)] += 1
+    sleeps = bind.execute(sa.text(
+        "SELECT user_id, created_at, sleep_start, sleep_end FROM journal_entries "
+        "WHERE user_id IS NOT NULL AND created_at IS NOT NULL "
+        "AND sleep_start IS NOT NULL AND sleep_end IS NOT NULL"
+    ))
+    for user_id, created_at, sleep_start, sleep_end in sleeps:
+        row = rollup[(user_id, _as_datetime(created_at).date())]
+        row["sleep_count"] += 1
+        row["sleep_seconds"] += (_as_datetime(sleep_end) - _as_datetime(sleep_start)).total_seconds()
+
+    if rollup:
+        now = datetime.utcnow()
+        op.bulk_insert(user_daily_stats, [
+            dict(user_id=user_id, day=day, updated_at=now, **counters)
+            for (user_id, day), counters in rollup.items()
+        ])
+
+
+def downgrade():
+    op.drop_table("user_daily_stats")
+
+
+def _sentiment_bucket(score):
+    # Copy of app.services.stats.sentiment_bucket as of this revision
+    if score > 0.5:
+        return "very_positive"
+    elif score > 0.1:
+        return "positive"
+    elif score > -0.1:
+        return "neutral"
+    elif score > -0.5:
+        return "negative"
+    else:
+        return "very_negative"
+
+
+def _as_datetime(value):
+    # SQLite hands back DATETIME columns as strings through text() queries
+    if isinstance(value, str):
+        return datetime.fromisoformat(value)
+    return value
@@ -0,0 +1,31 @@
+"""rolling per-user chat summaries
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "chat_summaries",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("summary", sa.Text(), nullable=False),
+        sa.Column("summarized_through_id", sa.Integer(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+    )
+    op.create_index("ix_chat_summaries_id", "chat_summaries", ["id"])
+    op.create_index("ix_chat_summaries_user_id", "chat_summaries", ["user_id"], unique=True)
+
+
+def downgrade():
+    op.drop_table("chat_summaries")
@@ -0,0 +1,93 @@
+"""key rolled-up sleep by the wake-up day (sleep_end) instead of the entry's created_at
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18
+"""
+from collections import defaultdict
+from datetime import date, datetime, timezone
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+user_daily_stats = sa.table(
+    "user_daily_stats",
+    sa.column("id", sa.Integer()),
+    sa.column("user_id", sa.Integer()),
+    sa.column("day", sa.Date()),
+    sa.column("sleep_count", sa.Integer()),
+    sa.column("sleep_seconds", sa.Float()),
+    sa.column("updated_at", sa.DateTime()),
+)
+
+
+def upgrade():
+    _rebuild_sleep("sleep_end")
+
+
+def downgrade():
+    _rebuild_sleep("created_at")
+
+
+def _rebuild_sleep(day_column: str):
+    """Recompute every user's per-day sleep counters from journal_entries, keyed by day_column"""
+    bind = op.get_bind()
+    sleeps = defaultdict(lambda: [0, 0.0])
+    rows = bind.execute(sa.text(
+        f"SELECT user_id, {day_column}, sleep_start, sleep_end FROM journal_entries "
+        f"WHERE user_id IS NOT NULL AND {day_column} IS NOT NULL "
+        "AND sleep_start IS NOT NULL AND sleep_end IS NOT NULL"
+    ))
+    for user_id, day_value, sleep_start, sleep_end in rows:
+        totals = sleeps[(user_id, _utc_date(_as_datetime(day_value)))]
+        totals[0] += 1
+        totals[1] += (_as_datetime(sleep_end) - _as_datetime(sleep_start)).total_seconds()
+
+    now = datetime.utcnow()
+    existing = {
+        (user_id, _as_date(day)): row_id
+        for row_id, user_id, day in bind.execute(sa.text("SELECT id, user_id, day FROM user_daily_stats"))
+    }
+    bind.execute(
+        user_daily_stats.update()
+        .where(sa.or_(user_daily_stats.c.sleep_count != 0, user_daily_stats.c.sleep_seconds != 0))
+        .values(sleep_count=0, sleep_seconds=0, updated_at=now)
+    )
+    new_rows = []
+    for key, (count, seconds) in sleeps.items():
+        if key in existing:
+            bind.execute(
+                user_daily_stats.update()
+                .where(user_daily_stats.c.id == existing[key])
+                .values(sleep_count=count, sleep_seconds=seconds, updated_at=now)
+            )
+        else:
+            new_rows.append(dict(user_id=key[0], day=key[1], sleep_count=count, sleep_seconds=seconds, updated_at=now))
+    if new_rows:
+        op.bulk_insert(user_daily_stats, new_rows)
+
+
+def _as_datetime(value):
+    # SQLite hands back DATETIME columns as strings through text() queries
+    if isinstance(value, str):
+        return datetime.fromisoformat(value)
+    return value
+
+
+def _utc_date(value):
+    # Copy of app.services.stats.utc_date as of this revision
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return value.date()
+
+
+def _as_date(value):
+    if isinstance(value, str):
+        return date.fromisoformat(value)
+    return value
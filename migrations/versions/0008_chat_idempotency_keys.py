@@ -0,0 +1,35 @@
+"""Idempotency-Key replies for chat sends, shared across workers
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "chat_idempotency_keys",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("key", sa.String(length=255), nullable=False),
+        sa.Column("response", sa.Text(), nullable=False),
+        sa.Column("responded_at", sa.DateTime(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index("ix_chat_idempotency_keys_id", "chat_idempotency_keys", ["id"])
+    op.create_index(
+        "ix_chat_idempotency_keys_user_id_key", "chat_idempotency_keys", ["user_id", "key"], unique=True
+    )
+    op.create_index("ix_chat_idempotency_keys_created_at", "chat_idempotency_keys", ["created_at"])
+
+
+def downgrade():
+    op.drop_table("chat_idempotency_keys")
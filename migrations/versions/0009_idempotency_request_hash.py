@@ -0,0 +1,24 @@
+"""hash of the request body stored with each Idempotency-Key reply
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0009"
+down_revision = "0008"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Nullable: rows stored before this revision expire within IDEMPOTENCY_TTL
+    op.add_column("chat_idempotency_keys", sa.Column("request_hash", sa.String(length=64), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table("chat_idempotency_keys") as batch_op:
+        batch_op.drop_column("request_hash")
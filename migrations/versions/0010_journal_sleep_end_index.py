@@ -0,0 +1,23 @@
+"""(user_id, sleep_end) index for the raw sleep stats fallback
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+
+revision = "0010"
+down_revision = "0009"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        "ix_journal_entries_user_id_sleep_end", "journal_entries", ["user_id", "sleep_end"]
+    )
+
+
+def downgrade():
+    op.drop_index("ix_journal_entries_user_id_sleep_end", table_name="journal_entries")
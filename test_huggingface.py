@@ -1,6 +1,7 @@
 import os
 from dotenv import load_dotenv
 import requests
+from app.services.sentiment_cache import WARMUP_TEXTS
 
 # Загружаем переменные окружения
 load_dotenv()
@@ -20,13 +21,8 @@ headers = {
     "Content-Type": "application/json"
 }
 
-# Тестовые тексты
-test_texts = [
-    "Сегодня отличный день!",  # Позитивный на русском
-    "Я в восторге!",          # Очень позитивный на русском
-    "Мне грустно и плохо",    # Негативный на русском
-    "Обычный день",           # Нейтральный на русском
-]
+# Тестовые тексты (те же, что прогревают кэш тональности)
+test_texts = WARMUP_TEXTS
 
 # Анализируем каждый текст
 for text in test_texts:
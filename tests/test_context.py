@@ -0,0 +1,43 @@
+from datetime import datetime, timedelta
+import pytest
+from app.db.models import ChatHistory
+from app.services import context
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture(autouse=True)
+def small_window(monkeypatch):
+    # Room for two ~100-token turns; keep the newest 6 when folding, fold at least 4
+    monkeypatch.setattr(context, "CONTEXT_TOKEN_BUDGET", 450)
+    monkeypatch.setattr(context, "SUMMARY_KEEP_TURNS", 6)
+    monkeypatch.setattr(context, "SUMMARY_MIN_TURNS", 4)
+
+
+async def add_turns(db, user_id, count):
+    started = datetime.utcnow() - timedelta(hours=1)
+    db.add_all([
+        ChatHistory(user_id=user_id, message="m" * 400, response="r" * 400, created_at=started + timedelta(minutes=i))
+        for i in range(count)
+    ])
+    await db.commit()
+
+
+async def test_no_summary_while_every_dropped_turn_is_kept_by_the_fold(db, user_id):
+    await add_turns(db, user_id, 8)
+    built = await context.build_chat_context(db, user_id)
+    assert len(built["history"]) == 2
+    assert not built["needs_summary"]
+
+
+async def test_summary_once_enough_turns_are_foldable(db, user_id):
+    await add_turns(db, user_id, 10)
+    built = await context.build_chat_context(db, user_id)
+    assert built["needs_summary"]
+
+    async def summarize(previous, turns):
+        assert len(turns) == 4
+        return "summary"
+
+    assert await context.fold_chat_summary(db, user_id, summarize) == "summary"
+    assert not (await context.build_chat_context(db, user_id))["needs_summary"]
@@ -0,0 +1,63 @@
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import func, select, update
+from app.db.models import ChatIdempotencyKey
+from app.services import idempotency
+
+pytestmark = pytest.mark.anyio
+
+HASH = idempotency.request_hash("hello")
+
+
+async def expire(db, key):
+    old = datetime.utcnow() - timedelta(seconds=idempotency.IDEMPOTENCY_TTL + 1)
+    await db.execute(update(ChatIdempotencyKey).where(ChatIdempotencyKey.key == key).values(created_at=old))
+    await db.commit()
+
+
+async def test_reply_is_stored_and_replayed(db, user_id):
+    responded_at = datetime(2024, 3, 1, 12, 0)
+    assert await idempotency.record_reply(db, user_id, "k", HASH, "Hi", responded_at)
+    await db.commit()
+    stored = await idempotency.stored_reply(db, user_id, "k")
+    assert (stored.response, stored.responded_at) == ("Hi", responded_at)
+    assert stored.matches(HASH)
+    assert not stored.matches(idempotency.request_hash("something else"))
+    assert await idempotency.stored_reply(db, user_id, "other") is None
+
+
+async def test_live_reply_is_not_overwritten(db, user_id):
+    assert await idempotency.record_reply(db, user_id, "k", HASH, "first", datetime.utcnow())
+    await db.commit()
+    assert not await idempotency.record_reply(db, user_id, "k", HASH, "second", datetime.utcnow())
+    await db.commit()
+    assert (await idempotency.stored_reply(db, user_id, "k")).response == "first"
+
+
+async def test_expired_reply_is_replaced(db, user_id):
+    await idempotency.record_reply(db, user_id, "k", HASH, "first", datetime.utcnow())
+    await db.commit()
+    await expire(db, "k")
+    assert await idempotency.stored_reply(db, user_id, "k") is None
+
+    other_hash = idempotency.request_hash("new message")
+    assert await idempotency.record_reply(db, user_id, "k", other_hash, "second", datetime.utcnow())
+    await db.commit()
+    stored = await idempotency.stored_reply(db, user_id, "k")
+    assert stored.response == "second" and stored.request_hash == other_hash
+    assert await db.scalar(select(func.count()).select_from(ChatIdempotencyKey)) == 1
+
+
+async def test_rows_without_a_hash_match_any_request():
+    stored = idempotency.StoredReply("Hi", datetime.utcnow(), None)
+    assert stored.matches(HASH)
+
+
+async def test_delete_expired(db, user_id):
+    for key in ("old", "new"):
+        await idempotency.record_reply(db, user_id, key, HASH, key, datetime.utcnow())
+    await db.commit()
+    await expire(db, "old")
+    await idempotency.delete_expired(db)
+    await db.commit()
+    assert (await db.execute(select(ChatIdempotencyKey.key))).scalars().all() == ["new"]
@@ -0,0 +1,171 @@
+import asyncio
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import select, update
+from app.db.models import Job
+from app.services import jobs
+from app.services.jobs import JobWorker, Schedule
+
+EPOCH = datetime(1970, 1, 1)
+
+
+@pytest.mark.parametrize("schedule, now, expected", [
+    (Schedule(3600), datetime(2024, 3, 1, 10, 15), datetime(2024, 3, 1, 11, 0)),
+    # Exactly on a boundary: the next one, never now
+    (Schedule(3600), datetime(2024, 3, 1, 11, 0), datetime(2024, 3, 1, 12, 0)),
+    (Schedule(86400, offset=9 * 3600), datetime(2024, 3, 1, 8, 0), datetime(2024, 3, 1, 9, 0)),
+    (Schedule(86400, offset=9 * 3600), datetime(2024, 3, 1, 10, 0), datetime(2024, 3, 2, 9, 0)),
+    (Schedule(900), datetime(2024, 3, 1, 23, 59, 59), datetime(2024, 3, 2, 0, 0)),
+])
+def test_schedule_next_run(schedule, now, expected):
+    assert schedule.next_run(now) == expected
+
+
+def test_schedule_runs_align_across_workers():
+    schedule = Schedule(3600, offset=120)
+    a = schedule.next_run(datetime(2024, 3, 1, 10, 5))
+    b = schedule.next_run(datetime(2024, 3, 1, 10, 30))
+    assert a == b == datetime(2024, 3, 1, 11, 2)
+    assert (a - EPOCH).total_seconds() % 3600 == 120
+
+
+def test_retry_delay_backs_off_and_caps():
+    assert 5 <= jobs.retry_delay(1, 5) <= 10
+    assert 40 <= jobs.retry_delay(4, 5) <= 80
+    assert jobs.retry_delay(30, 5) == 3600
+
+
+@pytest.fixture
+def registry(monkeypatch, session_factory):
+    """Empty job registry, with workers using the test database"""
+    monkeypatch.setattr(jobs, "kinds", {})
+    monkeypatch.setattr(jobs, "schedules", {})
+    monkeypatch.setattr(jobs, "AsyncSessionLocal", session_factory)
+    return jobs.kinds
+
+
+async def add_job(session_factory, kind, max_attempts=5, **values):
+    async with session_factory() as db:
+        await jobs.enqueue(db, kind, {"n": 1}, max_attempts=max_attempts)
+        await db.commit()
+        if values:
+            await db.execute(update(Job).values(**values))
+            await db.commit()
+
+
+async def load_job(session_factory) -> Job:
+    async with session_factory() as db:
+        return (await db.execute(select(Job))).scalar_one()
+
+
+async def drain(worker: JobWorker):
+    await asyncio.gather(*list(worker._tasks))
+
+
+@pytest.mark.anyio
+async def test_a_job_is_claimed_by_one_worker_only(registry, session_factory):
+    release = asyncio.Event()
+    calls = []
+
+    @jobs.job("blocking")
+    async def blocking(context, payload):
+        calls.append(context)
+        await release.wait()
+
+    await add_job(session_factory, "blocking")
+    first, second = JobWorker("first"), JobWorker("second")
+    try:
+        claimed = await asyncio.gather(first._claim(), second._claim())
+        assert sorted(claimed) == [0, 1]
+        # Still running under its lease: nobody else may take it
+        assert await first._claim() == 0 and await second._claim() == 0
+        release.set()
+        await drain(first)
+        await drain(second)
+    finally:
+        await first.stop()
+        await second.stop()
+    assert len(calls) == 1
+    job_row = await load_job(session_factory)
+    assert (job_row.status, job_row.attempts, job_row.locked_until) == ("done", 1, None)
+
+
+@pytest.mark.anyio
+async def test_expired_lease_is_claimed_again(registry, session_factory):
+    calls = []
+
+    @jobs.job("echo")
+    async def echo(context, payload):
+        calls.append(payload)
+
+    # Claimed by a worker that died: still "running", lease in the past
+    await add_job(
+        session_factory, "echo",
+        status="running", attempts=1, locked_until=datetime.utcnow() - timedelta(seconds=1)
+    )
+    worker = JobWorker(None)
+    assert await worker._claim() == 1
+    await drain(worker)
+    assert calls == [{"n": 1}]
+    job_row = await load_job(session_factory)
+    assert (job_row.status, job_row.attempts) == ("done", 2)
+
+
+@pytest.mark.anyio
+async def test_live_lease_is_not_claimed(registry, session_factory):
+    jobs.job("echo")(lambda context, payload: asyncio.sleep(0))
+    await add_job(
+        session_factory, "echo",
+        status="running", attempts=1, locked_until=datetime.utcnow() + timedelta(seconds=60)
+    )
+    assert await JobWorker(None)._claim() == 0
+
+
+@pytest.mark.anyio
+async def test_job_fails_after_max_attempts(registry, session_factory):
+    @jobs.job("flaky")
+    async def flaky(context, payload):
+        raise RuntimeError("upstream down")
+
+    async with session_factory() as db:
+        await jobs.enqueue(db, "flaky", dedupe_key="flaky:1", max_attempts=2)
+        await db.commit()
+    worker = JobWorker(None, retry_base=60)
+
+    assert await worker._claim() == 1
+    await drain(worker)
+    job_row = await load_job(session_factory)
+    assert (job_row.status, job_row.attempts, job_row.dedupe_key) == ("pending", 1, "flaky:1")
+    assert job_row.run_at > datetime.utcnow() + timedelta(seconds=30)
+    assert "upstream down" in job_row.last_error
+    # Not due yet
+    assert await worker._claim() == 0
+
+    async with session_factory() as db:
+        await db.execute(update(Job).values(run_at=datetime.utcnow()))
+        await db.commit()
+    assert await worker._claim() == 1
+    await drain(worker)
+    job_row = await load_job(session_factory)
+    assert (job_row.status, job_row.attempts, job_row.dedupe_key) == ("failed", 2, None)
+    assert await worker._claim() == 0
+
+
+@pytest.mark.anyio
+async def test_finished_scheduled_job_queues_its_next_run(registry, session_factory):
+    jobs.schedules["tick"] = Schedule(3600)
+    jobs.job("tick")(lambda context, payload: asyncio.sleep(0))
+    worker = JobWorker(None)
+    await worker.ensure_scheduled()
+    await worker.ensure_scheduled()  # idempotent across workers and restarts
+
+    async with session_factory() as db:
+        await db.execute(update(Job).values(run_at=datetime.utcnow()))
+        await db.commit()
+    assert await worker._claim() == 1
+    await drain(worker)
+    async with session_factory() as db:
+        rows = (await db.execute(select(Job.status, Job.run_at, Job.dedupe_key).order_by(Job.id))).all()
+    assert [(status, key) for status, _, key in rows] == [("done", None), ("pending", "schedule:tick")]
+    next_run = rows[1].run_at
+    assert next_run > datetime.utcnow() and (next_run.minute, next_run.second, next_run.microsecond) == (0, 0, 0)
@@ -0,0 +1,25 @@
+from datetime import datetime
+from app.api.journal import JournalEntryCreate, JournalEntryImport
+
+
+def test_sleep_times_are_stored_as_naive_utc():
+    # What the Mini App sends: new Date(x).toISOString()
+    entry = JournalEntryCreate(sleep_start="2024-03-01T22:30:00.000Z", sleep_end="2024-03-02T06:45:00.000Z")
+    assert entry.sleep_start == datetime(2024, 3, 1, 22, 30)
+    assert entry.sleep_end == datetime(2024, 3, 2, 6, 45)
+    assert entry.sleep_start.tzinfo is None and entry.sleep_end.tzinfo is None
+
+
+def test_offsets_are_converted_to_utc():
+    entry = JournalEntryImport(sleep_start="2024-03-02T01:30:00+03:00", sleep_end="2024-03-02T09:00:00+03:00")
+    assert (entry.sleep_start, entry.sleep_end) == (datetime(2024, 3, 1, 22, 30), datetime(2024, 3, 2, 6, 0))
+
+
+def test_aware_and_naive_values_compare():
+    entry = JournalEntryCreate(sleep_start="2024-03-01T22:30:00", sleep_end="2024-03-02T06:45:00Z")
+    assert entry.sleep_start < entry.sleep_end
+
+
+def test_missing_sleep_times_stay_none():
+    entry = JournalEntryCreate(nutrition_notes="oatmeal")
+    assert entry.sleep_start is None and entry.sleep_end is None
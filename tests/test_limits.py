@@ -0,0 +1,163 @@
+import asyncio
+import pytest
+from app.services import limits
+from app.services.limits import ConcurrencyLimiter, RateLimited, RateLimiter, SingleFlight, TokenBucket, UpstreamBusy
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(limits.time, "monotonic", clock)
+    return clock
+
+
+def test_token_bucket_refills_at_rate(clock):
+    bucket = TokenBucket(rate=1.0, capacity=2)
+    assert bucket.take() == 0 and bucket.take() == 0
+    assert bucket.take() == pytest.approx(1.0)
+    clock.now += 0.5
+    assert bucket.take() == pytest.approx(0.5)
+    clock.now += 0.5
+    assert bucket.take() == 0
+
+
+def test_rate_limiter_is_per_key(clock):
+    limiter = RateLimiter(per_minute=60, burst=1)
+    limiter.check("alice")
+    limiter.check("bob")
+    with pytest.raises(RateLimited) as e:
+        limiter.check("alice")
+    assert e.value.retry_after == pytest.approx(1.0)
+
+
+def test_rate_limiter_drops_idle_keys(clock):
+    limiter = RateLimiter(per_minute=60, burst=1, max_keys=2)
+    for key in ("a", "b", "c"):
+        limiter.check(key)
+    # "a" was evicted, so it starts over with a full bucket
+    limiter.check("a")
+    with pytest.raises(RateLimited):
+        limiter.check("c")
+
+
+@pytest.mark.parametrize("workers, per_minute, burst", [
+    (1, 12, 4),
+    (4, 3, 1),
+    (3, 4, 2),    # burst rounds up
+    (8, 1.5, 1),  # never below one request
+    (0, 12, 4),   # unset/invalid worker count means one worker
+])
+def test_per_worker_budget_split(workers, per_minute, burst):
+    limiter = RateLimiter.per_worker(per_minute=12, burst=4, workers=workers)
+    assert limiter.rate * 60 == pytest.approx(per_minute)
+    assert limiter.burst == burst
+
+
+@pytest.mark.anyio
+async def test_concurrency_limiter_times_out_waiters():
+    limiter = ConcurrencyLimiter(limit=1, queue_timeout=0.05)
+    async with limiter.slot():
+        assert limiter.in_use == 1
+        with pytest.raises(UpstreamBusy):
+            async with limiter.slot():
+                pass
+        assert limiter.waiting == 0
+    async with limiter.slot():
+        assert limiter.in_use == 1
+    assert limiter.in_use == 0
+
+
+@pytest.mark.anyio
+async def test_single_flight_shares_one_call():
+    flight = SingleFlight()
+    calls = []
+
+    async def fn():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "reply"
+
+    assert await asyncio.gather(*(flight.do("k", fn) for _ in range(3))) == ["reply"] * 3
+    assert len(calls) == 1
+    # Without remember= the next call runs again
+    assert await flight.do("k", fn) == "reply"
+    assert len(calls) == 2
+
+
+@pytest.mark.anyio
+async def test_single_flight_remembers_results():
+    flight = SingleFlight(ttl=60)
+    calls = []
+
+    async def fn():
+        calls.append(1)
+        return len(calls)
+
+    assert await flight.do("k", fn, remember=True) == 1
+    assert await flight.do("k", fn, remember=True) == 1
+    assert await flight.do("other", fn, remember=True) == 2
+
+
+@pytest.mark.anyio
+async def test_single_flight_does_not_cache_errors():
+    flight = SingleFlight()
+
+    async def fail():
+        raise ValueError("upstream")
+
+    async def succeed():
+        return "ok"
+
+    with pytest.raises(ValueError):
+        await flight.do("k", fail, remember=True)
+    assert await flight.do("k", succeed, remember=True) == "ok"
+
+
+@pytest.mark.anyio
+async def test_waiter_takes_over_when_running_caller_is_cancelled():
+    flight = SingleFlight()
+    started = asyncio.Event()
+
+    async def slow():
+        started.set()
+        await asyncio.sleep(10)
+
+    async def fast():
+        return "reply"
+
+    leader = asyncio.create_task(flight.do("k", slow))
+    await started.wait()
+    follower = asyncio.create_task(flight.do("k", fast))
+    await asyncio.sleep(0)
+    leader.cancel()
+    assert await asyncio.wait_for(follower, 1) == "reply"
+    with pytest.raises(asyncio.CancelledError):
+        await leader
+
+
+@pytest.mark.anyio
+async def test_cancelled_waiter_leaves_the_call_running():
+    flight = SingleFlight()
+    release = asyncio.Event()
+
+    async def fn():
+        await release.wait()
+        return "reply"
+
+    leader = asyncio.create_task(flight.do("k", fn))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(flight.do("k", fn))
+    await asyncio.sleep(0)
+    follower.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await follower
+    release.set()
+    assert await leader == "reply"
@@ -0,0 +1,76 @@
+import base64
+import json
+from datetime import datetime, timedelta
+import pytest
+from fastapi import HTTPException
+from app.api.mood import mood_history_query
+from app.api.pagination import decode_cursor, encode_cursor, page_size, split_page
+from app.db.models import MoodEntry
+
+
+def b64(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def test_cursor_round_trip():
+    created_at = datetime(2024, 3, 1, 12, 30, 15, 123456)
+    cursor = encode_cursor(created_at, 42)
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (created_at, 42)
+
+
+@pytest.mark.parametrize("cursor", [
+    "not a cursor!",
+    b64(b"\xff\xfe"),
+    b64(b"{not json"),
+    b64(b"null"),
+    b64(json.dumps({"created_at": "2024-03-01T12:00:00", "id": 1}).encode()),
+    b64(json.dumps(["2024-03-01T12:00:00"]).encode()),
+    b64(json.dumps(["yesterday", 1]).encode()),
+    b64(json.dumps([1709294400, 1]).encode()),
+    b64(json.dumps(["2024-03-01T12:00:00", "one"]).encode()),
+    encode_cursor(datetime(2024, 3, 1), 1)[:-3],
+])
+def test_bad_cursor_is_a_400(cursor):
+    with pytest.raises(HTTPException) as e:
+        decode_cursor(cursor)
+    assert e.value.status_code == 400
+
+
+@pytest.mark.parametrize("limit, expected", [(None, 10), (0, 1), (-5, 1), (25, 25), (10_000, 100)])
+def test_page_size_is_clamped(limit, expected):
+    assert page_size(limit) == expected
+
+
+@pytest.mark.anyio
+async def test_pages_walk_ties_by_id_and_end_without_cursor(db, user_id):
+    same_time = datetime(2024, 3, 1, 12, 0)
+    db.add_all(
+        [MoodEntry(user_id=user_id, mood_level=3, created_at=same_time) for _ in range(5)]
+        + [MoodEntry(user_id=user_id, mood_level=3, created_at=same_time - timedelta(minutes=1))]
+    )
+    await db.commit()
+
+    seen, cursor, pages = [], None, 0
+    while True:
+        rows = (await db.execute(mood_history_query(user_id, cursor, 2))).all()
+        page, cursor = split_page(rows, 2)
+        pages += 1
+        seen += [(row.created_at, row.id) for row in page]
+        if cursor is None:
+            break
+
+    assert pages == 3
+    assert len(seen) == len(set(seen)) == 6
+    # Newest first; entries sharing created_at come out by descending id
+    assert seen == sorted(seen, reverse=True)
+
+
+@pytest.mark.anyio
+async def test_exactly_full_last_page_has_no_cursor(db, user_id):
+    db.add_all([MoodEntry(user_id=user_id, mood_level=3, created_at=datetime(2024, 3, 1, i)) for i in range(4)])
+    await db.commit()
+    first, cursor = split_page((await db.execute(mood_history_query(user_id, None, 2))).all(), 2)
+    assert len(first) == 2 and cursor is not None
+    last, cursor = split_page((await db.execute(mood_history_query(user_id, cursor, 2))).all(), 2)
+    assert [row.created_at.hour for row in last] == [1, 0] and cursor is None
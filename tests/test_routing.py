@@ -0,0 +1,79 @@
+import pytest
+from app.services import routing
+from app.services.routing import ModelConfig, ModelRouter, parse_models
+
+FAST, SLOW = ModelConfig("fast", 20), ModelConfig("slow", 60)
+
+
+def make_router(**options) -> ModelRouter:
+    return ModelRouter([SLOW, FAST], max_attempts=2, **options)
+
+
+def test_parse_models():
+    assert parse_models("a/b:free=15, c/d ,", default_timeout=30) == [
+        ModelConfig("a/b:free", 15.0), ModelConfig("c/d", 30)
+    ]
+
+
+def test_short_messages_go_to_the_fastest_model():
+    router = make_router()
+    router.record("slow", 2.0, ok=True)
+    router.record("fast", 0.5, ok=True)
+    assert router.candidates("hi") == [FAST, SLOW]
+    # Long messages keep the configured order
+    assert router.candidates("x" * 500) == [SLOW, FAST]
+
+
+def test_streaming_and_completion_latencies_rank_separately():
+    router = make_router()
+    # slow streams its first token quickly but takes long to finish a completion
+    router.record("slow", 0.2, ok=True, streaming=True)
+    router.record("slow", 5.0, ok=True)
+    router.record("fast", 0.8, ok=True, streaming=True)
+    router.record("fast", 1.0, ok=True)
+    assert router.candidates("hi") == [FAST, SLOW]
+    assert router.candidates("hi", streaming=True) == [SLOW, FAST]
+
+
+def test_zero_latency_is_a_measurement_not_unknown():
+    router = make_router()
+    router.record("fast", 0.0, ok=True)
+    assert router.candidates("hi") == [FAST, SLOW]
+
+
+def test_models_without_data_keep_configured_order():
+    router = make_router()
+    router.record("fast", 0.1, ok=True, streaming=True)
+    assert router.candidates("hi") == [SLOW, FAST]
+
+
+def test_failing_model_moves_to_the_back():
+    router = make_router(min_samples=2)
+    router.record("slow", 1.0, ok=False)
+    router.record("slow", 1.0, ok=False)
+    assert router.candidates("x" * 500) == [FAST, SLOW]
+
+
+def test_rate_limited_model_cools_down(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(routing.time, "monotonic", lambda: now[0])
+    router = make_router(cooldown=30)
+    router.record("slow", 0.1, ok=False, status=429)
+    assert not router.healthy("slow")
+    now[0] += 31
+    assert router.healthy("slow")
+
+
+def test_short_chain_retries_the_last_model():
+    router = ModelRouter([FAST], max_attempts=3)
+    assert router.candidates("hi") == [FAST, FAST, FAST]
+
+
+def test_snapshot_reports_both_latencies():
+    router = make_router()
+    router.record("fast", 0.5, ok=True)
+    router.record("fast", 0.1, ok=True, streaming=True)
+    snapshot = router.snapshot()["fast"]
+    assert snapshot["latency_ms"] == pytest.approx(500)
+    assert snapshot["first_token_ms"] == pytest.approx(100)
+    assert router.snapshot()["slow"]["latency_ms"] is None
@@ -0,0 +1,59 @@
+import hashlib
+import hmac
+import json
+import time
+from urllib.parse import urlencode
+import pytest
+from app.core.security import AuthError, InitDataValidator, SessionTokens, SessionUser
+
+BOT_TOKEN = "123456:test-token"
+
+
+def signed_init_data(auth_date: int, user_id: int = 42, **overrides) -> str:
+    """initData as Telegram builds it: fields plus an HMAC of the sorted key=value lines"""
+    fields = {"auth_date": str(auth_date), "query_id": "AAE", "user": json.dumps({"id": user_id, "username": "alice"})}
+    secret = hmac.new(b"WebAppData", BOT_TOKEN.encode(), hashlib.sha256).digest()
+    data_check_string = "\n".join(f"{key}={fields[key]}" for key in sorted(fields))
+    fields["hash"] = hmac.new(secret, data_check_string.encode(), hashlib.sha256).hexdigest()
+    fields.update(overrides)
+    return urlencode(fields)
+
+
+def test_valid_init_data():
+    now = time.time()
+    fields = InitDataValidator(BOT_TOKEN).validate(signed_init_data(int(now)), now=now)
+    assert fields["user"]["id"] == 42
+
+
+def test_tampered_field_is_rejected():
+    now = time.time()
+    tampered = signed_init_data(int(now), user=json.dumps({"id": 43, "username": "alice"}))
+    with pytest.raises(AuthError, match="signature"):
+        InitDataValidator(BOT_TOKEN).validate(tampered, now=now)
+
+
+def test_other_bot_token_is_rejected():
+    now = time.time()
+    with pytest.raises(AuthError, match="signature"):
+        InitDataValidator("654321:other").validate(signed_init_data(int(now)), now=now)
+
+
+def test_expired_auth_date_is_rejected():
+    now = time.time()
+    with pytest.raises(AuthError, match="expired"):
+        InitDataValidator(BOT_TOKEN, max_age=60).validate(signed_init_data(int(now) - 120), now=now)
+
+
+def test_session_token_round_trip():
+    tokens = SessionTokens("secret")
+    assert tokens.verify(tokens.issue(7, 42)) == SessionUser(7, 42)
+
+
+@pytest.mark.parametrize("token", [
+    SessionTokens("secret", ttl=-10).issue(7, 42),   # expired
+    SessionTokens("other-secret").issue(7, 42),      # wrong key
+    "not-a-token",
+])
+def test_bad_session_token_is_rejected(token):
+    with pytest.raises(AuthError):
+        SessionTokens("secret").verify(token)
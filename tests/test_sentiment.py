@@ -0,0 +1,44 @@
+import pytest
+from app.services.sentiment import LocalSentimentEngine, sentiment_score_from_prediction
+
+pytestmark = pytest.mark.anyio
+
+
+class FakeEngine(LocalSentimentEngine):
+    """The batching engine around a stand-in model, so torch isn't needed"""
+
+    loads = 0
+
+    def load(self):
+        self.loads += 1
+        self._model = object()
+
+    def predict(self, texts):
+        return [[{"label": "positive" if "good" in text else "negative", "score": 0.75}] for text in texts]
+
+
+def test_score_from_prediction():
+    prediction = [[{"label": "NEUTRAL", "score": 0.2}, {"label": "Negative", "score": 0.7}]]
+    assert sentiment_score_from_prediction(prediction) == -0.7
+    assert sentiment_score_from_prediction([{"label": "neutral", "score": 0.9}]) == 0
+
+
+async def test_engine_batches_requests():
+    engine = FakeEngine("fake")
+    await engine.start()
+    try:
+        assert await engine.analyze_many(["good day", "bad day", "good"]) == [0.75, -0.75, 0.75]
+    finally:
+        await engine.stop()
+
+
+async def test_engine_restarts_after_stop():
+    engine = FakeEngine("fake")
+    for _ in range(2):
+        await engine.start()
+        assert await engine.analyze("good") == 0.75
+        await engine.stop()
+    # The model is kept; only the thread and batching loop are recreated
+    assert engine.loads == 1
+    with pytest.raises(RuntimeError, match="not started"):
+        await engine.analyze("good")
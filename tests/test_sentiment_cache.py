@@ -0,0 +1,35 @@
+import pytest
+from app.services.sentiment_cache import SentimentCache
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_memory_tier_hits_normalized_text():
+    cache = SentimentCache(max_entries=10)
+    await cache.set("model", "Хороший  день", 0.8)
+    assert await cache.get("model", "хороший день ") == 0.8
+    assert await cache.get("other-model", "хороший день") is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+async def test_memory_tier_is_bounded():
+    cache = SentimentCache(max_entries=2)
+    for i, text in enumerate(("a", "b", "c")):
+        await cache.set("model", text, i)
+    assert cache.stats()["size"] == 2
+    assert await cache.get("model", "a") is None
+
+
+async def test_persistent_tier_is_shared_across_workers(tmp_path):
+    db_path = str(tmp_path / "sentiment.db")
+    writer, reader = SentimentCache(db_path=db_path), SentimentCache(db_path=db_path, ttl=3600)
+    try:
+        await writer.set("model", "text", -0.4)
+        assert await reader.get("model", "text") == -0.4
+        assert reader.stats()["persistent_hits"] == 1
+        # Promoted to the reader's memory tier
+        assert await reader.get("model", "text") == -0.4
+        assert reader.stats()["persistent_hits"] == 1
+    finally:
+        writer.close()
+        reader.close()
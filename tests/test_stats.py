@@ -0,0 +1,59 @@
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import delete
+from app.db.models import JournalEntry, MoodEntry, UserDailyStats
+from app.services import stats
+
+pytestmark = pytest.mark.anyio
+
+# Every threshold, both sides of it, the extremes and an entry without a score
+SCORES = [1.0, 0.5001, 0.5, 0.4999, 0.1001, 0.1, 0.0999, 0.0, -0.0999, -0.1, -0.1001,
+          -0.4999, -0.5, -0.5001, -1.0, None]
+
+
+async def drop_rollup(db):
+    await db.execute(delete(UserDailyStats))
+    await db.commit()
+
+
+async def test_sentiment_buckets_at_thresholds():
+    assert [stats.sentiment_bucket(score) for score in (0.5001, 0.5, 0.1001, 0.1, -0.0999, -0.1, -0.4999, -0.5)] == [
+        "very_positive", "positive", "positive", "neutral", "neutral", "negative", "negative", "very_negative"
+    ]
+
+
+async def test_mood_summary_is_the_same_from_rollup_and_raw_entries(db, user_id):
+    now = datetime.utcnow()
+    for i, score in enumerate(SCORES):
+        created_at = now - timedelta(days=i % 3, minutes=i)
+        db.add(MoodEntry(user_id=user_id, mood_level=i % 5 + 1, sentiment_score=score, created_at=created_at))
+        await stats.record_mood(db, user_id, created_at, i % 5 + 1, score)
+    await db.commit()
+
+    from_rollup = await stats.mood_summary(db, user_id, 7)
+    await drop_rollup(db)
+    from_raw = await stats.mood_summary(db, user_id, 7)
+
+    assert from_rollup["sentiment_distribution"] == from_raw["sentiment_distribution"] == {
+        "very_positive": 2, "positive": 3, "neutral": 4, "negative": 3, "very_negative": 3
+    }
+    assert from_rollup["total_entries"] == from_raw["total_entries"] == len(SCORES)
+    assert from_rollup["average_mood"] == pytest.approx(from_raw["average_mood"])
+    assert from_rollup["average_sentiment"] == pytest.approx(from_raw["average_sentiment"])
+
+
+async def test_sleep_summary_is_the_same_from_rollup_and_raw_entries(db, user_id):
+    today = datetime.utcnow().replace(hour=7, minute=0, second=0, microsecond=0)
+    for nights_ago, hours in ((0, 8), (1, 6.5), (2, 7), (10, 12)):
+        sleep_end = today - timedelta(days=nights_ago)
+        sleep_start = sleep_end - timedelta(hours=hours)
+        db.add(JournalEntry(user_id=user_id, sleep_start=sleep_start, sleep_end=sleep_end, created_at=today))
+        await stats.record_sleep(db, user_id, sleep_end, hours * 3600)
+    await db.commit()
+
+    from_rollup = await stats.sleep_summary(db, user_id, 7)
+    await drop_rollup(db)
+    from_raw = await stats.sleep_summary(db, user_id, 7)
+
+    assert from_rollup == pytest.approx(from_raw)
+    assert from_rollup == pytest.approx({"average_sleep_duration": 21.5 / 3, "total_entries": 3})
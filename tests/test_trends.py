@@ -0,0 +1,84 @@
+import math
+from datetime import date
+import numpy as np
+import pytest
+from app.services import trends
+from app.services.trends import compute_trends, paired_correlation, rolling_mean, streaks
+
+nan = math.nan
+
+
+@pytest.fixture(autouse=True)
+def min_pairs(monkeypatch):
+    monkeypatch.setattr(trends, "TRENDS_MIN_PAIRS", 3)
+
+
+def as_list(values):
+    return [None if math.isnan(value) else value for value in values]
+
+
+def test_rolling_mean_weights_by_entries_across_gaps():
+    sums = np.array([4.0, 0, 0, 2, 9])
+    counts = np.array([1.0, 0, 0, 1, 3])
+    assert as_list(rolling_mean(sums, counts, 2)) == [4, 4, None, 2, 2.75]
+    assert as_list(rolling_mean(sums, counts, 3)) == [4, 4, 4, 2, 2.75]
+
+
+def test_rolling_mean_single_point():
+    assert as_list(rolling_mean(np.array([3.0]), np.array([1.0]), 7)) == [3]
+    assert as_list(rolling_mean(np.array([0.0]), np.array([0.0]), 7)) == [None]
+
+
+@pytest.mark.parametrize("logged, expected", [
+    ([], {"current": 0, "longest": 0}),
+    ([1], {"current": 1, "longest": 1}),
+    ([0], {"current": 0, "longest": 0}),
+    ([1, 1, 0, 1, 1, 1], {"current": 3, "longest": 3}),
+    # A run that ended yesterday is still current
+    ([1, 1, 1, 0, 1, 1, 0], {"current": 2, "longest": 3}),
+    ([1, 1, 0, 0], {"current": 0, "longest": 2}),
+])
+def test_streaks(logged, expected):
+    assert streaks(np.array(logged, dtype=bool)) == expected
+
+
+def test_correlation_skips_days_missing_either_value():
+    x = np.array([6.0, nan, 7, 8, 9, 5])
+    y = np.array([2.0, 5, nan, 4, 5, 1])
+    assert paired_correlation(x, y) == {"r": 1.0, "days": 4}
+    assert paired_correlation(x, -y) == {"r": -1.0, "days": 4}
+
+
+def test_correlation_of_constant_series_is_none():
+    varying = np.array([1.0, 2, 3, 4])
+    constant = np.array([7.0, 7, 7, 7])
+    assert paired_correlation(constant, varying) == {"r": None, "days": 4}
+    assert paired_correlation(varying, constant) == {"r": None, "days": 4}
+
+
+@pytest.mark.parametrize("x, y", [([5.0], [3.0]), ([5.0, nan, 6], [3.0, 4, nan]), ([], [])])
+def test_correlation_needs_min_pairs(x, y):
+    result = paired_correlation(np.array(x), np.array(y))
+    assert result["r"] is None and result["days"] == min(1, len(x))
+
+
+def test_compute_trends_places_rows_on_a_dense_day_axis():
+    start = date(2024, 3, 1)  # a Friday
+    rows = [
+        # day, mood_count, mood_sum, sentiment_count, sentiment_sum, sleep_count, sleep_seconds
+        (date(2024, 3, 1), 2, 7, 1, 0.5, 1, 8 * 3600),
+        (date(2024, 3, 4), 1, 2, 0, 0.0, 0, 0),
+    ]
+    result = compute_trends(rows, start, 5)
+    assert result["daily"]["mood"] == [3.5, None, None, 2.0, None]
+    assert result["daily"]["sleep_hours"] == [8.0, None, None, None, None]
+    assert result["rolling"]["7d"]["mood"] == [3.5, 3.5, 3.5, 3.0, 3.0]
+    assert result["weekday"]["mood"]["friday"] == 3.5 and result["weekday"]["mood"]["monday"] == 2.0
+    assert result["streaks"] == {"current": 1, "longest": 1}
+    assert result["sleep_vs_next_day"]["mood"] == {"r": None, "days": 1}
+
+
+def test_compute_trends_without_rows():
+    result = compute_trends([], date(2024, 3, 1), 3)
+    assert result["daily"]["mood"] == [None, None, None]
+    assert result["streaks"] == {"current": 0, "longest": 0}